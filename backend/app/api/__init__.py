@@ -1,4 +1,4 @@
 """API routers."""
-from app.api import article_router, token_router, payment_router, admin_router
+from app.api import article_router, margin_router, token_router, payment_router, admin_router
 
-__all__ = ["article_router", "token_router", "payment_router", "admin_router"]
+__all__ = ["article_router", "margin_router", "token_router", "payment_router", "admin_router"]
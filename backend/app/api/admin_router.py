@@ -1,9 +1,22 @@
 """Admin API endpoints."""
-from fastapi import APIRouter, HTTPException, status, Header
-from typing import Optional
+from fastapi import APIRouter, HTTPException, status, Header, Query, UploadFile, File
+from fastapi.responses import PlainTextResponse
+from typing import List, Literal, Optional, Tuple
+import csv
+import io
+import json
 import os
 
-from app.schemas.token import TokenStatus
+from app.core.profiler import profile
+from app.core.watchdog import get_loop_watchdog
+from app.schemas.token import (
+    TokenStatus,
+    BatchTokenStatusRequest,
+    BatchTokenStatusResponse,
+    BulkAddTokensRequest,
+    BulkSetUnlimitedRequest,
+    BulkOperationResponse,
+)
 from app.services.token_service import get_token_service
 
 router = APIRouter()
@@ -56,3 +69,196 @@ async def add_tokens(
     
     token_service = get_token_service()
     return token_service.add_tokens(device_id, amount)
+
+
+@router.post("/admin/tokens/batch", response_model=BatchTokenStatusResponse)
+async def get_token_statuses(
+    request: BatchTokenStatusRequest,
+    x_admin_key: Optional[str] = Header(None),
+) -> BatchTokenStatusResponse:
+    """Get token status for many devices in one call.
+    
+    The device ids are sent in the body because large batches do not
+    fit in a query string.
+    """
+    verify_admin(x_admin_key)
+    
+    token_service = get_token_service()
+    return BatchTokenStatusResponse(
+        statuses=token_service.get_token_statuses(request.device_ids),
+    )
+
+
+@router.post("/admin/bulk/add-tokens", response_model=BulkOperationResponse)
+async def bulk_add_tokens(
+    request: BulkAddTokensRequest,
+    x_admin_key: Optional[str] = Header(None),
+) -> BulkOperationResponse:
+    """Add the same amount of tokens to many devices in one transaction."""
+    verify_admin(x_admin_key)
+    
+    grants = [(device_id, request.amount) for device_id in request.device_ids]
+    return _apply_bulk(get_token_service().bulk_add_tokens, grants)
+
+
+@router.post("/admin/bulk/set-unlimited", response_model=BulkOperationResponse)
+async def bulk_set_unlimited(
+    request: BulkSetUnlimitedRequest,
+    x_admin_key: Optional[str] = Header(None),
+) -> BulkOperationResponse:
+    """Set unlimited access for many devices in one transaction."""
+    verify_admin(x_admin_key)
+    
+    grants = [(device_id, request.months) for device_id in request.device_ids]
+    return _apply_bulk(get_token_service().bulk_set_unlimited, grants)
+
+
+@router.post("/admin/bulk/upload", response_model=BulkOperationResponse)
+async def bulk_upload(
+    file: UploadFile = File(...),
+    operation: Literal["add-tokens", "set-unlimited"] = "add-tokens",
+    amount: int = 100,
+    months: int = 0,
+    x_admin_key: Optional[str] = Header(None),
+) -> BulkOperationResponse:
+    """Apply a bulk operation from a CSV or NDJSON upload.
+    
+    CSV rows are ``device_id[,value]`` (an optional ``device_id`` header
+    row is skipped). NDJSON rows are objects with ``device_id`` and an
+    optional ``amount`` or ``months`` field. Rows without a value use the
+    ``amount``/``months`` query parameter.
+    
+    Args:
+        file: CSV or NDJSON file
+        operation: "add-tokens" or "set-unlimited"
+        amount: Default tokens per device for add-tokens
+        months: Default months for set-unlimited (0 = permanent)
+        x_admin_key: Admin key in header
+    """
+    verify_admin(x_admin_key)
+    
+    token_service = get_token_service()
+    if operation == "add-tokens":
+        value_field, default, apply = "amount", amount, token_service.bulk_add_tokens
+    else:
+        value_field, default, apply = "months", months, token_service.bulk_set_unlimited
+    
+    data = await file.read()
+    try:
+        grants = _parse_upload(data, file.filename or "", value_field, default)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        )
+    
+    if not grants:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Upload contains no rows",
+        )
+    
+    return _apply_bulk(apply, grants)
+
+
+@router.get("/admin/profile", response_class=PlainTextResponse)
+async def get_profile(
+    seconds: float = Query(10.0, gt=0, le=60),
+    interval_ms: float = Query(10.0, ge=1, le=1000),
+    x_admin_key: Optional[str] = Header(None),
+) -> PlainTextResponse:
+    """Sample every thread's stack for a while and return collapsed stacks.
+    
+    The output can be fed straight to flamegraph.pl or speedscope. Only
+    one profile runs at a time.
+    
+    Args:
+        seconds: How long to sample
+        interval_ms: Milliseconds between samples
+        x_admin_key: Admin key in header
+    """
+    verify_admin(x_admin_key)
+    
+    try:
+        collapsed = await profile(seconds, interval_ms / 1000)
+    except RuntimeError as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e),
+        )
+    return PlainTextResponse(collapsed)
+
+
+@router.get("/admin/loop-blocks")
+async def get_loop_blocks(x_admin_key: Optional[str] = Header(None)) -> dict:
+    """Recent callbacks that blocked the event loop, newest last.
+    
+    Each incident has the route and service it was attributed to, how
+    long the loop was blocked and the loop thread's stack at the time.
+    """
+    verify_admin(x_admin_key)
+    
+    watchdog = get_loop_watchdog()
+    if watchdog is None:
+        return {"enabled": False, "threshold_seconds": None, "incidents": []}
+    return {
+        "enabled": True,
+        "threshold_seconds": watchdog.threshold,
+        "incidents": list(watchdog.incidents),
+    }
+
+
+def _apply_bulk(apply, grants: List[Tuple[str, int]]) -> BulkOperationResponse:
+    """Run a bulk token operation and map validation errors to 400."""
+    try:
+        applied = apply(grants)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        )
+    return BulkOperationResponse(
+        applied=applied,
+        devices=len({device_id for device_id, _ in grants}),
+    )
+
+
+def _parse_upload(
+    data: bytes,
+    filename: str,
+    value_field: str,
+    default: int,
+) -> List[Tuple[str, int]]:
+    """Parse a CSV or NDJSON upload into (device_id, value) pairs."""
+    try:
+        text = data.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise ValueError("Upload must be UTF-8 encoded")
+    
+    is_ndjson = filename.endswith((".ndjson", ".jsonl")) or text.lstrip().startswith("{")
+    grants = []
+    
+    if is_ndjson:
+        for line_no, line in enumerate(text.splitlines(), 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                row = json.loads(line)
+                grants.append((str(row["device_id"]).strip(), int(row.get(value_field, default))))
+            except (ValueError, KeyError, TypeError, AttributeError):
+                raise ValueError(f"Invalid NDJSON row at line {line_no}")
+        return grants
+    
+    for line_no, row in enumerate(csv.reader(io.StringIO(text)), 1):
+        if not row or not row[0].strip():
+            continue
+        device_id = row[0].strip()
+        if line_no == 1 and device_id.lower() == "device_id":
+            continue
+        try:
+            value = int(row[1]) if len(row) > 1 and row[1].strip() else default
+        except ValueError:
+            raise ValueError(f"Invalid {value_field} at line {line_no}")
+        grants.append((device_id, value))
+    return grants
@@ -1,38 +1,148 @@
 """Article API endpoints."""
-from fastapi import APIRouter, HTTPException, status, UploadFile, File, Form
+import asyncio
+from typing import List, Optional, Tuple
+from fastapi import APIRouter, HTTPException, status, UploadFile, File, Form, Header, Query, Response
+from fastapi.responses import StreamingResponse
 
+from app.core.etag import etag_matches
+from app.core.metrics import (
+    record_article_extract,
+    record_token_consumed,
+    record_transcription,
+    transcription_timer,
+)
+from app.core.timing import stage
+from app.core.watchdog import current_route
 from app.schemas.article import (
+    ArticleParagraphs,
     ExtractRequest,
     ExtractResponse,
     TranscribeResponse,
+    MarginNote,
     SyncNotionRequest,
     SyncNotionResponse,
+    SyncJobResponse,
+    ExportRequest,
 )
+from app.services.article_cache import CachedArticle, get_article_cache, iter_paragraph_stream
 from app.services.article_service import get_article_service
+from app.services.export_service import FILE_EXTENSIONS, MEDIA_TYPES, iter_export
+from app.services.margin_store import get_margin_store, normalize_article_url
 from app.services.transcribe_service import get_transcribe_service
 from app.services.notion_service import get_notion_service
-from app.services.token_service import get_token_service
+from app.services.notion_sync_queue import SyncJob, get_notion_sync_queue
+from app.services.token_service import get_token_service, run_token_write
 
 router = APIRouter()
 
 
 @router.post("/extract", response_model=ExtractResponse)
-async def extract_article(request: ExtractRequest) -> ExtractResponse:
+async def extract_article(request: ExtractRequest) -> Response:
     """Extract article content from a URL.
     
     This endpoint is free (no token required).
     """
-    article_service = get_article_service()
+    return await _extract(request.url)
+
+
+@router.get("/extract", response_model=ExtractResponse)
+async def get_article(
+    url: str = Query(..., min_length=1),
+    if_none_match: Optional[str] = Header(None),
+) -> Response:
+    """Cacheable form of POST /extract.
+    
+    Responses carry an ETag of their content; a returning reader that
+    sends it back in If-None-Match gets a 304 when the article is
+    unchanged.
+    """
+    return await _extract(url, if_none_match)
+
+
+@router.get("/extract/stream")
+async def stream_article(
+    url: str = Query(..., min_length=1),
+    first_page: int = Query(10, ge=1, le=200),
+) -> StreamingResponse:
+    """Stream an article as NDJSON: metadata, the first page, then the rest.
+    
+    Readers can render the first paragraphs without waiting for the whole
+    article to be transferred and parsed.
+    """
+    article = await _cached_article(url, "/api/extract/stream")
+    return StreamingResponse(
+        iter_paragraph_stream(article, first_page=first_page),
+        media_type="application/x-ndjson",
+        headers={"ETag": article.etag, "Cache-Control": "no-cache"},
+    )
+
+
+@router.get("/extract/paragraphs", response_model=ArticleParagraphs)
+async def get_article_paragraphs(
+    url: str = Query(..., min_length=1),
+    start: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=200),
+) -> ArticleParagraphs:
+    """A range of an article's paragraphs, served from the article cache.
+    
+    Only articles already loaded through ``/extract`` or ``/extract/stream``
+    can be paged; others return 404. Paging is rate limited more loosely
+    than extraction, so it must never start an extraction itself.
+    """
+    try:
+        article = await get_article_cache().get(url)
+    except Exception:
+        # The in-flight extraction failed; its own request reports why
+        article = None
+    if article is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Article is not loaded; fetch it from /api/extract first",
+        )
+    paragraphs = article.paragraphs[start:start + limit]
+    end = start + len(paragraphs)
+    return ArticleParagraphs(
+        source_url=article.response.source_url,
+        start=start,
+        paragraphs=paragraphs,
+        total=len(article.paragraphs),
+        next_start=end if end < len(article.paragraphs) else None,
+    )
+
+
+async def _extract(url: str, if_none_match: Optional[str] = None) -> Response:
+    article = await _cached_article(url, "/api/extract")
+    # no-cache: browsers may store the article but must revalidate it
+    headers = {"ETag": article.etag, "Cache-Control": "no-cache"}
+    if etag_matches(if_none_match, article.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=article.body, media_type="application/json", headers=headers)
+
+
+async def _cached_article(url: str, route: str) -> CachedArticle:
+    """Extract an article, or reuse a recent extraction of the same URL."""
+    # The shared extraction task inherits this, so the watchdog can
+    # attribute its blocking to the route that started it
+    current_route.set(route)
+    
+    async def create() -> CachedArticle:
+        with stage("extract", "upstream"):
+            result = await get_article_service().extract(url)
+        with stage("extract", "response"):
+            return CachedArticle.from_result(result)
     
     try:
-        result = await article_service.extract(request.url)
-        return ExtractResponse(**result)
+        article = await get_article_cache().get_or_create(url, create)
+        record_article_extract("success")
+        return article
     except ValueError as e:
+        record_article_extract("error")
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e),
         )
     except Exception as e:
+        record_article_extract("error")
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail=f"Failed to extract article: {str(e)}",
@@ -57,23 +167,26 @@ async def transcribe_audio(
     
     token_service = get_token_service()
     
-    # Check if user can transcribe
-    if not token_service.can_generate(device_id):
-        raise HTTPException(
-            status_code=status.HTTP_402_PAYMENT_REQUIRED,
-            detail="No tokens remaining. Please purchase more to continue.",
-        )
-    
-    # Use a token
-    use_result = token_service.use_token(device_id)
-    if not use_result.success:
-        raise HTTPException(
-            status_code=status.HTTP_402_PAYMENT_REQUIRED,
-            detail=use_result.message,
-        )
+    with stage("transcribe", "token_check"):
+        # Check if user can transcribe
+        if not token_service.can_generate(device_id):
+            raise HTTPException(
+                status_code=status.HTTP_402_PAYMENT_REQUIRED,
+                detail="No tokens remaining. Please purchase more to continue.",
+            )
+        
+        # Use a token
+        use_result = await run_token_write(token_service.use_token, device_id)
+        if not use_result.success:
+            raise HTTPException(
+                status_code=status.HTTP_402_PAYMENT_REQUIRED,
+                detail=use_result.message,
+            )
+    record_token_consumed()
     
     # Read audio data
-    audio_data = await audio.read()
+    with stage("transcribe", "upload_read"):
+        audio_data = await audio.read()
     if len(audio_data) == 0:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -83,21 +196,26 @@ async def transcribe_audio(
     # Transcribe
     transcribe_service = get_transcribe_service()
     try:
-        result = await transcribe_service.transcribe(
-            audio_data,
-            filename=audio.filename or "audio.webm",
-        )
+        with transcription_timer(), stage("transcribe", "upstream"):
+            result = await transcribe_service.transcribe(
+                audio_data,
+                filename=audio.filename or "audio.webm",
+            )
         
-        # Get remaining tokens
-        status_info = token_service.get_token_status(device_id)
-        
-        return TranscribeResponse(
-            text=result["text"],
-            language=result.get("language"),
-            duration_seconds=result.get("duration_seconds"),
-            tokens_remaining=status_info.remaining_tokens,
-        )
+        with stage("transcribe", "response"):
+            # Get remaining tokens
+            status_info = token_service.get_token_status(device_id)
+            
+            response = TranscribeResponse(
+                text=result["text"],
+                language=result.get("language"),
+                duration_seconds=result.get("duration_seconds"),
+                tokens_remaining=status_info.remaining_tokens,
+            )
+        record_transcription("success")
+        return response
     except Exception as e:
+        record_transcription("error")
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail=f"Transcription failed: {str(e)}",
@@ -108,6 +226,83 @@ async def transcribe_audio(
 async def sync_to_notion(request: SyncNotionRequest) -> SyncNotionResponse:
     """Sync margin notes to Notion.
     
+    Uploaded margins are merged into the stored margins for the article,
+    and all stored margins are synced.
+    This endpoint is free (no token required).
+    """
+    with stage("sync-notion", "store"):
+        article_url, margins = _margins_to_sync(request)
+    
+    notion_service = get_notion_service(request.notion_token, request.notion_database_id)
+    with stage("sync-notion", "upstream"):
+        result = await notion_service.sync_margins(
+            article_title=request.article_title,
+            article_url=article_url,
+            margins=margins,
+            device_id=request.device_id,
+        )
+    
+    if not result["success"]:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=result["message"],
+        )
+    
+    with stage("sync-notion", "response"):
+        return SyncNotionResponse(**result)
+
+
+@router.post(
+    "/sync-notion/jobs",
+    response_model=SyncJobResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+async def enqueue_notion_sync(request: SyncNotionRequest) -> SyncJobResponse:
+    """Queue a Notion sync and return a job id to poll.
+    
+    Repeated syncs of the same article while one is still queued are
+    merged into that job.
+    """
+    article_url, margins = _margins_to_sync(request)
+    
+    try:
+        job = get_notion_sync_queue().submit(
+            device_id=request.device_id,
+            article_title=request.article_title,
+            article_url=article_url,
+            margins=margins,
+            notion_token=request.notion_token,
+            notion_database_id=request.notion_database_id,
+        )
+    except asyncio.QueueFull:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Sync queue is full, please retry shortly",
+            headers={"Retry-After": "5"},
+        )
+    
+    return _job_response(job)
+
+
+@router.get("/sync-notion/jobs/{job_id}", response_model=SyncJobResponse)
+async def get_notion_sync_job(job_id: str) -> SyncJobResponse:
+    """Get the status of a queued Notion sync."""
+    job = get_notion_sync_queue().get(job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Sync job not found",
+        )
+    return _job_response(job)
+
+
+@router.post("/export")
+async def export_margins(request: ExportRequest) -> StreamingResponse:
+    """Export margin notes as Markdown, NDJSON or Notion blocks.
+    
+    Exports the margins in the request, or the stored margins for the
+    article when none are sent. The document is streamed while it is
+    rendered, reading stored margins page by page.
     This endpoint is free (no token required).
     """
     if len(request.device_id) < 10:
@@ -116,23 +311,45 @@ async def sync_to_notion(request: SyncNotionRequest) -> SyncNotionResponse:
             detail="Invalid device_id",
         )
     
-    if not request.margins:
+    margins = request.margins or get_margin_store().iter_margins(request.device_id, request.article_url)
+    filename = f"margins.{FILE_EXTENSIONS[request.format]}"
+    return StreamingResponse(
+        iter_export(request.format, request.article_title, request.article_url, margins),
+        media_type=MEDIA_TYPES[request.format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+def _margins_to_sync(request: SyncNotionRequest) -> Tuple[str, List[MarginNote]]:
+    """Store the uploaded margins and return every margin for the article.
+    
+    Returns:
+        (normalized article URL, margins); the URL keys both the margin
+        store and the Notion page, so URL variants share one page
+    """
+    if len(request.device_id) < 10:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="No margins to sync",
+            detail="Invalid device_id",
         )
     
-    notion_service = get_notion_service()
-    result = await notion_service.sync_margins(
-        article_title=request.article_title,
-        article_url=request.article_url,
-        margins=request.margins,
-    )
+    article_url = normalize_article_url(request.article_url)
+    store = get_margin_store()
+    if request.margins:
+        store.upsert(request.device_id, article_url, request.margins)
+    margins = list(store.iter_margins(request.device_id, article_url))
     
-    if not result["success"]:
+    if not margins:
         raise HTTPException(
-            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-            detail=result["message"],
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No margins to sync",
         )
-    
-    return SyncNotionResponse(**result)
+    return article_url, margins
+
+
+def _job_response(job: SyncJob) -> SyncJobResponse:
+    return SyncJobResponse(
+        job_id=job.id,
+        status=job.status,
+        result=SyncNotionResponse(**job.result) if job.result else None,
+    )
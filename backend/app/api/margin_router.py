@@ -0,0 +1,57 @@
+"""Margin storage API endpoints."""
+import asyncio
+from fastapi import APIRouter, HTTPException, Query, status
+from typing import Optional
+
+from app.schemas.article import MarginUploadRequest, MarginUploadResponse, MarginPage, SearchResponse
+from app.services.margin_store import get_margin_store
+from app.services.search_index import get_search_index
+
+router = APIRouter()
+
+
+@router.post("/margins", response_model=MarginUploadResponse)
+async def upload_margins(request: MarginUploadRequest) -> MarginUploadResponse:
+    """Store new or changed margin notes for an article.
+    
+    Clients only need to send notes added or edited since the last upload.
+    """
+    store = get_margin_store()
+    stored = store.upsert(request.device_id, request.article_url, request.margins)
+    return MarginUploadResponse(
+        stored=stored,
+        total=store.count(request.device_id, request.article_url),
+    )
+
+
+@router.get("/margins", response_model=MarginPage)
+async def list_margins(
+    device_id: str = Query(..., min_length=10, max_length=100),
+    article_url: str = Query(...),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None),
+) -> MarginPage:
+    """List stored margin notes for an article, oldest first."""
+    try:
+        margins, next_cursor = get_margin_store().page(device_id, article_url, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        )
+    return MarginPage(margins=margins, next_cursor=next_cursor)
+
+
+@router.get("/margins/search", response_model=SearchResponse)
+async def search_margins(
+    device_id: str = Query(..., min_length=10, max_length=100),
+    q: str = Query(..., min_length=1, max_length=500),
+    limit: int = Query(20, ge=1, le=100),
+) -> SearchResponse:
+    """Search a device's highlights and voice notes, newest first.
+    
+    All words must match. Use ``word*`` for a prefix and
+    ``"several words"`` for a phrase.
+    """
+    hits = await asyncio.to_thread(get_search_index().search, device_id, q, limit)
+    return SearchResponse(hits=hits)
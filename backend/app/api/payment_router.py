@@ -1,43 +1,34 @@
 """Payment API endpoints (Creem integration)."""
+import asyncio
 import hmac
 import hashlib
+import json
+import uuid
 import httpx
-from fastapi import APIRouter, HTTPException, status, Request, Header
-from typing import Optional
+from fastapi import APIRouter, HTTPException, status, Request, Response, Header
+from typing import List, Optional
 
 from app.schemas.payment import CheckoutRequest, CheckoutResponse
 from app.services.token_service import get_token_service
+from app.services.catalog_service import PRODUCTS, get_product_catalog
+from app.services.checkout_cache import get_checkout_cache
+from app.services.creem_client import get_creem_client
+from app.services.idempotency_service import get_idempotency_store
+from app.services.webhook_queue import get_webhook_queue
 from app.config import get_settings
+from app.core.metrics import record_webhook, record_webhook_duplicate
+from app.core.timing import stage
 
 router = APIRouter()
 
 
-# Product configurations
-PRODUCTS = {
-    "pack_3": {"tokens": 3, "price": 2.99, "name": "3 Excuses Pack"},
-    "pack_10": {"tokens": 10, "price": 6.99, "name": "10 Excuses Pack"},
-}
-
-
-def get_creem_api_base(api_key: str) -> str:
-    """Use test API for test keys, production API for live keys."""
-    if api_key and api_key.startswith("creem_test_"):
-        return "https://test-api.creem.io/v1"
-    return "https://api.creem.io/v1"
-
-
-def get_creem_product_id(settings, product_type: str) -> Optional[str]:
-    """Get Creem product ID for a given product type."""
-    product_id_map = {
-        "pack_3": settings.creem_product_id_3,
-        "pack_10": settings.creem_product_id_10,
-    }
-    return product_id_map.get(product_type)
-
-
 @router.post("/checkout", response_model=CheckoutResponse)
 async def create_checkout(request: CheckoutRequest) -> CheckoutResponse:
-    """Create a Creem checkout session."""
+    """Create a Creem checkout session.
+    
+    Repeated requests for the same device, product and success URL within
+    a short window reuse the open session instead of creating another.
+    """
     settings = get_settings()
     
     if request.product_type not in PRODUCTS:
@@ -52,7 +43,8 @@ async def create_checkout(request: CheckoutRequest) -> CheckoutResponse:
             detail="Payment system is not configured. Please contact support.",
         )
     
-    creem_product_id = get_creem_product_id(settings, request.product_type)
+    catalog = get_product_catalog(settings)
+    creem_product_id = catalog.creem_product_ids.get(request.product_type)
     if not creem_product_id:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -61,46 +53,51 @@ async def create_checkout(request: CheckoutRequest) -> CheckoutResponse:
     
     product = PRODUCTS[request.product_type]
     
-    # Call Creem API to create checkout session
-    try:
-        async with httpx.AsyncClient() as client:
-            payload = {
-                "product_id": creem_product_id,
-                "success_url": request.success_url or "https://ai-excuse-generator.densematrix.ai/payment/success",
-                "metadata": {
-                    "product_type": request.product_type,
-                    "device_id": request.device_id,
-                    "tokens": str(product["tokens"]),
-                },
-            }
-            
-            response = await client.post(
-                f"{get_creem_api_base(settings.creem_api_key)}/checkouts",
-                headers={
-                    "Content-Type": "application/json",
-                    "x-api-key": settings.creem_api_key,
-                },
-                json=payload,
-                timeout=30.0,
-            )
-            
-            if response.status_code != 200:
-                raise HTTPException(
-                    status_code=status.HTTP_502_BAD_GATEWAY,
-                    detail=f"Creem API error: {response.text}",
+    async def create_session() -> CheckoutResponse:
+        # One key per session, shared by retries and hedged copies
+        idempotency_key = uuid.uuid4().hex
+        payload = {
+            "product_id": creem_product_id,
+            "success_url": request.success_url or "https://ai-excuse-generator.densematrix.ai/payment/success",
+            "metadata": {
+                "product_type": request.product_type,
+                "device_id": request.device_id,
+                "tokens": str(product["tokens"]),
+            },
+        }
+        
+        # Call Creem API to create checkout session
+        try:
+            with stage("checkout", "upstream"):
+                response = await get_creem_client().create_checkout(
+                    catalog.api_base,
+                    settings.creem_api_key,
+                    payload,
+                    idempotency_key=idempotency_key,
                 )
-            
+        except httpx.RequestError as e:
+            raise HTTPException(
+                status_code=status.HTTP_502_BAD_GATEWAY,
+                detail=f"Payment service error: {str(e)}",
+            )
+        
+        if response.status_code != 200:
+            raise HTTPException(
+                status_code=status.HTTP_502_BAD_GATEWAY,
+                detail=f"Creem API error: {response.text}",
+            )
+        
+        with stage("checkout", "response"):
             data = response.json()
             return CheckoutResponse(
                 checkout_url=data["checkout_url"],
                 session_id=data["id"],
             )
-            
-    except httpx.RequestError as e:
-        raise HTTPException(
-            status_code=status.HTTP_502_BAD_GATEWAY,
-            detail=f"Payment service error: {str(e)}",
-        )
+    
+    return await get_checkout_cache().get_or_create(
+        (request.device_id, request.product_type, request.success_url),
+        create_session,
+    )
 
 
 @router.post("/webhook")
@@ -108,7 +105,12 @@ async def handle_webhook(
     request: Request,
     creem_signature: Optional[str] = Header(None, alias="creem-signature"),
 ):
-    """Handle Creem webhook for payment completion."""
+    """Handle Creem webhook for payment completion.
+    
+    When asynchronous mode is enabled the verified raw body is written to
+    the durable webhook queue and acknowledged immediately; a background
+    consumer applies the ledger changes in batches.
+    """
     settings = get_settings()
     body = await request.body()
     
@@ -126,50 +128,116 @@ async def handle_webhook(
                 detail="Invalid webhook signature",
             )
     
-    payload = await request.json()
-    event_type = payload.get("eventType", "")
-    obj = payload.get("object", {})
-    metadata = obj.get("metadata", {})
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        payload = None
+    if not isinstance(payload, dict):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid webhook payload",
+        )
+    record_webhook(payload.get("eventType") or "unknown")
+    
+    # Both paths fsync before acknowledging, so keep them off the loop
+    webhook_queue = get_webhook_queue()
+    if webhook_queue is not None:
+        await asyncio.to_thread(webhook_queue.enqueue, body)
+        return {"received": True, "queued": True}
+    
+    if await asyncio.to_thread(apply_webhook_events, [payload]):
+        return {"received": True, "duplicate": True}
+    return {"received": True}
+
+
+def apply_webhook_events(payloads: List[dict]) -> int:
+    """Apply the ledger changes for a batch of webhook payloads.
+    
+    Each checkout is credited at most once; all token grants in the batch
+    are applied with a single bulk call, and all unlimited upgrades with
+    another. A failed call releases only its own claims, so a retry never
+    credits grants that already committed.
     
-    if event_type == "checkout.completed":
+    Returns:
+        Number of payloads skipped as duplicate deliveries
+    """
+    idempotency_store = get_idempotency_store()
+    grants = []
+    grant_keys = []
+    unlimited = []
+    unlimited_keys = []
+    completed = []
+    duplicates = 0
+    
+    for payload in payloads:
+        event_type = payload.get("eventType", "")
+        if event_type != "checkout.completed":
+            continue
+        
+        obj = payload.get("object", {})
+        metadata = obj.get("metadata", {})
         device_id = metadata.get("device_id")
         product_type = metadata.get("product_type")
+        product = PRODUCTS.get(product_type) if device_id and product_type else None
+        if not product:
+            continue
+        
+        # Creem retries deliveries; credit each checkout only once
+        event_id = obj.get("id") or payload.get("id")
+        event_key = None
+        if event_id:
+            event_key = f"{event_type}:{event_id}"
+            if not idempotency_store.claim(event_key):
+                record_webhook_duplicate(event_type)
+                duplicates += 1
+                continue
         
-        if device_id and product_type:
-            token_service = get_token_service()
-            product = PRODUCTS.get(product_type)
-            
-            if product:
-                if product_type == "unlimited":
-                    token_service.set_unlimited(device_id)
-                else:
-                    token_service.add_tokens(device_id, product["tokens"])
+        if product_type == "unlimited":
+            unlimited.append((device_id, 0))
+            keys = unlimited_keys
+        else:
+            grants.append((device_id, product["tokens"]))
+            keys = grant_keys
+        if event_key:
+            keys.append(event_key)
+        completed.append((device_id, product_type))
     
-    return {"received": True}
+    token_service = get_token_service()
+    _apply_claimed(token_service.bulk_add_tokens, grants, grant_keys)
+    _apply_claimed(token_service.bulk_set_unlimited, unlimited, unlimited_keys)
+    # The paid session must not be handed out again for the next purchase
+    checkout_cache = get_checkout_cache()
+    for device_id, product_type in completed:
+        checkout_cache.invalidate(device_id, product_type)
+    return duplicates
+
+
+def _apply_claimed(apply, grants: list, claimed: List[str]) -> None:
+    """Apply one bulk ledger change, releasing its claims if it fails."""
+    if not grants:
+        return
+    try:
+        apply(grants)
+    except Exception:
+        idempotency_store = get_idempotency_store()
+        for event_key in claimed:
+            idempotency_store.release(event_key)
+        raise
 
 
 @router.get("/products")
-async def get_products():
-    """Get available products with pricing."""
-    return {
-        "products": [
-            {
-                "id": "pack_3",
-                "name": "3 Excuses Pack",
-                "tokens": 3,
-                "price": 2.99,
-                "currency": "USD",
-                "description": "Perfect for trying out",
-                "popular": False,
-            },
-            {
-                "id": "pack_10",
-                "name": "10 Excuses Pack",
-                "tokens": 10,
-                "price": 6.99,
-                "currency": "USD",
-                "description": "Best value for regular users",
-                "popular": True,
-            },
-        ]
-    }
+async def get_products(if_none_match: Optional[str] = Header(None)):
+    """Get available products with pricing.
+    
+    The body is serialized once per catalog; clients that send the ETag
+    back get a 304.
+    """
+    catalog = get_product_catalog()
+    headers = {"ETag": catalog.products_etag}
+    if if_none_match and catalog.products_etag in if_none_match:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(
+        content=catalog.products_body,
+        media_type="application/json",
+        headers=headers,
+    )
@@ -11,6 +11,12 @@ class Settings(BaseSettings):
     # App settings
     app_name: str = "VoiceMargin"
     debug: bool = False
+    prewarm_imports: bool = True  # Load extraction/OpenAI libraries in the background after startup
+    
+    # Response compression: smallest body worth compressing, and the size
+    # above which compression runs in a worker thread instead of the loop
+    compression_minimum_size: int = 1024
+    compression_offload_size: int = 64 * 1024
     
     # OpenAI settings (for Whisper)
     openai_api_key: str = ""
@@ -19,26 +25,102 @@ class Settings(BaseSettings):
     # Notion settings
     notion_api_key: str = ""
     notion_database_id: Optional[str] = None
+    notion_max_concurrency: int = 3  # In-flight Notion requests per worker
+    notion_max_retries: int = 5  # Retries for rate-limited Notion calls
+    notion_sync_state_path: Optional[str] = None  # SQLite file for incremental sync state
+    notion_rate_limit: float = 3.0  # Requests/s per worker (Notion allows ~3/s per integration)
+    notion_sync_workers: int = 2  # Background sync worker tasks
+    notion_sync_max_pending: int = 1000  # Queued sync jobs before rejecting new ones
+    notion_sync_job_path: Optional[str] = None  # SQLite file sharing sync job status across workers
+    notion_client_pool_size: int = 256  # Per-user Notion tokens kept warm
+    notion_client_idle_seconds: int = 900  # Drop a user's client after this much idle time
+    notion_base_url: Optional[str] = None  # Override the Notion API root (proxies, local stubs)
+    
+    # Extracted articles kept for re-reads, paragraph paging and ETag revalidation
+    article_cache_size: int = 256
+    article_cache_ttl_seconds: int = 600
+    
+    # Rate limits per client IP (and per device where known), as "requests per second/burst"
+    rate_limit_enabled: bool = True
+    rate_limit_backend: str = "memory"  # "memory" (per worker) or "shared" (SQLite file shared by all workers)
+    rate_limit_store_path: str = "/dev/shm/voicemargin/rate_limits.db"
+    rate_limit_extract: str = "1/20"
+    rate_limit_paging: str = "10/60"  # Cached paragraph pages of an extracted article
+    rate_limit_transcribe: str = "1/10"
+    rate_limit_tokens: str = "5/30"
+    rate_limit_default: str = "20/100"
+    
+    # Admission control: "concurrency/queue" per route class, plus the
+    # CoDel target queueing delay and interval, and the longest wait for a slot
+    admission_enabled: bool = True
+    admission_extract: str = "16/64"
+    admission_transcribe: str = "16/64"
+    admission_sync: str = "8/32"
+    admission_default: str = "256/1024"
+    admission_target_delay: float = 0.1
+    admission_interval: float = 0.5
+    admission_max_wait: float = 5.0
     
     # Database settings
     database_url: Optional[str] = None
+    margin_store_path: Optional[str] = None  # SQLite file for stored margins (in memory when unset)
+    search_backend: str = "memory"  # "memory" (per worker, backfilled at startup) or "sqlite" (FTS5, use with several workers)
+    search_index_path: str = "data/search.db"
     
     # Creem payment settings
     creem_api_key: Optional[str] = None
     creem_webhook_secret: Optional[str] = None
     creem_product_ids: Optional[str] = None
+    creem_api_base: Optional[str] = None  # Override the API root picked from the key
     
+    creem_product_id_3: Optional[str] = None
     creem_product_id_10: Optional[str] = None
     creem_product_id_50: Optional[str] = None
     
+    # Creem client: overall latency budget, per-attempt timeout, retries, hedging
+    creem_budget_seconds: float = 10.0
+    creem_attempt_timeout: float = 5.0
+    creem_max_retries: int = 2
+    creem_hedge_enabled: bool = False  # Only hedges calls sent with an Idempotency-Key
+    
+    # Reuse an open checkout session for repeated clicks within this window
+    checkout_session_ttl_seconds: int = 120
+    
+    # Webhook deduplication (SQLite backing store is optional)
+    webhook_dedup_window_seconds: int = 7 * 24 * 3600
+    webhook_dedup_max_entries: int = 100_000
+    webhook_dedup_path: Optional[str] = None
+    
+    # Asynchronous webhook processing via a durable local queue
+    webhook_async: bool = False
+    webhook_queue_path: str = "data/webhook_queue.db"
+    webhook_queue_batch_size: int = 100
+    
+    # Event-loop lag sampling interval in seconds (0 disables the monitor)
+    loop_lag_interval: float = 0.5
+    # Record callbacks that block the loop longer than this many seconds (0 disables)
+    loop_watchdog_threshold: float = 0.0
+    
     # Free trial settings
     free_trial_count: int = 10  # 10 free transcriptions
     
+    # Token storage: "memory" (per process) or "shared" (SQLite file shared by all workers)
+    token_backend: str = "memory"
+    token_store_path: str = "/dev/shm/voicemargin/tokens.db"
+    
+    # Token event log for the memory backend (disabled when no directory is set)
+    token_event_log_dir: Optional[str] = None
+    token_event_log_group_commit: int = 256  # Events per group commit
+    token_event_log_snapshot_every: int = 100_000  # Events between snapshots
+    token_event_log_fsync: bool = True
+    
     def model_post_init(self, __context) -> None:
         """Parse creem_product_ids JSON into individual fields."""
         if self.creem_product_ids:
             try:
                 product_ids = json.loads(self.creem_product_ids)
+                if not self.creem_product_id_3:
+                    object.__setattr__(self, "creem_product_id_3", product_ids.get("pack_3"))
                 if not self.creem_product_id_10:
                     object.__setattr__(self, "creem_product_id_10", product_ids.get("pack_10"))
                 if not self.creem_product_id_50:
@@ -0,0 +1,215 @@
+"""Admission control and load shedding for in-flight requests."""
+from collections import deque
+from typing import Deque, List, Optional, Sequence, Tuple
+import asyncio
+import time
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core.metrics import (
+    observe_admission_queue_delay,
+    record_admission_shed,
+    set_admission_in_flight,
+    set_admission_limit,
+    set_admission_queue_depth,
+)
+
+
+class AdmissionController:
+    """Bounds the concurrent requests of one route class.
+    
+    Up to ``max_concurrency`` requests run at once; up to ``max_queue``
+    more wait for a slot, each for at most ``max_wait`` seconds. Anything
+    beyond that is shed straight away.
+    
+    The queue is managed CoDel-style: once every request leaving the queue
+    for ``interval`` seconds has waited longer than ``target_delay``, the
+    queue is standing rather than absorbing a burst, so waiters over the
+    target are shed and new arrivals are turned away until it drains.
+    Shed requests fail fast instead of piling up behind a slow upstream.
+    """
+    
+    def __init__(
+        self,
+        name: str,
+        max_concurrency: int,
+        max_queue: int,
+        target_delay: float = 0.1,
+        interval: float = 0.5,
+        max_wait: float = 5.0,
+    ):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.target_delay = target_delay
+        self.interval = interval
+        self.max_wait = max_wait
+        self.in_flight = 0
+        self.dropping = False
+        self._first_above = 0.0
+        self._waiters: Deque[Tuple[float, asyncio.Future]] = deque()
+        set_admission_limit(name, max_concurrency, max_queue)
+    
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+    
+    async def acquire(self) -> Optional[str]:
+        """Take a slot, waiting if needed.
+        
+        Returns:
+            None once admitted, otherwise why the request was shed
+            ("queue_full", "queue_delay" or "timeout")
+        """
+        if self.in_flight < self.max_concurrency and not self._waiters:
+            self.in_flight += 1
+            self._report()
+            return None
+        if len(self._waiters) >= self.max_queue:
+            return "queue_full"
+        if self.dropping:
+            return "queue_delay"
+        
+        future = asyncio.get_running_loop().create_future()
+        entry = (time.monotonic(), future)
+        self._waiters.append(entry)
+        self._report()
+        try:
+            await asyncio.wait((future,), timeout=self.max_wait)
+        except asyncio.CancelledError:
+            # The client went away; give back a slot granted meanwhile
+            if future.done() and future.result() is None:
+                self.release()
+            else:
+                self._abandon(entry)
+            raise
+        if not future.done():
+            self._abandon(entry)
+            return "timeout"
+        return future.result()
+    
+    def release(self) -> None:
+        """Free a slot and hand it to the next waiter that is still worth serving."""
+        self.in_flight -= 1
+        now = time.monotonic()
+        while self._waiters:
+            enqueued_at, future = self._waiters.popleft()
+            sojourn = now - enqueued_at
+            observe_admission_queue_delay(self.name, sojourn)
+            if self._should_drop(sojourn, now):
+                future.set_result("queue_delay")
+                continue
+            self.in_flight += 1
+            future.set_result(None)
+            break
+        if not self._waiters:
+            self._reset()
+        self._report()
+    
+    def _should_drop(self, sojourn: float, now: float) -> bool:
+        if sojourn < self.target_delay:
+            self._reset()
+            return False
+        if not self._first_above:
+            self._first_above = now + self.interval
+        elif now >= self._first_above:
+            self.dropping = True
+        return self.dropping
+    
+    def _reset(self) -> None:
+        self.dropping = False
+        self._first_above = 0.0
+    
+    def _abandon(self, entry: Tuple[float, asyncio.Future]) -> None:
+        entry[1].cancel()
+        try:
+            self._waiters.remove(entry)
+        except ValueError:
+            pass
+        if not self._waiters:
+            self._reset()
+        self._report()
+    
+    def _report(self) -> None:
+        set_admission_in_flight(self.name, self.in_flight)
+        set_admission_queue_depth(self.name, len(self._waiters))
+
+
+class AdmissionMiddleware:
+    """Admit requests through the controller of the first matching route class.
+    
+    Paths matching no class, or an ``exempt`` prefix, are not limited.
+    Shed requests get a 503 with ``Retry-After`` without reaching the
+    application.
+    """
+    
+    def __init__(
+        self,
+        app: ASGIApp,
+        classes: Sequence[Tuple[Tuple[str, ...], AdmissionController]],
+        exempt: Sequence[str] = (),
+    ):
+        self.app = app
+        self.classes = list(classes)
+        self.exempt = tuple(exempt)
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        path = scope["path"]
+        controller = None
+        if not path.startswith(self.exempt):
+            controller = next(
+                (controller for prefixes, controller in self.classes if path.startswith(prefixes)),
+                None,
+            )
+        if controller is None:
+            await self.app(scope, receive, send)
+            return
+        
+        reason = await controller.acquire()
+        if reason is not None:
+            record_admission_shed(controller.name, reason)
+            response = JSONResponse(
+                {"detail": "Server is busy, please retry shortly."},
+                status_code=503,
+                headers={"Retry-After": "1"},
+            )
+            await response(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            controller.release()
+
+
+def _limits(spec: str) -> Tuple[int, int]:
+    """Parse ``"concurrency/queue"`` such as ``"16/64"``."""
+    concurrency, _, queue = spec.partition("/")
+    return int(concurrency), int(queue or 0)
+
+
+# Left out so operators can still look inside an overloaded server
+ADMISSION_EXEMPT = ("/api/admin/", "/api/metrics")
+
+
+def admission_classes(settings) -> List[Tuple[Tuple[str, ...], AdmissionController]]:
+    """Route classes from the admission_* settings, most specific first."""
+    classes = [
+        ("extract", ("/api/extract",), settings.admission_extract),
+        ("transcribe", ("/api/transcribe",), settings.admission_transcribe),
+        ("sync", ("/api/sync-notion", "/api/export"), settings.admission_sync),
+        ("default", ("/api/",), settings.admission_default),
+    ]
+    return [
+        (prefixes, AdmissionController(
+            name,
+            *_limits(spec),
+            target_delay=settings.admission_target_delay,
+            interval=settings.admission_interval,
+            max_wait=settings.admission_max_wait,
+        ))
+        for name, prefixes, spec in classes
+    ]
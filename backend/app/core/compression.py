@@ -0,0 +1,144 @@
+"""Negotiated response compression."""
+from typing import Callable, Dict, Optional
+import asyncio
+import gzip
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.metrics import record_compression
+
+try:
+    import brotli
+except ImportError:  # optional, enables "br"
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # optional, enables "zstd"
+    zstandard = None
+
+
+def _gzip(body: bytes) -> bytes:
+    return gzip.compress(body, compresslevel=6, mtime=0)
+
+
+def _brotli(body: bytes) -> bytes:
+    # Quality 4 compresses JSON better than gzip -6 at similar speed
+    return brotli.compress(body, quality=4)
+
+
+def _zstd(body: bytes) -> bytes:
+    # Compressors are not thread-safe, so one per call
+    return zstandard.ZstdCompressor(level=3).compress(body)
+
+
+# Server preference order, used to break ties between equal q-values
+ENCODERS: Dict[str, Callable[[bytes], bytes]] = {"gzip": _gzip}
+if brotli is not None:
+    ENCODERS = {"br": _brotli, **ENCODERS}
+if zstandard is not None:
+    ENCODERS = {"zstd": _zstd, **ENCODERS}
+
+COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+)
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """Best supported encoding for an Accept-Encoding header, if any."""
+    weights = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        if name:
+            weights[name.strip()] = weight
+    
+    best, best_weight = None, 0.0
+    wildcard = weights.get("*", 0.0)
+    for name in ENCODERS:
+        weight = weights.get(name, wildcard)
+        if weight > best_weight:
+            best, best_weight = name, weight
+    return best
+
+
+class CompressionMiddleware:
+    """Compress complete responses with the client's preferred encoding.
+    
+    Supports zstd and brotli when their packages are installed, and gzip
+    always. Bodies under ``minimum_size`` are sent as is, and those over
+    ``offload_size`` are compressed in a worker thread so the event loop
+    keeps serving other requests. Streamed responses pass through
+    untouched. Strong ETags are weakened on compressed responses, since
+    the bytes on the wire no longer match the uncompressed representation.
+    """
+    
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024, offload_size: int = 64 * 1024):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.offload_size = offload_size
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        
+        start_message: Optional[Message] = None
+        passthrough = False
+        
+        async def send_compressed(message: Message) -> None:
+            nonlocal start_message, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            
+            # First body message
+            passthrough = True
+            body = message.get("body", b"")
+            headers = MutableHeaders(scope=start_message)
+            if (
+                message.get("more_body", False)
+                or len(body) < self.minimum_size
+                or "content-encoding" in headers
+                or not headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES)
+            ):
+                await send(start_message)
+                await send(message)
+                return
+            
+            encoder = ENCODERS[encoding]
+            if len(body) >= self.offload_size:
+                compressed = await asyncio.to_thread(encoder, body)
+            else:
+                compressed = encoder(body)
+            record_compression(encoding, len(body), len(compressed))
+            
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(compressed))
+            headers.add_vary_header("Accept-Encoding")
+            etag = headers.get("etag")
+            if etag and not etag.startswith("W/"):
+                headers["ETag"] = "W/" + etag
+            await send(start_message)
+            await send({"type": "http.response.body", "body": compressed})
+        
+        await self.app(scope, receive, send_compressed)
@@ -1,7 +1,7 @@
 """
 Prometheus Metrics for VoiceMargin
 """
-from prometheus_client import Counter, Histogram
+from prometheus_client import Counter, Gauge, Histogram
 import os
 
 TOOL_SLUG = os.getenv("TOOL_SLUG", "voicemargin")
@@ -13,12 +13,95 @@ PAYMENT_COUNTER = Counter(
     ['tool', 'status']
 )
 
+CREEM_REQUEST_LATENCY = Histogram(
+    'creem_request_latency_seconds',
+    'Creem API request latency by outcome',
+    ['tool', 'outcome'],
+    buckets=[0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 10.0]
+)
+
+CREEM_RETRY_COUNTER = Counter(
+    'creem_request_retries_total',
+    'Extra Creem requests sent as retries or hedges',
+    ['tool', 'reason']
+)
+
 WEBHOOK_COUNTER = Counter(
     'creem_webhook_total',
     'Total webhook events received',
     ['tool', 'event']
 )
 
+WEBHOOK_DUPLICATE_COUNTER = Counter(
+    'creem_webhook_duplicate_total',
+    'Duplicate webhook deliveries rejected by the idempotency store',
+    ['tool', 'event']
+)
+
+WEBHOOK_QUEUE_DEPTH = Gauge(
+    'creem_webhook_queue_depth',
+    'Webhook events waiting in the local queue',
+    ['tool']
+)
+
+WEBHOOK_QUEUE_LAG = Histogram(
+    'creem_webhook_queue_lag_seconds',
+    'Time from webhook acknowledgement to ledger update',
+    ['tool'],
+    buckets=[0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0]
+)
+
+# Response compression metrics
+COMPRESSED_RESPONSES = Counter(
+    'http_compressed_responses_total',
+    'Responses compressed by the compression middleware',
+    ['tool', 'encoding']
+)
+
+COMPRESSION_BYTES_SAVED = Counter(
+    'http_compression_bytes_saved_total',
+    'Response bytes saved by compression',
+    ['tool', 'encoding']
+)
+
+RATE_LIMITED_COUNTER = Counter(
+    'http_rate_limited_total',
+    'Requests rejected with 429 by route group',
+    ['tool', 'group']
+)
+
+# Admission control metrics (see app/core/admission.py)
+ADMISSION_LIMIT = Gauge(
+    'admission_limit',
+    'Configured concurrency and queue limits per route class',
+    ['tool', 'route_class', 'kind']
+)
+
+ADMISSION_IN_FLIGHT = Gauge(
+    'admission_in_flight',
+    'Requests currently running per route class',
+    ['tool', 'route_class']
+)
+
+ADMISSION_QUEUE_DEPTH = Gauge(
+    'admission_queue_depth',
+    'Requests waiting for a slot per route class',
+    ['tool', 'route_class']
+)
+
+ADMISSION_QUEUE_DELAY = Histogram(
+    'admission_queue_delay_seconds',
+    'Time requests waited for a slot',
+    ['tool', 'route_class'],
+    buckets=[0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0]
+)
+
+ADMISSION_SHED = Counter(
+    'admission_shed_total',
+    'Requests shed with 503 by route class and reason',
+    ['tool', 'route_class', 'reason']
+)
+
 # Transcription metrics
 TRANSCRIPTION_COUNTER = Counter(
     'transcription_total',
@@ -45,15 +128,126 @@ ARTICLE_EXTRACT_COUNTER = Counter(
     ['tool', 'status']
 )
 
+ARTICLE_CACHE_COUNTER = Counter(
+    'article_cache_total',
+    'Article cache lookups by result',
+    ['tool', 'result']
+)
+
+# Request stage metrics (see app/core/timing.py)
+STAGE_LATENCY = Histogram(
+    'request_stage_latency_seconds',
+    'Latency of individual request stages',
+    ['tool', 'route', 'stage'],
+    buckets=[0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0]
+)
+
+EVENT_LOOP_LAG = Histogram(
+    'event_loop_lag_seconds',
+    'How late the event loop woke a sleeping task',
+    ['tool'],
+    buckets=[0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0]
+)
+
+EVENT_LOOP_BLOCKS = Counter(
+    'event_loop_blocks_total',
+    'Callbacks that blocked the event loop past the watchdog threshold',
+    ['tool', 'route', 'service']
+)
+
+EVENT_LOOP_BLOCK_DURATION = Histogram(
+    'event_loop_block_seconds',
+    'How long blocking callbacks held the event loop',
+    ['tool', 'route', 'service'],
+    buckets=[0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0]
+)
+
+# Notion sync metrics
+NOTION_SYNC_LATENCY = Histogram(
+    'notion_sync_latency_seconds',
+    'End-to-end Notion sync latency',
+    ['tool', 'status'],
+    buckets=[0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0, 60.0]
+)
+
+NOTION_API_CALLS = Counter(
+    'notion_api_calls_total',
+    'Notion API calls by method and outcome',
+    ['tool', 'method', 'status']
+)
+
+NOTION_SYNC_QUEUE_DEPTH = Gauge(
+    'notion_sync_queue_depth',
+    'Notion sync jobs waiting for a worker',
+    ['tool']
+)
+
+NOTION_THROTTLE_WAIT = Histogram(
+    'notion_throttle_wait_seconds',
+    'Time Notion calls waited for the rate limiter',
+    ['tool'],
+    buckets=[0.0, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0]
+)
+
 
 def record_payment(status: str):
     PAYMENT_COUNTER.labels(tool=TOOL_SLUG, status=status).inc()
 
 
+def observe_creem_latency(outcome: str, seconds: float):
+    CREEM_REQUEST_LATENCY.labels(tool=TOOL_SLUG, outcome=outcome).observe(seconds)
+
+
+def record_creem_retry(reason: str):
+    CREEM_RETRY_COUNTER.labels(tool=TOOL_SLUG, reason=reason).inc()
+
+
 def record_webhook(event: str):
     WEBHOOK_COUNTER.labels(tool=TOOL_SLUG, event=event).inc()
 
 
+def record_webhook_duplicate(event: str):
+    WEBHOOK_DUPLICATE_COUNTER.labels(tool=TOOL_SLUG, event=event).inc()
+
+
+def set_webhook_queue_depth(depth: int):
+    WEBHOOK_QUEUE_DEPTH.labels(tool=TOOL_SLUG).set(depth)
+
+
+def observe_webhook_queue_lag(seconds: float):
+    WEBHOOK_QUEUE_LAG.labels(tool=TOOL_SLUG).observe(seconds)
+
+
+def record_compression(encoding: str, original_size: int, compressed_size: int):
+    COMPRESSED_RESPONSES.labels(tool=TOOL_SLUG, encoding=encoding).inc()
+    COMPRESSION_BYTES_SAVED.labels(tool=TOOL_SLUG, encoding=encoding).inc(original_size - compressed_size)
+
+
+def record_rate_limited(group: str):
+    RATE_LIMITED_COUNTER.labels(tool=TOOL_SLUG, group=group).inc()
+
+
+def set_admission_limit(route_class: str, concurrency: int, queue: int):
+    ADMISSION_LIMIT.labels(tool=TOOL_SLUG, route_class=route_class, kind="concurrency").set(concurrency)
+    ADMISSION_LIMIT.labels(tool=TOOL_SLUG, route_class=route_class, kind="queue").set(queue)
+
+
+def set_admission_in_flight(route_class: str, count: int):
+    ADMISSION_IN_FLIGHT.labels(tool=TOOL_SLUG, route_class=route_class).set(count)
+
+
+def set_admission_queue_depth(route_class: str, depth: int):
+    ADMISSION_QUEUE_DEPTH.labels(tool=TOOL_SLUG, route_class=route_class).set(depth)
+
+
+def observe_admission_queue_delay(route_class: str, seconds: float):
+    ADMISSION_QUEUE_DELAY.labels(tool=TOOL_SLUG, route_class=route_class).observe(seconds)
+
+
+def record_admission_shed(route_class: str, reason: str):
+    ADMISSION_SHED.labels(tool=TOOL_SLUG, route_class=route_class, reason=reason).inc()
+
+
 def record_transcription(status: str):
     TRANSCRIPTION_COUNTER.labels(tool=TOOL_SLUG, status=status).inc()
 
@@ -66,5 +260,34 @@ def record_article_extract(status: str):
     ARTICLE_EXTRACT_COUNTER.labels(tool=TOOL_SLUG, status=status).inc()
 
 
+def record_article_cache(result: str):
+    ARTICLE_CACHE_COUNTER.labels(tool=TOOL_SLUG, result=result).inc()
+
+
 def transcription_timer():
     return TRANSCRIPTION_LATENCY.labels(tool=TOOL_SLUG).time()
+
+
+def observe_event_loop_lag(seconds: float):
+    EVENT_LOOP_LAG.labels(tool=TOOL_SLUG).observe(seconds)
+
+
+def record_loop_block(route: str, service: str, seconds: float):
+    EVENT_LOOP_BLOCKS.labels(tool=TOOL_SLUG, route=route, service=service).inc()
+    EVENT_LOOP_BLOCK_DURATION.labels(tool=TOOL_SLUG, route=route, service=service).observe(seconds)
+
+
+def observe_notion_sync(status: str, seconds: float):
+    NOTION_SYNC_LATENCY.labels(tool=TOOL_SLUG, status=status).observe(seconds)
+
+
+def record_notion_api_call(method: str, status: str):
+    NOTION_API_CALLS.labels(tool=TOOL_SLUG, method=method, status=status).inc()
+
+
+def set_notion_sync_queue_depth(depth: int):
+    NOTION_SYNC_QUEUE_DEPTH.labels(tool=TOOL_SLUG).set(depth)
+
+
+def observe_notion_throttle_wait(seconds: float):
+    NOTION_THROTTLE_WAIT.labels(tool=TOOL_SLUG).observe(seconds)
@@ -0,0 +1,145 @@
+"""Sampling profiler and event-loop lag monitor."""
+from collections import Counter
+from types import CodeType, FrameType
+from typing import Dict, List, Optional
+import asyncio
+import os
+import sys
+import threading
+import time
+
+from app.core.metrics import observe_event_loop_lag
+
+
+_labels: Dict[CodeType, str] = {}
+
+
+def _short_path(filename: str) -> str:
+    """Path relative to site-packages or the app package."""
+    _, found, tail = filename.rpartition("site-packages" + os.sep)
+    if found:
+        return tail
+    _, found, tail = filename.rpartition(os.sep + "app" + os.sep)
+    if found:
+        return "app" + os.sep + tail
+    return filename
+
+
+def _frame_label(frame: FrameType) -> str:
+    """``function (path:line)``, cached per code object."""
+    code = frame.f_code
+    label = _labels.get(code)
+    if label is None:
+        label = _labels[code] = f"{code.co_name} ({_short_path(code.co_filename)}:{code.co_firstlineno})"
+    return label
+
+
+def collapse_stack(frame: Optional[FrameType]) -> List[str]:
+    """Frame labels from the outermost call to ``frame``."""
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    labels.reverse()
+    return labels
+
+
+class SamplingProfiler:
+    """Samples the stacks of every thread at a fixed interval.
+    
+    Sampling runs in a background thread using ``sys._current_frames()``,
+    so the profiled code is never instrumented: the cost is one stack walk
+    per thread per interval. Output is in the collapsed format read by
+    flamegraph.pl, speedscope and similar tools, one ``stack count`` line
+    per distinct stack with the thread name as the root frame.
+    """
+    
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+    
+    def start(self) -> None:
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+    
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+    
+    def sample(self) -> None:
+        """Record the current stack of every other thread."""
+        own_id = threading.get_ident()
+        names: Dict[int, str] = {thread.ident: thread.name for thread in threading.enumerate()}
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_id:
+                continue
+            stack = [names.get(thread_id, str(thread_id))] + collapse_stack(frame)
+            self.samples[";".join(stack)] += 1
+    
+    def collapsed(self) -> str:
+        """Samples in collapsed stack format, most frequent first."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+    
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+
+_profile_lock = asyncio.Lock()
+
+
+async def profile(seconds: float, interval: float = 0.01) -> str:
+    """Profile the whole process for ``seconds`` and return collapsed stacks.
+    
+    Raises:
+        RuntimeError: A profile is already running
+    """
+    if _profile_lock.locked():
+        raise RuntimeError("A profile is already running")
+    async with _profile_lock:
+        profiler = SamplingProfiler(interval)
+        profiler.start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            await asyncio.to_thread(profiler.stop)
+        return profiler.collapsed()
+
+
+class LoopLagMonitor:
+    """Measures how late the event loop wakes a sleeping task.
+    
+    Every ``interval`` seconds the monitor sleeps and records how much
+    longer than requested the sleep took. Lag above a few milliseconds
+    means something is blocking the loop.
+    """
+    
+    def __init__(self, interval: float = 0.5):
+        self.interval = interval
+        self.last_lag = 0.0
+        self._task: Optional[asyncio.Task] = None
+    
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+    
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+    
+    async def _run(self) -> None:
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.last_lag = max(0.0, time.perf_counter() - start - self.interval)
+            observe_event_loop_lag(self.last_lag)
@@ -0,0 +1,297 @@
+"""Rate limiting primitives and middleware."""
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+import asyncio
+import math
+import sqlite3
+import threading
+import time
+
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core.metrics import record_rate_limited
+from app.core.sqlite import connect
+
+
+class TokenBucket:
+    """Token bucket refilled at ``rate`` tokens per second, up to ``capacity``.
+    
+    Callers reserve tokens ahead of time: the balance may go negative and
+    each reservation waits until its share has been refilled. Waiters are
+    therefore served in arrival order without a lock, which is safe because
+    reservations happen synchronously on the event loop.
+    """
+    
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+    
+    def reserve(self, tokens: float = 1.0) -> float:
+        """Take ``tokens`` and return how long to wait before using them."""
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        self._tokens -= tokens
+        return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+    
+    async def acquire(self, tokens: float = 1.0) -> float:
+        """Wait until ``tokens`` are available.
+        
+        Returns:
+            Seconds spent waiting
+        """
+        delay = self.reserve(tokens)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return delay
+
+
+def gcra(tat: float, now: float, rate: float, burst: int) -> Tuple[float, float]:
+    """One request against a token bucket stored as a single timestamp.
+    
+    The generic cell rate algorithm keeps only the "theoretical arrival
+    time" of the next request, so a bucket of ``burst`` tokens refilled at
+    ``rate`` per second costs one float per key. A stored time at or
+    before ``now`` means the bucket is full.
+    
+    Returns:
+        (seconds to wait before retrying or 0 if allowed, new stored time)
+    """
+    interval = 1.0 / rate
+    tat = max(tat, now)
+    allow_at = tat - (burst - 1) * interval
+    if now < allow_at:
+        return allow_at - now, tat
+    return 0.0, tat + interval
+
+
+class MemoryRateLimitStore:
+    """Per-process rate limit state, sharded so idle keys can be swept cheaply.
+    
+    Every ``sweep_every`` hits one shard is swept of keys whose bucket has
+    refilled, which are indistinguishable from keys never seen.
+    """
+    
+    # A few dict operations: cheaper inline than a thread hop
+    offload_hits = False
+    
+    def __init__(self, shards: int = 16, sweep_every: int = 1024):
+        self._shards: List[Dict[str, float]] = [{} for _ in range(shards)]
+        self.sweep_every = sweep_every
+        self._hits = 0
+        self._next_shard = 0
+    
+    def hit(self, key: str, rate: float, burst: int) -> float:
+        """Count a request for ``key``; returns seconds to wait, 0 if allowed."""
+        return self.hit_all([key], rate, burst)
+    
+    def hit_all(self, keys: Sequence[str], rate: float, burst: int) -> float:
+        """Count a request against every key, or none of them if any is limited.
+        
+        Returns:
+            Longest wait among the keys, 0 if allowed
+        """
+        now = time.monotonic()
+        updates = []
+        retry_after = 0.0
+        for key in keys:
+            shard = self._shards[hash(key) % len(self._shards)]
+            wait, tat = gcra(shard.get(key, now), now, rate, burst)
+            retry_after = max(retry_after, wait)
+            updates.append((shard, key, tat))
+        if not retry_after:
+            for shard, key, tat in updates:
+                shard[key] = tat
+        self._hits += 1
+        if self._hits % self.sweep_every == 0:
+            self._sweep(now)
+        return retry_after
+    
+    def __len__(self) -> int:
+        return sum(len(shard) for shard in self._shards)
+    
+    def _sweep(self, now: float) -> None:
+        shard = self._shards[self._next_shard]
+        self._next_shard = (self._next_shard + 1) % len(self._shards)
+        for key in [key for key, tat in shard.items() if tat <= now]:
+            del shard[key]
+
+
+class SqliteRateLimitStore:
+    """Rate limit state in a SQLite file shared by all worker processes.
+    
+    Put the file on a RAM-backed filesystem (e.g. /dev/shm) so that a
+    check costs tens of microseconds.
+    
+    A check may wait for another worker's write lock, so the middleware
+    runs it in a thread (``offload_hits``). If the lock is not free within
+    ``busy_timeout`` the request is allowed: a stuck limiter must not take
+    the API down with it.
+    """
+    
+    offload_hits = True
+    
+    def __init__(self, path: str, sweep_every: int = 10_000, busy_timeout: float = 0.25):
+        self._conn = connect(path, busy_timeout=busy_timeout)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS rate_limits (key TEXT PRIMARY KEY, tat REAL NOT NULL) WITHOUT ROWID"
+        )
+        self.sweep_every = sweep_every
+        self._hits = 0
+        # Checks run in worker threads; the connection holds one transaction
+        self._lock = threading.Lock()
+    
+    def hit(self, key: str, rate: float, burst: int) -> float:
+        """Count a request for ``key``; returns seconds to wait, 0 if allowed."""
+        return self.hit_all([key], rate, burst)
+    
+    def hit_all(self, keys: Sequence[str], rate: float, burst: int) -> float:
+        """Count a request against every key, or none of them if any is limited.
+        
+        Returns:
+            Longest wait among the keys, 0 if allowed (also when the
+            store stays locked past the busy timeout)
+        """
+        with self._lock:
+            # Wall clock, since the stored times are compared across processes
+            now = time.time()
+            conn = self._conn
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+            except sqlite3.OperationalError:
+                return 0.0
+            try:
+                updates = []
+                retry_after = 0.0
+                for key in keys:
+                    row = conn.execute("SELECT tat FROM rate_limits WHERE key = ?", (key,)).fetchone()
+                    wait, tat = gcra(row[0] if row else now, now, rate, burst)
+                    retry_after = max(retry_after, wait)
+                    updates.append((key, tat))
+                if not retry_after:
+                    conn.executemany("INSERT OR REPLACE INTO rate_limits (key, tat) VALUES (?, ?)", updates)
+                self._hits += 1
+                if self._hits % self.sweep_every == 0:
+                    conn.execute("DELETE FROM rate_limits WHERE tat <= ?", (now,))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            return retry_after
+    
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+@dataclass
+class RateLimitRule:
+    """Requests per second and burst for paths starting with any of ``prefixes``."""
+    name: str
+    prefixes: Tuple[str, ...]
+    rate: float
+    burst: int
+    
+    @classmethod
+    def parse(cls, name: str, prefixes: Tuple[str, ...], spec: str) -> "RateLimitRule":
+        """Build a rule from a ``"rate/burst"`` string such as ``"1/20"``."""
+        rate, _, burst = spec.partition("/")
+        return cls(name, prefixes, float(rate), int(burst or math.ceil(float(rate))))
+
+
+class RateLimitMiddleware:
+    """Limit request rates per client IP, and per device where known.
+    
+    The first rule whose prefix matches the path applies; paths matching
+    no rule, or an ``exempt`` prefix, are not limited. The device is taken
+    from an ``X-Device-Id`` header or a ``/api/tokens/{device_id}`` path.
+    Limited requests get a 429 with ``Retry-After``.
+    
+    Behind a proxy, run uvicorn with ``--proxy-headers`` and
+    ``--forwarded-allow-ips`` so the client address is the real one.
+    """
+    
+    def __init__(
+        self,
+        app: ASGIApp,
+        rules: Sequence[RateLimitRule],
+        store,
+        exempt: Sequence[str] = (),
+    ):
+        self.app = app
+        self.rules = list(rules)
+        self.store = store
+        self.exempt = tuple(exempt)
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        path = scope["path"]
+        rule = None
+        if not path.startswith(self.exempt):
+            rule = next((rule for rule in self.rules if path.startswith(rule.prefixes)), None)
+        if rule is None:
+            await self.app(scope, receive, send)
+            return
+        
+        client = scope.get("client")
+        keys = [f"{rule.name}:ip:{client[0] if client else 'unknown'}"]
+        device_id = _device_id(scope)
+        if device_id:
+            keys.append(f"{rule.name}:device:{device_id}")
+        # Both buckets are checked before either is charged, so a request
+        # rejected for the device doesn't use up the IP's allowance
+        if self.store.offload_hits:
+            retry_after = await asyncio.to_thread(self.store.hit_all, keys, rule.rate, rule.burst)
+        else:
+            retry_after = self.store.hit_all(keys, rule.rate, rule.burst)
+        
+        if retry_after:
+            record_rate_limited(rule.name)
+            response = JSONResponse(
+                {"detail": "Too many requests, please slow down."},
+                status_code=429,
+                headers={"Retry-After": str(math.ceil(retry_after))},
+            )
+            await response(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
+
+
+def _device_id(scope: Scope) -> Optional[str]:
+    device_id = Headers(scope=scope).get("x-device-id")
+    if device_id:
+        return device_id
+    path = scope["path"]
+    if path.startswith("/api/tokens/"):
+        return path[len("/api/tokens/"):].split("/", 1)[0] or None
+    return None
+
+
+# Webhooks come from Creem's servers; metrics from the scraper; admin is keyed
+RATE_LIMIT_EXEMPT = ("/api/webhook", "/api/metrics", "/api/admin/")
+
+
+def rate_limit_rules(settings) -> List[RateLimitRule]:
+    """Rules for each route group from the rate_limit_* settings, most specific first."""
+    return [
+        # Paging only reads articles already in the cache (a miss is a 404);
+        # the first load (POST/GET /api/extract or the stream) may extract
+        # and counts against the extract group
+        RateLimitRule.parse("paging", ("/api/extract/paragraphs",), settings.rate_limit_paging),
+        RateLimitRule.parse("extract", ("/api/extract",), settings.rate_limit_extract),
+        RateLimitRule.parse("transcribe", ("/api/transcribe",), settings.rate_limit_transcribe),
+        RateLimitRule.parse("tokens", ("/api/tokens/",), settings.rate_limit_tokens),
+        RateLimitRule.parse("api", ("/api/",), settings.rate_limit_default),
+    ]
+
+
+def create_rate_limit_store(settings):
+    if settings.rate_limit_backend == "shared":
+        return SqliteRateLimitStore(settings.rate_limit_store_path)
+    return MemoryRateLimitStore()
@@ -0,0 +1,23 @@
+"""SQLite helpers shared by the file-backed stores."""
+import os
+import sqlite3
+
+
+def connect(path: str, busy_timeout: float = 5.0) -> sqlite3.Connection:
+    """Open a connection suited to concurrent use by several worker processes.
+    
+    The connection runs in autocommit mode; callers group statements with
+    explicit ``BEGIN IMMEDIATE`` / ``COMMIT`` when they need atomicity.
+    WAL lets readers proceed while another process holds the write lock.
+    """
+    if path != ":memory:":
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    conn = sqlite3.connect(
+        path,
+        timeout=busy_timeout,
+        isolation_level=None,
+        check_same_thread=False,
+    )
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
@@ -0,0 +1,44 @@
+"""Per-stage request timing."""
+from time import perf_counter
+from typing import Dict, Tuple
+
+from app.core.metrics import STAGE_LATENCY, TOOL_SLUG
+
+
+_histograms: Dict[Tuple[str, str], object] = {}
+
+
+def _histogram(route: str, name: str):
+    """Labelled histogram child, resolved once per (route, stage)."""
+    histogram = _histograms.get((route, name))
+    if histogram is None:
+        histogram = _histograms[(route, name)] = STAGE_LATENCY.labels(
+            tool=TOOL_SLUG, route=route, stage=name
+        )
+    return histogram
+
+
+class stage:
+    """Record how long one stage of a request takes.
+    
+    Usage:
+        with stage("transcribe", "upstream"):
+            result = await transcribe_service.transcribe(audio_data)
+    
+    The duration is recorded even if the block raises. Label lookups are
+    cached, so the cost is two perf_counter() calls and one observe().
+    """
+    
+    __slots__ = ("_histogram", "_start")
+    
+    def __init__(self, route: str, name: str):
+        self._histogram = _histogram(route, name)
+    
+    def __enter__(self) -> "stage":
+        self._start = perf_counter()
+        return self
+    
+    def __exit__(self, *exc_info) -> bool:
+        self._histogram.observe(perf_counter() - self._start)
+        return False
+
@@ -0,0 +1,159 @@
+"""Event-loop watchdog that attributes blocking calls."""
+from collections import deque
+from contextvars import ContextVar
+from types import CodeType, FrameType
+from typing import Deque, Dict, Optional, Tuple
+import asyncio
+import os
+import sys
+import threading
+import time
+
+from app.core.metrics import record_loop_block
+from app.core.profiler import collapse_stack
+
+
+_SERVICES_DIR = os.sep + os.path.join("app", "services") + os.sep
+_HANDLE_RUN = asyncio.events.Handle._run.__code__
+
+# Route for work detached from its endpoint's stack (shared tasks); tasks
+# inherit it from the request that created them
+current_route: ContextVar[Optional[str]] = ContextVar("current_route", default=None)
+
+
+def attribute(frame: Optional[FrameType], route_paths: Dict[CodeType, str]) -> Tuple[str, str]:
+    """(route, service) for the stack ending at ``frame``.
+    
+    The route is the path of the endpoint function on the stack or, for a
+    task running without one, ``current_route`` in the context of the
+    callback the loop is running; the service is the innermost function
+    defined under ``app/services``. Either is "unknown" when not found.
+    """
+    route = service = "unknown"
+    while frame is not None:
+        code = frame.f_code
+        if service == "unknown" and _SERVICES_DIR in code.co_filename:
+            service = code.co_qualname
+        path = route_paths.get(code)
+        if path is None and code is _HANDLE_RUN:
+            context = getattr(frame.f_locals.get("self"), "_context", None)
+            path = context.get(current_route) if context is not None else None
+        if path is not None:
+            route = path
+            break
+        frame = frame.f_back
+    return route, service
+
+
+class LoopWatchdog:
+    """Detects callbacks that block the event loop and records who ran them.
+    
+    A task on the loop updates a heartbeat every ``threshold / 2`` seconds.
+    A watcher thread notices when the heartbeat goes stale for longer than
+    ``threshold`` and captures the loop thread's stack while it is still
+    blocked. When the loop resumes, the block's duration is recorded under
+    the route and service found on that stack, and the incident is kept
+    in ``incidents`` for inspection.
+    """
+    
+    def __init__(
+        self,
+        threshold: float = 0.1,
+        route_paths: Optional[Dict[CodeType, str]] = None,
+        max_incidents: int = 50,
+    ):
+        self.threshold = threshold
+        self.interval = threshold / 2
+        self.route_paths = route_paths or {}
+        self.incidents: Deque[dict] = deque(maxlen=max_incidents)
+        self._heartbeat = time.perf_counter()
+        self._capture: Optional[dict] = None
+        self._capture_lock = threading.Lock()
+        self._loop_thread_id: Optional[int] = None
+        self._stop = threading.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+    
+    def start(self) -> None:
+        if self._task is not None:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.perf_counter()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._beat())
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+    
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._stop.set()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        await asyncio.to_thread(self._thread.join)
+        self._thread = None
+    
+    async def _beat(self) -> None:
+        """Heartbeat on the loop; records a block once the loop resumes."""
+        while True:
+            await asyncio.sleep(self.interval)
+            now = time.perf_counter()
+            previous, self._heartbeat = self._heartbeat, now
+            blocked = now - previous - self.interval
+            with self._capture_lock:
+                capture, self._capture = self._capture, None
+            if blocked < self.threshold:
+                continue
+            # A capture taken before this gap began belongs to no block
+            if capture is not None and capture.pop("captured_at") < previous:
+                capture = None
+            if capture is None:
+                capture = {"route": "unknown", "service": "unknown", "stack": []}
+            capture["seconds"] = round(blocked, 4)
+            record_loop_block(capture["route"], capture["service"], blocked)
+            self.incidents.append(capture)
+    
+    def _watch(self) -> None:
+        """Capture the loop thread's stack while the heartbeat is stale."""
+        while not self._stop.wait(self.interval / 2):
+            if time.perf_counter() - self._heartbeat < self.interval + self.threshold:
+                continue
+            with self._capture_lock:
+                if self._capture is not None:
+                    continue
+                frame = sys._current_frames().get(self._loop_thread_id)
+                route, service = attribute(frame, self.route_paths)
+                self._capture = {
+                    "route": route,
+                    "service": service,
+                    "stack": collapse_stack(frame),
+                    "detected_at": time.time(),
+                    "captured_at": time.perf_counter(),
+                }
+                del frame
+
+
+_loop_watchdog: Optional[LoopWatchdog] = None
+
+
+def get_loop_watchdog() -> Optional[LoopWatchdog]:
+    """The running watchdog, or None when it is disabled."""
+    return _loop_watchdog
+
+
+def start_loop_watchdog(threshold: float, route_paths: Dict[CodeType, str]) -> LoopWatchdog:
+    global _loop_watchdog
+    _loop_watchdog = LoopWatchdog(threshold, route_paths)
+    _loop_watchdog.start()
+    return _loop_watchdog
+
+
+async def stop_loop_watchdog() -> None:
+    global _loop_watchdog
+    if _loop_watchdog is not None:
+        await _loop_watchdog.stop()
+        _loop_watchdog = None
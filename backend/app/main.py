@@ -1,19 +1,121 @@
 """Main FastAPI application."""
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from contextlib import asynccontextmanager
+from fastapi.routing import APIRoute
+from contextlib import asynccontextmanager, suppress
 from prometheus_fastapi_instrumentator import Instrumentator
+import asyncio
+import importlib
+import logging
 
 from app.config import get_settings
-from app.api import article_router, token_router, payment_router, admin_router
+from app.core.admission import ADMISSION_EXEMPT, AdmissionMiddleware, admission_classes
+from app.core.compression import CompressionMiddleware
+from app.core.profiler import LoopLagMonitor
+from app.core.rate_limit import (
+    RATE_LIMIT_EXEMPT,
+    RateLimitMiddleware,
+    create_rate_limit_store,
+    rate_limit_rules,
+)
+from app.core.watchdog import start_loop_watchdog, stop_loop_watchdog
+from app.api import article_router, margin_router, token_router, payment_router, admin_router
+from app.services.token_service import close_token_service, get_token_service
+from app.services.catalog_service import get_product_catalog
+from app.services.creem_client import get_creem_client
+from app.services.notion_service import close_notion_client
+from app.services.notion_sync_queue import get_notion_sync_queue
+from app.services.search_index import backfill_search_index
+from app.services.webhook_queue import WebhookConsumer, get_webhook_queue
+
+
+logger = logging.getLogger(__name__)
+
+# The services import these on first use; loading them in the background
+# after startup keeps cold start fast without slowing the first request
+PREWARM_MODULES = ("newspaper", "readability", "openai")
+
+
+def _prewarm_imports():
+    for name in PREWARM_MODULES:
+        importlib.import_module(name)
+
+
+def _log_failure(task: asyncio.Task) -> None:
+    """Log a background startup task's exception as soon as it finishes."""
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("Background task %s failed", task.get_name(), exc_info=task.exception())
+
+
+async def _flush_token_events(interval: float = 0.05):
+    """Commit buffered token events even when no new mutations arrive.
+    
+    The fsync and any due snapshot run in a worker thread.
+    """
+    token_service = get_token_service()
+    while True:
+        await asyncio.sleep(interval)
+        await asyncio.to_thread(token_service.flush_events)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan handler."""
     # Startup
+    settings = get_settings()
+    get_product_catalog(settings)
+    prewarm = None
+    if settings.prewarm_imports:
+        prewarm = asyncio.create_task(asyncio.to_thread(_prewarm_imports), name="prewarm-imports")
+        prewarm.add_done_callback(_log_failure)
+    # Index notes stored before this process started without blocking the loop
+    backfill = asyncio.create_task(asyncio.to_thread(backfill_search_index), name="search-backfill")
+    backfill.add_done_callback(_log_failure)
+    flusher = None
+    if settings.token_event_log_dir:
+        flusher = asyncio.create_task(_flush_token_events())
+    webhook_consumer = None
+    webhook_queue = get_webhook_queue()
+    if webhook_queue is not None:
+        webhook_consumer = WebhookConsumer(
+            webhook_queue,
+            payment_router.apply_webhook_events,
+            batch_size=settings.webhook_queue_batch_size,
+        )
+        webhook_consumer.start()
+    notion_sync_queue = get_notion_sync_queue()
+    notion_sync_queue.start()
+    loop_lag_monitor = None
+    if settings.loop_lag_interval > 0:
+        loop_lag_monitor = LoopLagMonitor(settings.loop_lag_interval)
+        loop_lag_monitor.start()
+    if settings.loop_watchdog_threshold > 0:
+        route_paths = {
+            route.endpoint.__code__: "/api" + route.path
+            for module in (article_router, margin_router, token_router, payment_router, admin_router)
+            for route in module.router.routes
+            if isinstance(route, APIRoute)
+        }
+        start_loop_watchdog(settings.loop_watchdog_threshold, route_paths)
     yield
     # Shutdown
+    if prewarm is not None:
+        # A failed import was already logged; don't let it skip the rest
+        with suppress(Exception):
+            await prewarm
+    await stop_loop_watchdog()
+    if loop_lag_monitor is not None:
+        await loop_lag_monitor.stop()
+    await notion_sync_queue.stop()
+    if webhook_consumer is not None:
+        await webhook_consumer.stop()
+    if flusher is not None:
+        flusher.cancel()
+        with suppress(asyncio.CancelledError):
+            await flusher
+    close_token_service()
+    await get_creem_client().close()
+    await close_notion_client()
 
 
 settings = get_settings()
@@ -25,6 +127,23 @@ app = FastAPI(
     lifespan=lifespan,
 )
 
+# Load shedding, innermost so rate-limited requests never take a slot
+if settings.admission_enabled:
+    app.add_middleware(
+        AdmissionMiddleware,
+        classes=admission_classes(settings),
+        exempt=ADMISSION_EXEMPT,
+    )
+
+# Rate limiting, inside CORS so browsers can read the 429s
+if settings.rate_limit_enabled:
+    app.add_middleware(
+        RateLimitMiddleware,
+        rules=rate_limit_rules(settings),
+        store=create_rate_limit_store(settings),
+        exempt=RATE_LIMIT_EXEMPT,
+    )
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -33,9 +152,15 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.compression_minimum_size,
+    offload_size=settings.compression_offload_size,
+)
 
 # Include routers
 app.include_router(article_router.router, prefix="/api", tags=["article"])
+app.include_router(margin_router.router, prefix="/api", tags=["margins"])
 app.include_router(token_router.router, prefix="/api", tags=["tokens"])
 app.include_router(payment_router.router, prefix="/api", tags=["payment"])
 app.include_router(admin_router.router, prefix="/api", tags=["admin"])
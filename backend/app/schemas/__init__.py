@@ -7,8 +7,24 @@ from app.schemas.article import (
     MarginNote,
     SyncNotionRequest,
     SyncNotionResponse,
+    SyncJobResponse,
+    ExportRequest,
+    MarginUploadRequest,
+    MarginUploadResponse,
+    MarginPage,
+    SearchHit,
+    SearchResponse,
+)
+from app.schemas.token import (
+    TokenStatus,
+    TokenUseRequest,
+    TokenUseResponse,
+    BatchTokenStatusRequest,
+    BatchTokenStatusResponse,
+    BulkAddTokensRequest,
+    BulkSetUnlimitedRequest,
+    BulkOperationResponse,
 )
-from app.schemas.token import TokenStatus, TokenUseRequest, TokenUseResponse
 from app.schemas.payment import CheckoutRequest, CheckoutResponse, WebhookPayload
 
 __all__ = [
@@ -19,9 +35,21 @@ __all__ = [
     "MarginNote",
     "SyncNotionRequest",
     "SyncNotionResponse",
+    "SyncJobResponse",
+    "ExportRequest",
+    "MarginUploadRequest",
+    "MarginUploadResponse",
+    "MarginPage",
+    "SearchHit",
+    "SearchResponse",
     "TokenStatus",
     "TokenUseRequest",
     "TokenUseResponse",
+    "BatchTokenStatusRequest",
+    "BatchTokenStatusResponse",
+    "BulkAddTokensRequest",
+    "BulkSetUnlimitedRequest",
+    "BulkOperationResponse",
     "CheckoutRequest",
     "CheckoutResponse",
     "WebhookPayload",
@@ -1,6 +1,6 @@
 """Article-related schemas."""
 from pydantic import BaseModel, Field, HttpUrl
-from typing import Optional, List
+from typing import Literal, Optional, List
 from datetime import datetime
 
 
@@ -19,6 +19,15 @@ class ExtractResponse(BaseModel):
     word_count: int
 
 
+class ArticleParagraphs(BaseModel):
+    """A range of an extracted article's paragraphs."""
+    source_url: str
+    start: int
+    paragraphs: List[str]
+    total: int
+    next_start: Optional[int] = None
+
+
 class TranscribeRequest(BaseModel):
     """Request to transcribe audio (sent as multipart/form-data)."""
     device_id: str = Field(..., min_length=10, max_length=100)
@@ -46,7 +55,9 @@ class SyncNotionRequest(BaseModel):
     device_id: str = Field(..., min_length=10, max_length=100)
     article_title: str
     article_url: str
-    margins: List[MarginNote]
+    margins: List[MarginNote] = Field(default_factory=list, description="New or changed notes; stored notes are synced too")
+    notion_token: Optional[str] = Field(None, description="User's Notion OAuth token (defaults to the server integration)")
+    notion_database_id: Optional[str] = Field(None, description="Database to create pages in (requires notion_token)")
 
 
 class SyncNotionResponse(BaseModel):
@@ -54,3 +65,49 @@ class SyncNotionResponse(BaseModel):
     success: bool
     notion_url: Optional[str] = None
     message: str = ""
+
+
+class SyncJobResponse(BaseModel):
+    """Status of a background Notion sync."""
+    job_id: str
+    status: str  # queued, running, succeeded, failed
+    result: Optional[SyncNotionResponse] = None
+
+
+class ExportRequest(BaseModel):
+    """Request to export margin notes."""
+    device_id: str = Field(..., min_length=10, max_length=100)
+    article_title: str
+    article_url: str
+    margins: List[MarginNote] = Field(default_factory=list, description="Notes to export (defaults to the stored notes)")
+    format: Literal["markdown", "ndjson", "notion"] = "markdown"
+
+
+class MarginUploadRequest(BaseModel):
+    """Request to store new or changed margin notes."""
+    device_id: str = Field(..., min_length=10, max_length=100)
+    article_url: str
+    margins: List[MarginNote] = Field(..., min_length=1)
+
+
+class MarginUploadResponse(BaseModel):
+    """Result of storing margin notes."""
+    stored: int  # Notes inserted or changed
+    total: int  # Notes stored for the article
+
+
+class MarginPage(BaseModel):
+    """A page of stored margin notes, oldest first."""
+    margins: List[MarginNote]
+    next_cursor: Optional[str] = None
+
+
+class SearchHit(BaseModel):
+    """A margin note matching a search."""
+    article_url: str
+    margin: MarginNote
+
+
+class SearchResponse(BaseModel):
+    """Search results, newest first."""
+    hits: List[SearchHit]
@@ -1,6 +1,6 @@
 """Token-related schemas."""
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import List, Optional
 
 
 class TokenStatus(BaseModel):
@@ -23,3 +23,31 @@ class TokenUseResponse(BaseModel):
     success: bool
     remaining_tokens: int
     message: str = ""
+
+
+class BatchTokenStatusRequest(BaseModel):
+    """Request for the token status of many devices."""
+    device_ids: List[str] = Field(..., min_length=1, description="Device identifiers")
+
+
+class BatchTokenStatusResponse(BaseModel):
+    """Token statuses in the same order as the requested device ids."""
+    statuses: List[TokenStatus]
+
+
+class BulkAddTokensRequest(BaseModel):
+    """Request to add the same amount of tokens to many devices."""
+    device_ids: List[str] = Field(..., min_length=1, description="Device identifiers")
+    amount: int = Field(default=100, gt=0, description="Tokens to add per device")
+
+
+class BulkSetUnlimitedRequest(BaseModel):
+    """Request to set unlimited access for many devices."""
+    device_ids: List[str] = Field(..., min_length=1, description="Device identifiers")
+    months: int = Field(default=0, ge=0, description="Number of months (0 = permanent)")
+
+
+class BulkOperationResponse(BaseModel):
+    """Summary of a bulk admin operation."""
+    applied: int = Field(..., description="Number of rows applied")
+    devices: int = Field(..., description="Number of distinct devices affected")
@@ -1,16 +1,26 @@
-"""Services."""
-from app.services.article_service import ArticleService, get_article_service
-from app.services.transcribe_service import TranscribeService, get_transcribe_service
-from app.services.notion_service import NotionService, get_notion_service
-from app.services.token_service import TokenService, get_token_service
+"""Services.
 
-__all__ = [
-    "ArticleService",
-    "get_article_service",
-    "TranscribeService",
-    "get_transcribe_service",
-    "NotionService",
-    "get_notion_service",
-    "TokenService",
-    "get_token_service",
-]
+Names are resolved on first access so importing one service module does
+not pull in the extraction and API client libraries of the others.
+"""
+from importlib import import_module
+
+_EXPORTS = {
+    "ArticleService": "app.services.article_service",
+    "get_article_service": "app.services.article_service",
+    "TranscribeService": "app.services.transcribe_service",
+    "get_transcribe_service": "app.services.transcribe_service",
+    "NotionService": "app.services.notion_service",
+    "get_notion_service": "app.services.notion_service",
+    "TokenService": "app.services.token_service",
+    "get_token_service": "app.services.token_service",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name: str):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(import_module(module), name)
@@ -0,0 +1,156 @@
+"""Cache of extracted articles, ready to serve whole or by paragraph."""
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+import asyncio
+import time
+
+from app.config import get_settings
+from app.core.etag import content_etag
+from app.core.metrics import record_article_cache
+from app.schemas.article import ExtractResponse
+from app.services.article_service import split_paragraphs
+from app.services.margin_store import normalize_article_url
+from app.services.notion_blocks import encode_json
+
+
+@dataclass
+class CachedArticle:
+    """An extracted article with its serialized response and paragraphs."""
+    response: ExtractResponse
+    body: bytes
+    etag: str
+    paragraphs: List[str]
+    
+    @classmethod
+    def from_result(cls, result: dict) -> "CachedArticle":
+        response = ExtractResponse(**result)
+        body = response.model_dump_json().encode()
+        return cls(
+            response=response,
+            body=body,
+            etag=content_etag(body),
+            paragraphs=split_paragraphs(response.content),
+        )
+    
+    def metadata(self) -> dict:
+        """Everything but the content, plus the paragraph count."""
+        metadata = self.response.model_dump(exclude={"content"})
+        metadata["paragraph_count"] = len(self.paragraphs)
+        return metadata
+
+
+def iter_paragraph_stream(article: CachedArticle, first_page: int = 10, page_size: int = 50) -> Iterator[bytes]:
+    """NDJSON: metadata, then the first ``first_page`` paragraphs, then the rest in pages.
+    
+    Each line is ``{"type": "meta", ...}`` or ``{"type": "paragraphs",
+    "start": n, "paragraphs": [...]}``, so a reader can render the first
+    page as soon as the second line arrives.
+    """
+    yield encode_json({"type": "meta", "etag": article.etag, **article.metadata()}) + b"\n"
+    paragraphs = article.paragraphs
+    start = 0
+    size = first_page
+    while start < len(paragraphs):
+        yield encode_json({
+            "type": "paragraphs",
+            "start": start,
+            "paragraphs": paragraphs[start:start + size],
+        }) + b"\n"
+        start += size
+        size = page_size
+
+
+class ArticleCache:
+    """LRU cache of extracted articles keyed by normalized URL.
+    
+    Readers re-opening an article, paging through its paragraphs or
+    revalidating its ETag are served from here without another upstream
+    download. Concurrent requests for the same article share a single
+    in-flight extraction; failures are not cached.
+    """
+    
+    def __init__(self, ttl_seconds: float = 600.0, max_entries: int = 256):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, CachedArticle]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Task] = {}
+    
+    async def get(self, url: str) -> Optional[CachedArticle]:
+        """Return the cached article for ``url`` without extracting it.
+        
+        Waits for an extraction already in flight; returns None when the
+        article is neither cached nor being extracted.
+        """
+        key = normalize_article_url(url)
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                record_article_cache("hit")
+                return entry[1]
+            del self._entries[key]
+        
+        task = self._inflight.get(key)
+        if task is None:
+            record_article_cache("miss")
+            return None
+        record_article_cache("coalesced")
+        return await asyncio.shield(task)
+    
+    async def get_or_create(
+        self,
+        url: str,
+        create: Callable[[], Awaitable[CachedArticle]],
+    ) -> CachedArticle:
+        """Return the cached article for ``url`` or extract it with ``create``."""
+        key = normalize_article_url(url)
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                record_article_cache("hit")
+                return entry[1]
+            del self._entries[key]
+        
+        task = self._inflight.get(key)
+        if task is None:
+            record_article_cache("miss")
+            task = asyncio.ensure_future(self._create(key, create))
+            self._inflight[key] = task
+        else:
+            record_article_cache("coalesced")
+        
+        # Shield so one client disconnecting does not cancel the shared extraction
+        return await asyncio.shield(task)
+    
+    async def _create(self, key: str, create: Callable[[], Awaitable[CachedArticle]]) -> CachedArticle:
+        try:
+            article = await create()
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, article)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            return article
+        finally:
+            self._inflight.pop(key, None)
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+_article_cache: Optional[ArticleCache] = None
+
+
+def get_article_cache() -> ArticleCache:
+    global _article_cache
+    if _article_cache is None:
+        settings = get_settings()
+        _article_cache = ArticleCache(
+            ttl_seconds=settings.article_cache_ttl_seconds,
+            max_entries=settings.article_cache_size,
+        )
+    return _article_cache
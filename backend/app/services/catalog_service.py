@@ -0,0 +1,84 @@
+"""Product catalog for Creem checkouts."""
+from typing import Dict, Optional
+import hashlib
+import json
+
+from app.config import Settings, get_settings
+
+
+# Product configurations
+PRODUCTS = {
+    "pack_3": {
+        "tokens": 3,
+        "price": 2.99,
+        "name": "3 Excuses Pack",
+        "description": "Perfect for trying out",
+        "popular": False,
+    },
+    "pack_10": {
+        "tokens": 10,
+        "price": 6.99,
+        "name": "10 Excuses Pack",
+        "description": "Best value for regular users",
+        "popular": True,
+    },
+}
+
+
+def get_creem_api_base(api_key: str) -> str:
+    """Use test API for test keys, production API for live keys."""
+    if api_key and api_key.startswith("creem_test_"):
+        return "https://test-api.creem.io/v1"
+    return "https://api.creem.io/v1"
+
+
+def get_creem_product_id(settings, product_type: str) -> Optional[str]:
+    """Get Creem product ID for a given product type."""
+    product_id_map = {
+        "pack_3": settings.creem_product_id_3,
+        "pack_10": settings.creem_product_id_10,
+    }
+    return product_id_map.get(product_type)
+
+
+class ProductCatalog:
+    """Everything checkout and /products need, computed once per Settings.
+    
+    Holds the Creem API base, the Creem product id for each product and the
+    serialized /products response with its ETag.
+    """
+    
+    def __init__(self, settings: Settings, currency: str = "USD"):
+        self.settings = settings
+        self.api_base = settings.creem_api_base or get_creem_api_base(settings.creem_api_key)
+        self.creem_product_ids: Dict[str, Optional[str]] = {
+            product_type: get_creem_product_id(settings, product_type)
+            for product_type in PRODUCTS
+        }
+        
+        products = [
+            {
+                "id": product_type,
+                "name": product["name"],
+                "tokens": product["tokens"],
+                "price": product["price"],
+                "currency": currency,
+                "description": product["description"],
+                "popular": product["popular"],
+            }
+            for product_type, product in PRODUCTS.items()
+        ]
+        self.products_body = json.dumps({"products": products}, separators=(",", ":")).encode()
+        self.products_etag = f'"{hashlib.sha256(self.products_body).hexdigest()[:32]}"'
+
+
+_product_catalog: Optional[ProductCatalog] = None
+
+
+def get_product_catalog(settings: Optional[Settings] = None) -> ProductCatalog:
+    """Get the catalog, rebuilding it only when the settings object changes."""
+    global _product_catalog
+    settings = settings or get_settings()
+    if _product_catalog is None or _product_catalog.settings is not settings:
+        _product_catalog = ProductCatalog(settings)
+    return _product_catalog
@@ -0,0 +1,92 @@
+"""Short-lived cache of open checkout sessions."""
+from typing import Awaitable, Callable, Dict, Hashable, Optional, Tuple
+import asyncio
+import threading
+import time
+
+from app.config import get_settings
+from app.schemas.payment import CheckoutResponse
+
+
+class CheckoutSessionCache:
+    """Reuses a recently created checkout session for the same request.
+    
+    Double-clicks on "buy" get the existing checkout URL instead of a new
+    upstream session. Concurrent requests for the same key share a single
+    in-flight upstream call; failures are not cached.
+    
+    Keys are ``(device_id, product_type, success_url)``. A completed
+    checkout drops the device's sessions for that product (from the
+    webhook thread, hence the lock), so the next purchase gets a new one.
+    """
+    
+    def __init__(self, ttl_seconds: float = 120.0, max_entries: int = 10_000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: Dict[Hashable, Tuple[float, CheckoutResponse]] = {}
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self._lock = threading.Lock()
+    
+    async def get_or_create(
+        self,
+        key: Hashable,
+        create: Callable[[], Awaitable[CheckoutResponse]],
+    ) -> CheckoutResponse:
+        """Return the cached session for ``key`` or create one with ``create``."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > time.monotonic():
+                    return entry[1]
+                del self._entries[key]
+        
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._create(key, create))
+            self._inflight[key] = task
+        
+        # Shield so one client disconnecting does not cancel the shared call
+        return await asyncio.shield(task)
+    
+    async def _create(
+        self,
+        key: Hashable,
+        create: Callable[[], Awaitable[CheckoutResponse]],
+    ) -> CheckoutResponse:
+        try:
+            session = await create()
+            self._store(key, session)
+            return session
+        finally:
+            self._inflight.pop(key, None)
+    
+    def _store(self, key: Hashable, session: CheckoutResponse) -> None:
+        with self._lock:
+            entries = self._entries
+            if key not in entries and len(entries) >= self.max_entries:
+                del entries[next(iter(entries))]
+            entries[key] = (time.monotonic() + self.ttl_seconds, session)
+    
+    def invalidate(self, device_id: str, product_type: str) -> int:
+        """Drop cached sessions for a device and product; returns how many."""
+        with self._lock:
+            stale = [key for key in self._entries if key[:2] == (device_id, product_type)]
+            for key in stale:
+                del self._entries[key]
+        return len(stale)
+    
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+_checkout_cache: Optional[CheckoutSessionCache] = None
+
+
+def get_checkout_cache() -> CheckoutSessionCache:
+    global _checkout_cache
+    if _checkout_cache is None:
+        _checkout_cache = CheckoutSessionCache(
+            ttl_seconds=get_settings().checkout_session_ttl_seconds,
+        )
+    return _checkout_cache
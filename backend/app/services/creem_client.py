@@ -0,0 +1,191 @@
+"""Creem API client."""
+from collections import deque
+from typing import Awaitable, Callable, Optional
+import asyncio
+import random
+import time
+
+import httpx
+
+from app.config import get_settings
+from app.core.metrics import observe_creem_latency, record_creem_retry
+
+
+# Responses that mean Creem did not act on the request, so sending it
+# again cannot create a second session.
+RETRY_STATUSES = {429, 503}
+
+# Failures raised before the request reached Creem
+RETRY_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+class CreemClient:
+    """Pooled Creem client with a latency budget, retries and hedging.
+    
+    One ``httpx.AsyncClient`` is shared by all calls so connections are
+    reused. Each call gets an overall latency budget; within it, failures
+    that are safe to repeat are retried with jittered exponential backoff.
+    With hedging enabled, a second request is sent when the first is slower
+    than the recent p95 and the faster response wins. Creating a checkout
+    is not idempotent, so only calls that carry an idempotency key are
+    hedged; the key is sent with every attempt so Creem can drop the copy.
+    """
+    
+    def __init__(
+        self,
+        budget_seconds: float = 10.0,
+        attempt_timeout: float = 5.0,
+        max_retries: int = 2,
+        backoff_base: float = 0.2,
+        hedge_enabled: bool = False,
+        hedge_min_samples: int = 20,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.budget_seconds = budget_seconds
+        self.attempt_timeout = attempt_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.hedge_enabled = hedge_enabled
+        self.hedge_min_samples = hedge_min_samples
+        self._latencies = deque(maxlen=200)
+        self._client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=50, max_keepalive_connections=20),
+            transport=transport,
+        )
+    
+    async def create_checkout(
+        self,
+        api_base: str,
+        api_key: str,
+        payload: dict,
+        idempotency_key: Optional[str] = None,
+    ) -> httpx.Response:
+        """Create a checkout session.
+        
+        Args:
+            idempotency_key: Sent as ``Idempotency-Key`` on every attempt;
+                without one the request is never hedged
+        
+        Returns:
+            The Creem response (callers check the status code)
+        
+        Raises:
+            httpx.RequestError: If no response arrived within the budget
+        """
+        url = f"{api_base}/checkouts"
+        headers = {"Content-Type": "application/json", "x-api-key": api_key}
+        if idempotency_key:
+            headers["Idempotency-Key"] = idempotency_key
+        hedge = idempotency_key is not None
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.budget_seconds
+        response = None
+        error: Optional[Exception] = None
+        
+        for attempt in range(self.max_retries + 1):
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            timeout = min(self.attempt_timeout, remaining)
+            
+            def send() -> Awaitable[httpx.Response]:
+                return self._send(url, headers, payload, timeout)
+            
+            try:
+                response = await asyncio.wait_for(self._send_hedged(send, hedge), remaining)
+                error = None
+            except RETRY_ERRORS as e:
+                error = e
+            except asyncio.TimeoutError:
+                error = httpx.TimeoutException("Creem latency budget exhausted")
+                break
+            else:
+                if response.status_code not in RETRY_STATUSES:
+                    return response
+            
+            # Full jitter keeps retries from many workers from synchronizing
+            delay = random.uniform(0, self.backoff_base * 2 ** attempt)
+            if attempt == self.max_retries or loop.time() + delay >= deadline:
+                break
+            record_creem_retry("retry")
+            await asyncio.sleep(delay)
+        
+        if error is None and response is not None:
+            return response
+        raise error or httpx.TimeoutException("Creem latency budget exhausted")
+    
+    async def _send_hedged(
+        self,
+        send: Callable[[], Awaitable[httpx.Response]],
+        hedge: bool = True,
+    ) -> httpx.Response:
+        """Send once, plus a hedge request if the first is slower than p95."""
+        threshold = self._hedge_threshold() if hedge else None
+        first = asyncio.ensure_future(send())
+        if threshold is None:
+            return await first
+        
+        done, _ = await asyncio.wait({first}, timeout=threshold)
+        if done:
+            return first.result()
+        
+        record_creem_retry("hedge")
+        pending = {first, asyncio.ensure_future(send())}
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+    
+    async def _send(self, url: str, headers: dict, payload: dict, timeout: float) -> httpx.Response:
+        start = time.perf_counter()
+        outcome = "network_error"
+        try:
+            response = await self._client.post(url, headers=headers, json=payload, timeout=timeout)
+            if response.status_code == 200:
+                outcome = "success"
+                self._latencies.append(time.perf_counter() - start)
+            else:
+                outcome = f"http_{response.status_code // 100}xx"
+            return response
+        except httpx.TimeoutException:
+            outcome = "timeout"
+            raise
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            raise
+        finally:
+            observe_creem_latency(outcome, time.perf_counter() - start)
+    
+    def _hedge_threshold(self) -> Optional[float]:
+        """p95 of recent successful latencies, once enough samples exist."""
+        if not self.hedge_enabled or len(self._latencies) < self.hedge_min_samples:
+            return None
+        ordered = sorted(self._latencies)
+        return ordered[int(len(ordered) * 0.95) - 1]
+    
+    async def close(self) -> None:
+        await self._client.aclose()
+
+
+_creem_client: Optional[CreemClient] = None
+
+
+def get_creem_client() -> CreemClient:
+    global _creem_client
+    if _creem_client is None:
+        settings = get_settings()
+        _creem_client = CreemClient(
+            budget_seconds=settings.creem_budget_seconds,
+            attempt_timeout=settings.creem_attempt_timeout,
+            max_retries=settings.creem_max_retries,
+            hedge_enabled=settings.creem_hedge_enabled,
+        )
+    return _creem_client
@@ -0,0 +1,110 @@
+"""Streaming export of margin notes."""
+from typing import Callable, Dict, Iterable, Iterator, List
+import re
+
+from app.schemas.article import MarginNote
+from app.services.notion_blocks import encode_json, encode_margin, margin_blocks, source_block
+
+
+# Flush the output buffer once it reaches this many bytes
+CHUNK_SIZE = 64 * 1024
+
+_MARKDOWN_SPECIAL = re.compile(r"([\\`*_\[\]#])")
+
+
+def _escape_markdown(text: str) -> str:
+    return _MARKDOWN_SPECIAL.sub(r"\\\1", text)
+
+
+def _markdown_text(rich_text: List[dict]) -> str:
+    parts = []
+    for item in rich_text:
+        text = _escape_markdown(item["text"]["content"])
+        link = item["text"].get("link")
+        if link:
+            text = f"[{text}]({link['url']})"
+        if item.get("annotations", {}).get("bold") and text.strip():
+            # Keep surrounding whitespace outside the markers
+            stripped = text.strip()
+            start = text.index(stripped)
+            text = f"{text[:start]}**{stripped}**{text[start + len(stripped):]}"
+        parts.append(text)
+    return "".join(parts)
+
+
+def block_to_markdown(block: dict) -> str:
+    """Render one Notion block (divider, quote or paragraph) as Markdown."""
+    block_type = block["type"]
+    if block_type == "divider":
+        return "---\n\n"
+    text = _markdown_text(block[block_type]["rich_text"])
+    if block_type == "quote":
+        return "".join(f"> {line}\n" for line in text.split("\n")) + "\n"
+    return text + "\n\n"
+
+
+def _markdown(article_title: str, article_url: str, margins: Iterable[MarginNote]) -> Iterator[bytes]:
+    yield f"# {_escape_markdown(article_title)}\n\n".encode()
+    yield block_to_markdown(source_block(article_url)).encode()
+    for margin in margins:
+        yield "".join(block_to_markdown(block) for block in margin_blocks(margin)).encode()
+
+
+def _ndjson(article_title: str, article_url: str, margins: Iterable[MarginNote]) -> Iterator[bytes]:
+    """First line describes the article, then one margin per line."""
+    yield encode_json({"article_title": article_title, "article_url": article_url}) + b"\n"
+    for margin in margins:
+        yield encode_json(margin.model_dump(mode="json")) + b"\n"
+
+
+def _notion(article_title: str, article_url: str, margins: Iterable[MarginNote]) -> Iterator[bytes]:
+    """One JSON array of Notion blocks per line, ready for blocks.children.append."""
+    yield encode_json([source_block(article_url)]) + b"\n"
+    for margin in margins:
+        yield encode_margin(margin) + b"\n"
+
+
+EXPORT_FORMATS: Dict[str, Callable[[str, str, Iterable[MarginNote]], Iterator[bytes]]] = {
+    "markdown": _markdown,
+    "ndjson": _ndjson,
+    "notion": _notion,
+}
+
+MEDIA_TYPES = {
+    "markdown": "text/markdown; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+    "notion": "application/x-ndjson",
+}
+
+FILE_EXTENSIONS = {"markdown": "md", "ndjson": "ndjson", "notion": "ndjson"}
+
+
+def iter_export(
+    export_format: str,
+    article_title: str,
+    article_url: str,
+    margins: Iterable[MarginNote],
+) -> Iterator[bytes]:
+    """Render margins in ``export_format``, yielding chunks of about CHUNK_SIZE.
+    
+    Margins are consumed lazily, so a generator over a large store is
+    exported without holding the whole document in memory.
+    
+    Raises:
+        ValueError: If the format is unknown
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {export_format}")
+    render = EXPORT_FORMATS[export_format]
+    
+    def chunks() -> Iterator[bytes]:
+        buffer = bytearray()
+        for part in render(article_title, article_url, margins):
+            buffer += part
+            if len(buffer) >= CHUNK_SIZE:
+                yield bytes(buffer)
+                buffer.clear()
+        if buffer:
+            yield bytes(buffer)
+    
+    return chunks()
@@ -0,0 +1,115 @@
+"""Idempotency store for webhook deliveries."""
+from collections import OrderedDict
+from typing import Optional
+import threading
+import time
+
+from app.config import get_settings
+from app.core.sqlite import connect
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS processed_events (
+    event_key TEXT PRIMARY KEY,
+    processed_at REAL NOT NULL
+) WITHOUT ROWID
+"""
+
+
+class IdempotencyStore:
+    """Remembers processed event keys so retried deliveries are applied once.
+    
+    Recent keys live in an insertion-ordered dict bounded by a time window
+    and a maximum size, so lookups and evictions are O(1). When a path is
+    configured, keys are also written to SQLite; that backing store catches
+    duplicates after a restart or from another worker process, and is
+    pruned to the same time window. Claims may come from several threads
+    and are serialized by a lock.
+    """
+    
+    def __init__(
+        self,
+        window_seconds: float = 7 * 24 * 3600,
+        max_entries: int = 100_000,
+        path: Optional[str] = None,
+    ):
+        self.window_seconds = window_seconds
+        self.max_entries = max_entries
+        self._recent: "OrderedDict[str, float]" = OrderedDict()
+        self._conn = None
+        self._last_prune = 0.0
+        self._lock = threading.Lock()
+        if path:
+            self._conn = connect(path)
+            self._conn.execute(_SCHEMA)
+    
+    def claim(self, key: str) -> bool:
+        """Record ``key`` as processed.
+        
+        Returns:
+            True if this is the first delivery, False for a duplicate
+        """
+        now = time.time()
+        with self._lock:
+            self._evict(now)
+            
+            if key in self._recent:
+                return False
+            
+            if self._conn is not None:
+                self._prune(now)
+                inserted = self._conn.execute(
+                    "INSERT OR IGNORE INTO processed_events (event_key, processed_at) VALUES (?, ?)",
+                    (key, now),
+                ).rowcount
+                if not inserted:
+                    self._recent[key] = now
+                    return False
+            
+            self._recent[key] = now
+            return True
+    
+    def release(self, key: str) -> None:
+        """Forget ``key`` so a failed delivery can be retried."""
+        with self._lock:
+            self._recent.pop(key, None)
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM processed_events WHERE event_key = ?", (key,))
+    
+    def __len__(self) -> int:
+        return len(self._recent)
+    
+    def _evict(self, now: float) -> None:
+        """Drop keys that left the time window or exceed the size bound."""
+        recent = self._recent
+        cutoff = now - self.window_seconds
+        while recent:
+            key, seen_at = next(iter(recent.items()))
+            if seen_at >= cutoff and len(recent) < self.max_entries:
+                break
+            recent.popitem(last=False)
+    
+    def _prune(self, now: float) -> None:
+        """Delete expired rows from the backing store at most once a minute."""
+        if now - self._last_prune < 60:
+            return
+        self._last_prune = now
+        self._conn.execute(
+            "DELETE FROM processed_events WHERE processed_at < ?",
+            (now - self.window_seconds,),
+        )
+
+
+_idempotency_store: Optional[IdempotencyStore] = None
+
+
+def get_idempotency_store() -> IdempotencyStore:
+    global _idempotency_store
+    if _idempotency_store is None:
+        settings = get_settings()
+        _idempotency_store = IdempotencyStore(
+            window_seconds=settings.webhook_dedup_window_seconds,
+            max_entries=settings.webhook_dedup_max_entries,
+            path=settings.webhook_dedup_path,
+        )
+    return _idempotency_store
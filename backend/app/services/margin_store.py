@@ -0,0 +1,212 @@
+"""Server-side storage of margin notes."""
+from datetime import datetime, timezone
+from typing import Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+import base64
+import hashlib
+import json
+import threading
+import time
+
+from app.config import get_settings
+from app.core.sqlite import connect
+from app.schemas.article import MarginNote
+from app.services.search_index import get_search_index
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS margins (
+    device_id TEXT NOT NULL,
+    article_url TEXT NOT NULL,
+    margin_key TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    note TEXT NOT NULL,
+    PRIMARY KEY (device_id, article_url, margin_key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS margins_by_created
+    ON margins (device_id, article_url, created_at, margin_key);
+"""
+
+_UPSERT = """
+INSERT INTO margins (device_id, article_url, margin_key, created_at, note)
+VALUES (?, ?, ?, ?, ?)
+ON CONFLICT (device_id, article_url, margin_key)
+DO UPDATE SET note = excluded.note WHERE note != excluded.note
+"""
+
+_PAGE = """
+SELECT created_at, margin_key, note FROM margins
+WHERE device_id = ? AND article_url = ? AND (created_at, margin_key) > (?, ?)
+ORDER BY created_at, margin_key
+LIMIT ?
+"""
+
+
+def margin_key(margin: MarginNote) -> str:
+    """Stable identity of a margin across uploads and syncs."""
+    if margin.created_at is not None:
+        return margin.created_at.isoformat()
+    highlight = hashlib.sha1(margin.highlight_text.encode()).hexdigest()[:16]
+    return f"{margin.highlight_start}:{margin.highlight_end}:{highlight}"
+
+
+def normalize_article_url(url: str) -> str:
+    """Canonical form of an article URL for use as a key.
+    
+    Lowercases the scheme and host, drops the fragment, default ports,
+    tracking parameters (utm_*) and a trailing slash.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    netloc = parts.netloc.lower()
+    if (scheme, netloc.rpartition(":")[2]) in (("http", "80"), ("https", "443")):
+        netloc = netloc.rpartition(":")[0]
+    path = parts.path.rstrip("/") or "/"
+    query = urlencode([
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.startswith("utm_")
+    ])
+    return urlunsplit((scheme, netloc, path, query, ""))
+
+
+def _encode_cursor(created_at: float, key: str) -> str:
+    return base64.urlsafe_b64encode(json.dumps([created_at, key]).encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> Tuple[float, str]:
+    try:
+        created_at, key = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return float(created_at), str(key)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+
+
+def _timestamp(value: datetime) -> float:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+class MarginStore:
+    """Margin notes per (device_id, normalized article URL) in SQLite.
+    
+    Notes are ordered by ``created_at`` (upload time for notes without
+    one) through an index, so pages are read with keyset pagination and
+    never scan earlier rows. Uploading a note that is already stored only
+    rewrites it if its content changed.
+    """
+    
+    def __init__(self, path: str = ":memory:"):
+        self._conn = connect(path)
+        self._conn.executescript(_SCHEMA)
+        # Streaming exports read from a threadpool while the loop writes
+        self._lock = threading.Lock()
+    
+    def upsert(self, device_id: str, article_url: str, margins: Iterable[MarginNote]) -> int:
+        """Store new margins and update changed ones.
+        
+        Returns:
+            Number of margins inserted or changed
+        """
+        article_url = normalize_article_url(article_url)
+        now = time.time()
+        rows = []
+        margins = list(margins)
+        for index, margin in enumerate(margins):
+            # Keep upload order for notes without a timestamp
+            created_at = _timestamp(margin.created_at) if margin.created_at else now + index * 1e-6
+            note = margin.model_dump_json()
+            rows.append((device_id, article_url, margin_key(margin), created_at, note))
+        
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(_UPSERT, rows)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            changed = self._conn.total_changes - before
+        
+        get_search_index().index(
+            device_id,
+            article_url,
+            [(row[2], margin) for row, margin in zip(rows, margins)],
+        )
+        return changed
+    
+    def page(
+        self,
+        device_id: str,
+        article_url: str,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+    ) -> Tuple[List[MarginNote], Optional[str]]:
+        """Read margins oldest first.
+        
+        Returns:
+            (margins, next_cursor); next_cursor is None on the last page
+        
+        Raises:
+            ValueError: If the cursor is malformed
+        """
+        after = _decode_cursor(cursor) if cursor else (float("-inf"), "")
+        with self._lock:
+            rows = self._conn.execute(
+                _PAGE,
+                (device_id, normalize_article_url(article_url), after[0], after[1], limit + 1),
+            ).fetchall()
+        
+        margins = [MarginNote.model_validate_json(note) for _, _, note in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            created_at, key, _ = rows[limit - 1]
+            next_cursor = _encode_cursor(created_at, key)
+        return margins, next_cursor
+    
+    def iter_margins(self, device_id: str, article_url: str, page_size: int = 500) -> Iterator[MarginNote]:
+        """Yield all margins oldest first, one page at a time."""
+        cursor = None
+        while True:
+            margins, cursor = self.page(device_id, article_url, page_size, cursor)
+            yield from margins
+            if cursor is None:
+                return
+    
+    def iter_all(self, batch_size: int = 10_000) -> Iterator[Tuple[str, str, str, MarginNote]]:
+        """Yield (device_id, article_url, margin_key, margin) for every stored note."""
+        after = ("", "", "")
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT device_id, article_url, margin_key, note FROM margins "
+                    "WHERE (device_id, article_url, margin_key) > (?, ?, ?) "
+                    "ORDER BY device_id, article_url, margin_key LIMIT ?",
+                    (*after, batch_size),
+                ).fetchall()
+            for device_id, article_url, key, note in rows:
+                yield device_id, article_url, key, MarginNote.model_validate_json(note)
+            if len(rows) < batch_size:
+                return
+            after = rows[-1][:3]
+    
+    def count(self, device_id: str, article_url: str) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM margins WHERE device_id = ? AND article_url = ?",
+                (device_id, normalize_article_url(article_url)),
+            ).fetchone()[0]
+    
+    def close(self) -> None:
+        self._conn.close()
+
+
+_margin_store: Optional[MarginStore] = None
+
+
+def get_margin_store() -> MarginStore:
+    global _margin_store
+    if _margin_store is None:
+        _margin_store = MarginStore(get_settings().margin_store_path or ":memory:")
+    return _margin_store
@@ -1,123 +1,400 @@
 """Notion sync service."""
+from collections import OrderedDict
 from notion_client import AsyncClient
-from typing import Optional, List
+from notion_client.errors import APIErrorCode, APIResponseError
+from typing import Awaitable, Callable, Dict, Optional, List, Tuple
 from datetime import datetime
+from weakref import WeakValueDictionary
+import asyncio
+import hashlib
+import json
+import random
+import re
+import time
 
 from app.config import get_settings
+from app.core.metrics import observe_notion_sync, observe_notion_throttle_wait, record_notion_api_call
+from app.core.rate_limit import TokenBucket
 from app.schemas.article import MarginNote
+from app.services.notion_blocks import (
+    RENDER_VERSION,
+    margin_blocks,
+    note_content,
+    quote_content,
+    source_block,
+)
+from app.services.margin_store import margin_key
+from app.services.notion_sync_state import get_notion_sync_state
+
+
+# Notion accepts at most 100 children per create/append request
+CHILDREN_PER_REQUEST = 100
+
+# Each margin renders as a divider, a quote and a paragraph
+BLOCKS_PER_MARGIN = 3
+MARGINS_PER_REQUEST = CHILDREN_PER_REQUEST // BLOCKS_PER_MARGIN
+
+# Errors returned before Notion applied the request, safe to send again
+RETRY_CODES = {APIErrorCode.RateLimited, APIErrorCode.ServiceUnavailable}
+
+
+# Per (device, article) sync locks, shared by the services of every token
+# since the sync state they guard is keyed without the token
+_sync_locks: "WeakValueDictionary[Tuple[str, str], asyncio.Lock]" = WeakValueDictionary()
+
+# Notion rate-limits per integration token, so every service using a token
+# (one per database, plus the default service) draws from one bucket
+_rate_limiters: "WeakValueDictionary[str, TokenBucket]" = WeakValueDictionary()
+
+
+def _rate_limiter(auth: str) -> TokenBucket:
+    limiter = _rate_limiters.get(auth)
+    if limiter is None:
+        limiter = _rate_limiters[auth] = TokenBucket(get_settings().notion_rate_limit)
+    return limiter
+
+
+def margin_hash(margin: MarginNote) -> str:
+    """Hash of what a margin renders to in Notion.
+    
+    The blocks are fully determined by the two texts and ``RENDER_VERSION``,
+    so only those are hashed. The stdlib encoding keeps stored hashes
+    independent of whether orjson is installed.
+    """
+    encoded = json.dumps(
+        [RENDER_VERSION, margin.highlight_text, margin.voice_note],
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.sha1(encoded.encode()).hexdigest()[:16]
+
+
+# Validation error Notion returns when writing to an archived page or block,
+# e.g. "Can't edit block that is archived. You must unarchive the block..."
+_ARCHIVED_MESSAGE = re.compile(r"Can't edit (?:block|page) that is archived")
+
+
+def _page_gone(error: APIResponseError) -> bool:
+    """Whether the synced page was deleted or archived in Notion."""
+    if error.code == APIErrorCode.ObjectNotFound:
+        return True
+    return error.code == APIErrorCode.ValidationError and bool(_ARCHIVED_MESSAGE.match(str(error)))
 
 
 class NotionService:
     """Service for syncing notes to Notion."""
     
-    def __init__(self):
+    def __init__(self, auth: Optional[str] = None, database_id: Optional[str] = None):
         settings = get_settings()
-        self.client = AsyncClient(auth=settings.notion_api_key)
-        self.database_id = settings.notion_database_id
+        # The client is shared by all tokens; auth is sent with each call
+        self.client = get_notion_client()
+        self.auth = auth or settings.notion_api_key
+        self.database_id = database_id or settings.notion_database_id
+        self.max_retries = settings.notion_max_retries
+        # Bounds in-flight Notion requests across all concurrent syncs
+        self._semaphore = asyncio.Semaphore(settings.notion_max_concurrency)
+        self._rate_limiter = _rate_limiter(self.auth)
     
     async def sync_margins(
         self,
         article_title: str,
         article_url: str,
         margins: List[MarginNote],
+        device_id: Optional[str] = None,
     ) -> dict:
         """Sync margin notes to a Notion page.
         
-        Creates a new page in the configured database with all margin notes.
+        Creates a new page in the configured database with the first
+        100 blocks, then appends the rest in batches of 100 in order.
+        
+        With a ``device_id``, the page is remembered for that device and
+        article: later syncs append new notes and update changed ones in
+        place instead of creating another page.
         """
+        start = time.perf_counter()
         try:
-            # Build content blocks
-            children = []
-            
-            # Add source link
-            children.append({
-                "object": "block",
-                "type": "paragraph",
-                "paragraph": {
-                    "rich_text": [
-                        {"type": "text", "text": {"content": "Source: "}},
-                        {"type": "text", "text": {"content": article_url, "link": {"url": article_url}}},
-                    ]
+            if device_id is None:
+                children = [source_block(article_url)]
+                for margin in margins:
+                    children.extend(margin_blocks(margin))
+                response = await self._create_page(article_title, article_url, children)
+                result = {
+                    "success": True,
+                    "notion_url": response.get("url"),
+                    "message": f"Synced {len(margins)} notes to Notion",
                 }
-            })
-            
-            children.append({
-                "object": "block",
-                "type": "divider",
-                "divider": {}
-            })
-            
-            # Add each margin note
-            for i, margin in enumerate(margins, 1):
-                # Highlighted text as quote
-                children.append({
-                    "object": "block",
-                    "type": "quote",
-                    "quote": {
-                        "rich_text": [{"type": "text", "text": {"content": margin.highlight_text}}]
-                    }
-                })
-                
-                # Voice note as paragraph
-                children.append({
-                    "object": "block",
-                    "type": "paragraph",
-                    "paragraph": {
-                        "rich_text": [
-                            {"type": "text", "text": {"content": "💬 "}, "annotations": {"bold": True}},
-                            {"type": "text", "text": {"content": margin.voice_note}},
-                        ]
-                    }
-                })
-                
-                # Divider between notes
-                if i < len(margins):
-                    children.append({
-                        "object": "block",
-                        "type": "divider",
-                        "divider": {}
-                    })
-            
-            # Create the page
-            if self.database_id:
-                # Create in database
-                response = await self.client.pages.create(
-                    parent={"database_id": self.database_id},
-                    properties={
-                        "Name": {"title": [{"text": {"content": article_title}}]},
-                        "URL": {"url": article_url},
-                    },
-                    children=children,
-                )
             else:
-                # Create as standalone page (fallback)
-                response = await self.client.pages.create(
-                    parent={"page_id": "YOUR_PARENT_PAGE_ID"},  # Needs config
-                    properties={
-                        "title": {"title": [{"text": {"content": article_title}}]}
-                    },
-                    children=children,
-                )
-            
-            return {
-                "success": True,
-                "notion_url": response.get("url"),
-                "message": f"Synced {len(margins)} notes to Notion",
-            }
+                async with self._lock(device_id, article_url):
+                    result = await self._sync_incremental(
+                        device_id, article_title, article_url, margins
+                    )
             
+            observe_notion_sync("success", time.perf_counter() - start)
+            return result
+        
         except Exception as e:
+            observe_notion_sync("error", time.perf_counter() - start)
             return {
                 "success": False,
                 "notion_url": None,
                 "message": f"Sync failed: {str(e)}",
             }
+    
+    async def _sync_incremental(
+        self,
+        device_id: str,
+        article_title: str,
+        article_url: str,
+        margins: List[MarginNote],
+    ) -> dict:
+        """Push only the margins that are new or changed since the last sync."""
+        store = get_notion_sync_state()
+        state = store.get(device_id, article_url)
+        # Later duplicates of a key win, matching what the client shows
+        entries = {margin_key(margin): margin for margin in margins}
+        
+        if state is not None:
+            try:
+                added, updated = await self._apply_delta(state, entries)
+            except APIResponseError as e:
+                if not _page_gone(e):
+                    raise
+                # The page was deleted or archived in Notion: start over
+                store.delete(device_id, article_url)
+                state = None
+            else:
+                if added or updated:
+                    message = f"Synced {added} new and {updated} changed notes to Notion"
+                else:
+                    message = "Notion page is already up to date"
+                return {"success": True, "notion_url": state["page_url"], "message": message}
+            finally:
+                if state is not None:
+                    store.put(device_id, article_url, state)
+        
+        response = await self._create_page(
+            article_title, article_url, [source_block(article_url)]
+        )
+        state = {"page_id": response["id"], "page_url": response.get("url"), "margins": {}}
+        try:
+            await self._apply_delta(state, entries)
+        finally:
+            store.put(device_id, article_url, state)
+        
+        return {
+            "success": True,
+            "notion_url": state["page_url"],
+            "message": f"Synced {len(margins)} notes to Notion",
+        }
+    
+    async def _apply_delta(self, state: dict, entries: Dict[str, MarginNote]) -> Tuple[int, int]:
+        """Update changed margins in place and append new ones.
+        
+        ``state`` is updated as each request succeeds, so a failure part
+        way through never causes blocks to be sent twice.
+        
+        Returns:
+            (added, updated) margin counts
+        """
+        known = state["margins"]
+        new = []
+        updated = 0
+        
+        for key, margin in entries.items():
+            content_hash = margin_hash(margin)
+            entry = known.get(key)
+            if entry is None:
+                new.append((key, content_hash, margin))
+            elif entry["hash"] != content_hash:
+                _, quote_id, paragraph_id = entry["block_ids"]
+                await self._call(
+                    "blocks.update", self.client.blocks.update,
+                    block_id=quote_id, quote=quote_content(margin.highlight_text),
+                )
+                await self._call(
+                    "blocks.update", self.client.blocks.update,
+                    block_id=paragraph_id, paragraph=note_content(margin.voice_note),
+                )
+                entry["hash"] = content_hash
+                updated += 1
+        
+        for offset in range(0, len(new), MARGINS_PER_REQUEST):
+            batch = new[offset:offset + MARGINS_PER_REQUEST]
+            children = [block for _, _, margin in batch for block in margin_blocks(margin)]
+            response = await self._call(
+                "blocks.children.append",
+                self.client.blocks.children.append,
+                block_id=state["page_id"],
+                children=children,
+            )
+            block_ids = [block["id"] for block in response["results"]]
+            for index, (key, content_hash, _) in enumerate(batch):
+                known[key] = {
+                    "hash": content_hash,
+                    "block_ids": block_ids[index * BLOCKS_PER_MARGIN:(index + 1) * BLOCKS_PER_MARGIN],
+                }
+        
+        return len(new), updated
+    
+    async def _create_page(self, article_title: str, article_url: str, children: List[dict]) -> dict:
+        """Create the page with the first batch of children and append the rest."""
+        first, rest = children[:CHILDREN_PER_REQUEST], children[CHILDREN_PER_REQUEST:]
+        
+        if self.database_id:
+            # Create in database
+            response = await self._call(
+                "pages.create",
+                self.client.pages.create,
+                parent={"database_id": self.database_id},
+                properties={
+                    "Name": {"title": [{"text": {"content": article_title}}]},
+                    "URL": {"url": article_url},
+                },
+                children=first,
+            )
+        else:
+            # Create as standalone page (fallback)
+            response = await self._call(
+                "pages.create",
+                self.client.pages.create,
+                parent={"page_id": "YOUR_PARENT_PAGE_ID"},  # Needs config
+                properties={
+                    "title": {"title": [{"text": {"content": article_title}}]}
+                },
+                children=first,
+            )
+        
+        # Appends to one page must stay sequential to preserve block order
+        await self._append_blocks(response["id"], rest)
+        return response
+    
+    def _lock(self, device_id: str, article_url: str) -> asyncio.Lock:
+        """Serialize syncs of the same article so they don't create two pages."""
+        key = (device_id, article_url)
+        lock = _sync_locks.get(key)
+        if lock is None:
+            lock = _sync_locks[key] = asyncio.Lock()
+        return lock
+    
+    async def _append_blocks(self, block_id: str, children: List[dict]) -> None:
+        """Append children to a block in batches of CHILDREN_PER_REQUEST."""
+        for offset in range(0, len(children), CHILDREN_PER_REQUEST):
+            await self._call(
+                "blocks.children.append",
+                self.client.blocks.children.append,
+                block_id=block_id,
+                children=children[offset:offset + CHILDREN_PER_REQUEST],
+            )
+    
+    async def _call(self, method: str, func: Callable[..., Awaitable[dict]], **kwargs) -> dict:
+        """Call the Notion API, backing off on rate limits.
+        
+        Honors Retry-After when Notion sends it, otherwise uses jittered
+        exponential backoff.
+        """
+        for attempt in range(self.max_retries + 1):
+            # Wait for the rate limiter before taking a concurrency slot
+            observe_notion_throttle_wait(await self._rate_limiter.acquire())
+            async with self._semaphore:
+                try:
+                    result = await func(auth=self.auth, **kwargs)
+                except APIResponseError as e:
+                    if e.code not in RETRY_CODES or attempt == self.max_retries:
+                        record_notion_api_call(method, "error")
+                        raise
+                    record_notion_api_call(method, "rate_limited")
+                    retry_after = e.headers.get("retry-after") if e.headers else None
+                else:
+                    record_notion_api_call(method, "success")
+                    return result
+            
+            # Sleep outside the semaphore so other syncs can proceed
+            try:
+                delay = float(retry_after)
+            except (TypeError, ValueError):
+                delay = random.uniform(0, 0.5 * 2 ** attempt)
+            await asyncio.sleep(delay)
 
 
+class NotionServicePool:
+    """Bounded LRU pool of services for user-supplied Notion tokens.
+    
+    Services are kept per token and database; Notion rate-limits per
+    integration token, so services of the same token share one rate
+    limiter, and all of them share one HTTP connection pool. Services idle for longer than ``idle_seconds`` are
+    dropped, as are the least recently used once ``max_size`` is reached.
+    """
+    
+    def __init__(self, max_size: int = 256, idle_seconds: float = 900):
+        self.max_size = max_size
+        self.idle_seconds = idle_seconds
+        self._services: "OrderedDict[Tuple[str, Optional[str]], Tuple[NotionService, float]]" = OrderedDict()
+    
+    def get(self, auth: str, database_id: Optional[str] = None) -> NotionService:
+        now = time.monotonic()
+        key = (auth, database_id)
+        entry = self._services.pop(key, None)
+        service = entry[0] if entry else NotionService(auth=auth, database_id=database_id)
+        self._services[key] = (service, now)
+        self._evict(now)
+        return service
+    
+    def __len__(self) -> int:
+        return len(self._services)
+    
+    def _evict(self, now: float) -> None:
+        services = self._services
+        cutoff = now - self.idle_seconds
+        while services:
+            _, last_used = next(iter(services.values()))
+            if last_used >= cutoff and len(services) <= self.max_size:
+                break
+            services.popitem(last=False)
+
+
+_notion_client: Optional[AsyncClient] = None
 _notion_service: Optional[NotionService] = None
+_notion_service_pool: Optional[NotionServicePool] = None
+
 
+def get_notion_client() -> AsyncClient:
+    """Notion client without default auth, shared by every service."""
+    global _notion_client
+    if _notion_client is None:
+        base_url = get_settings().notion_base_url
+        _notion_client = AsyncClient(options={"base_url": base_url}) if base_url else AsyncClient()
+    return _notion_client
 
-def get_notion_service() -> NotionService:
-    global _notion_service
+
+async def close_notion_client() -> None:
+    """Close the shared client and drop the services holding it."""
+    global _notion_client, _notion_service, _notion_service_pool
+    if _notion_client is not None:
+        await _notion_client.aclose()
+        _notion_client = None
+    _notion_service = None
+    _notion_service_pool = None
+
+
+def get_notion_service(
+    notion_token: Optional[str] = None,
+    notion_database_id: Optional[str] = None,
+) -> NotionService:
+    """Service for the user's own Notion token, or the server integration.
+    
+    A database override is only honoured together with a user token so
+    requests cannot write to other databases shared with the server's
+    integration.
+    """
+    global _notion_service, _notion_service_pool
+    if notion_token:
+        if _notion_service_pool is None:
+            settings = get_settings()
+            _notion_service_pool = NotionServicePool(
+                max_size=settings.notion_client_pool_size,
+                idle_seconds=settings.notion_client_idle_seconds,
+            )
+        return _notion_service_pool.get(notion_token, notion_database_id)
     if _notion_service is None:
         _notion_service = NotionService()
     return _notion_service
@@ -0,0 +1,226 @@
+"""Background queue for Notion syncs."""
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import json
+import time
+import uuid
+
+from app.config import get_settings
+from app.core.metrics import set_notion_sync_queue_depth
+from app.core.sqlite import connect
+from app.schemas.article import MarginNote
+from app.services.notion_service import get_notion_service
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sync_jobs (
+    job_id TEXT PRIMARY KEY,
+    device_id TEXT NOT NULL,
+    article_url TEXT NOT NULL,
+    status TEXT NOT NULL,
+    result TEXT,
+    updated_at REAL NOT NULL
+) WITHOUT ROWID
+"""
+
+
+@dataclass
+class SyncJob:
+    """A queued Notion sync and, once finished, its result."""
+    id: str
+    device_id: str
+    article_title: str
+    article_url: str
+    margins: List[MarginNote]
+    notion_token: Optional[str] = field(default=None, repr=False)
+    notion_database_id: Optional[str] = None
+    status: str = "queued"  # queued, running, succeeded, failed
+    result: Optional[dict] = None
+    created_at: float = field(default_factory=time.time)
+
+
+class NotionSyncQueue:
+    """In-process queue of Notion sync jobs drained by worker tasks.
+    
+    A sync submitted while an earlier one for the same device and article
+    is still queued replaces that job's margins instead of adding another
+    job, so repeated syncs while reading collapse into one. Notion calls
+    made by the workers are paced by the service's rate limiter.
+    
+    Jobs run in the worker process that accepted them. When a path is
+    configured, job status and results are also written to SQLite so a
+    poll answered by another uvicorn worker still finds the job; without
+    one, polling only works with a single worker.
+    """
+    
+    def __init__(
+        self,
+        workers: int = 2,
+        max_pending: int = 1000,
+        max_jobs: int = 10_000,
+        path: Optional[str] = None,
+        retention_seconds: float = 24 * 3600,
+    ):
+        self.workers = workers
+        self.max_jobs = max_jobs
+        self.retention_seconds = retention_seconds
+        self._queue: "asyncio.Queue[SyncJob]" = asyncio.Queue(maxsize=max_pending)
+        self._pending: Dict[Tuple[str, str], SyncJob] = {}
+        self._jobs: "OrderedDict[str, SyncJob]" = OrderedDict()
+        self._tasks: List[asyncio.Task] = []
+        self._conn = None
+        self._last_prune = 0.0
+        if path:
+            self._conn = connect(path)
+            self._conn.execute(_SCHEMA)
+    
+    def submit(
+        self,
+        device_id: str,
+        article_title: str,
+        article_url: str,
+        margins: List[MarginNote],
+        notion_token: Optional[str] = None,
+        notion_database_id: Optional[str] = None,
+    ) -> SyncJob:
+        """Queue a sync, coalescing with a queued job for the same article.
+        
+        Raises:
+            asyncio.QueueFull: If too many jobs are waiting
+        """
+        key = (device_id, article_url)
+        job = self._pending.get(key)
+        if job is not None:
+            job.article_title = article_title
+            job.margins = margins
+            job.notion_token = notion_token
+            job.notion_database_id = notion_database_id
+            return job
+        
+        job = SyncJob(
+            id=uuid.uuid4().hex,
+            device_id=device_id,
+            article_title=article_title,
+            article_url=article_url,
+            margins=margins,
+            notion_token=notion_token,
+            notion_database_id=notion_database_id,
+        )
+        self._queue.put_nowait(job)
+        self._pending[key] = job
+        self._jobs[job.id] = job
+        self._evict()
+        self._save(job)
+        set_notion_sync_queue_depth(self._queue.qsize())
+        return job
+    
+    def get(self, job_id: str) -> Optional[SyncJob]:
+        """Look up a job, including ones accepted by other worker processes."""
+        job = self._jobs.get(job_id)
+        if job is not None or self._conn is None:
+            return job
+        row = self._conn.execute(
+            "SELECT device_id, article_url, status, result FROM sync_jobs WHERE job_id = ?",
+            (job_id,),
+        ).fetchone()
+        if row is None:
+            return None
+        device_id, article_url, status, result = row
+        return SyncJob(
+            id=job_id,
+            device_id=device_id,
+            article_title="",
+            article_url=article_url,
+            margins=[],
+            status=status,
+            result=json.loads(result) if result else None,
+        )
+    
+    def depth(self) -> int:
+        return self._queue.qsize()
+    
+    async def process_next(self) -> SyncJob:
+        """Take the next job from the queue and run it."""
+        job = await self._queue.get()
+        self._pending.pop((job.device_id, job.article_url), None)
+        set_notion_sync_queue_depth(self._queue.qsize())
+        
+        job.status = "running"
+        self._save(job)
+        try:
+            notion_service = get_notion_service(job.notion_token, job.notion_database_id)
+            job.result = await notion_service.sync_margins(
+                article_title=job.article_title,
+                article_url=job.article_url,
+                margins=job.margins,
+                device_id=job.device_id,
+            )
+        except Exception as e:
+            job.result = {"success": False, "notion_url": None, "message": f"Sync failed: {str(e)}"}
+        finally:
+            self._queue.task_done()
+        job.status = "succeeded" if job.result["success"] else "failed"
+        self._save(job)
+        return job
+    
+    async def run(self) -> None:
+        while True:
+            await self.process_next()
+    
+    def start(self) -> None:
+        self._tasks = [asyncio.create_task(self.run()) for _ in range(self.workers)]
+    
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+    
+    def _evict(self) -> None:
+        """Forget the oldest finished jobs beyond ``max_jobs``."""
+        while len(self._jobs) > self.max_jobs:
+            job_id, job = next(iter(self._jobs.items()))
+            if job.status in ("queued", "running"):
+                break
+            self._jobs.popitem(last=False)
+    
+    def _save(self, job: SyncJob) -> None:
+        """Write the job's status to the shared store, if there is one."""
+        if self._conn is None:
+            return
+        now = time.time()
+        self._conn.execute(
+            "INSERT OR REPLACE INTO sync_jobs "
+            "(job_id, device_id, article_url, status, result, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                job.id,
+                job.device_id,
+                job.article_url,
+                job.status,
+                json.dumps(job.result) if job.result is not None else None,
+                now,
+            ),
+        )
+        if now - self._last_prune > 60:
+            self._last_prune = now
+            self._conn.execute(
+                "DELETE FROM sync_jobs WHERE updated_at < ?",
+                (now - self.retention_seconds,),
+            )
+
+
+_notion_sync_queue: Optional[NotionSyncQueue] = None
+
+
+def get_notion_sync_queue() -> NotionSyncQueue:
+    global _notion_sync_queue
+    if _notion_sync_queue is None:
+        settings = get_settings()
+        _notion_sync_queue = NotionSyncQueue(
+            workers=settings.notion_sync_workers,
+            max_pending=settings.notion_sync_max_pending,
+            path=settings.notion_sync_job_path,
+        )
+    return _notion_sync_queue
@@ -0,0 +1,73 @@
+"""Per-article Notion sync state."""
+from typing import Dict, Optional, Tuple
+import json
+import time
+
+from app.config import get_settings
+from app.core.sqlite import connect
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS notion_sync_state (
+    device_id TEXT NOT NULL,
+    article_url TEXT NOT NULL,
+    state TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (device_id, article_url)
+) WITHOUT ROWID
+"""
+
+
+class NotionSyncStateStore:
+    """Remembers what was last pushed to Notion for each (device, article).
+    
+    A state is a dict holding the Notion ``page_id`` and ``page_url`` and a
+    ``margins`` mapping of margin key to ``{"hash": ..., "block_ids": [...]}``.
+    States are kept in memory, or in SQLite when a path is configured so they
+    survive restarts and are shared between workers.
+    """
+    
+    def __init__(self, path: Optional[str] = None):
+        self._states: Dict[Tuple[str, str], dict] = {}
+        self._conn = None
+        if path:
+            self._conn = connect(path)
+            self._conn.execute(_SCHEMA)
+    
+    def get(self, device_id: str, article_url: str) -> Optional[dict]:
+        if self._conn is None:
+            return self._states.get((device_id, article_url))
+        row = self._conn.execute(
+            "SELECT state FROM notion_sync_state WHERE device_id = ? AND article_url = ?",
+            (device_id, article_url),
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+    
+    def put(self, device_id: str, article_url: str, state: dict) -> None:
+        if self._conn is None:
+            self._states[(device_id, article_url)] = state
+            return
+        self._conn.execute(
+            "INSERT OR REPLACE INTO notion_sync_state (device_id, article_url, state, updated_at) "
+            "VALUES (?, ?, ?, ?)",
+            (device_id, article_url, json.dumps(state, separators=(",", ":")), time.time()),
+        )
+    
+    def delete(self, device_id: str, article_url: str) -> None:
+        if self._conn is None:
+            self._states.pop((device_id, article_url), None)
+            return
+        self._conn.execute(
+            "DELETE FROM notion_sync_state WHERE device_id = ? AND article_url = ?",
+            (device_id, article_url),
+        )
+
+
+_notion_sync_state: Optional[NotionSyncStateStore] = None
+
+
+def get_notion_sync_state() -> NotionSyncStateStore:
+    global _notion_sync_state
+    if _notion_sync_state is None:
+        _notion_sync_state = NotionSyncStateStore(get_settings().notion_sync_state_path)
+    return _notion_sync_state
@@ -0,0 +1,433 @@
+"""Full-text search over margin notes."""
+from array import array
+from bisect import bisect_left
+from dataclasses import dataclass
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+import hashlib
+import re
+import threading
+
+from app.config import get_settings
+from app.core.sqlite import connect
+from app.schemas.article import MarginNote, SearchHit
+
+
+_TOKEN = re.compile(r"\w+")
+_CLAUSE = re.compile(r'"([^"]*)"|(\S+)')
+
+
+# Stored notes indexed per lock acquisition or transaction during a backfill
+_BACKFILL_BATCH = 1000
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN.findall(text.lower())
+
+
+def _batches(rows: Iterable, size: int) -> Iterator[list]:
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+@dataclass
+class Clause:
+    """One part of a query: a phrase (several terms) or a single term/prefix."""
+    terms: List[str]
+    prefix: bool = False
+
+
+def parse_query(query: str) -> List[Clause]:
+    """Parse ``query`` into clauses that must all match.
+    
+    ``"quoted words"`` is a phrase, ``word*`` a prefix, anything else a term.
+    """
+    clauses = []
+    for phrase, word in _CLAUSE.findall(query):
+        if phrase:
+            terms = tokenize(phrase)
+            if terms:
+                clauses.append(Clause(terms))
+            continue
+        prefix = word.endswith("*")
+        terms = tokenize(word)
+        if not terms:
+            continue
+        if len(terms) > 1:
+            # Punctuation inside a word, e.g. "e-mail", matches as a phrase
+            clauses.append(Clause(terms))
+        else:
+            clauses.append(Clause(terms, prefix))
+    return clauses
+
+
+class _DeviceIndex:
+    """Inverted index over one device's notes.
+    
+    Postings are compact arrays of document ids, sorted because ids are
+    assigned in insertion order. A changed note gets a new document id and
+    the old one is tombstoned.
+    """
+    
+    def __init__(self):
+        self.postings: Dict[str, array] = {}
+        self.terms: List[str] = []  # Sorted vocabulary for prefix lookups
+        self.new_terms: List[str] = []
+        self.docs: List[Optional[Tuple[str, str, MarginNote]]] = []
+        self.doc_ids: Dict[Tuple[str, str], int] = {}
+    
+    def add(self, article_url: str, key: str, margin: MarginNote) -> None:
+        previous = self.doc_ids.get((article_url, key))
+        if previous is not None:
+            old = self.docs[previous][2]
+            if old.highlight_text == margin.highlight_text and old.voice_note == margin.voice_note:
+                self.docs[previous] = (article_url, key, margin)
+                return
+            self.docs[previous] = None
+        
+        doc_id = len(self.docs)
+        self.docs.append((article_url, key, margin))
+        self.doc_ids[(article_url, key)] = doc_id
+        for term in set(tokenize(margin.highlight_text)) | set(tokenize(margin.voice_note)):
+            postings = self.postings.get(term)
+            if postings is None:
+                postings = self.postings[term] = array("I")
+                self.new_terms.append(term)
+            postings.append(doc_id)
+    
+    def search(self, clauses: List[Clause], limit: int) -> List[SearchHit]:
+        """Walk the smallest posting list newest first until ``limit`` hits.
+        
+        Membership in the other term postings is checked by binary search
+        (they are sorted by construction), so common terms cost nothing
+        until a document is a candidate, and phrases are only verified for
+        documents that contain all their terms.
+        """
+        arrays: List[array] = []
+        sets: List[Set[int]] = []
+        phrases: List[List[str]] = []
+        for clause in clauses:
+            if clause.prefix:
+                matched: Set[int] = set()
+                for term in self._expand(clause.terms[0]):
+                    matched.update(self.postings[term])
+                if not matched:
+                    return []
+                sets.append(matched)
+                continue
+            for term in clause.terms:
+                postings = self.postings.get(term)
+                if postings is None:
+                    return []
+                arrays.append(postings)
+            if len(clause.terms) > 1:
+                phrases.append(clause.terms)
+        
+        if arrays:
+            arrays.sort(key=len)
+            driver, arrays = arrays[0], arrays[1:]
+        else:
+            sets.sort(key=len)
+            driver, sets = sorted(sets[0]), sets[1:]
+        
+        hits = []
+        # Document ids grow with time, so walking backwards is newest first
+        for doc_id in reversed(driver):
+            doc = self.docs[doc_id]
+            if doc is None:
+                continue
+            if not all(_contains(postings, doc_id) for postings in arrays):
+                continue
+            if not all(doc_id in matched for matched in sets):
+                continue
+            if not all(self._has_phrase(doc, terms) for terms in phrases):
+                continue
+            hits.append(SearchHit(article_url=doc[0], margin=doc[2]))
+            if len(hits) == limit:
+                break
+        return hits
+    
+    def _expand(self, prefix: str) -> List[str]:
+        """Vocabulary terms starting with ``prefix``."""
+        if self.new_terms:
+            self.terms = sorted(self.terms + self.new_terms)
+            self.new_terms = []
+        start = bisect_left(self.terms, prefix)
+        end = bisect_left(self.terms, prefix + "\U0010ffff", start)
+        return self.terms[start:end]
+    
+    @staticmethod
+    def _has_phrase(doc: Tuple[str, str, MarginNote], terms: List[str]) -> bool:
+        width = len(terms)
+        for text in (doc[2].highlight_text, doc[2].voice_note):
+            tokens = tokenize(text)
+            if any(tokens[i:i + width] == terms for i in range(len(tokens) - width + 1)):
+                return True
+        return False
+
+
+def _contains(postings: array, doc_id: int) -> bool:
+    index = bisect_left(postings, doc_id)
+    return index < len(postings) and postings[index] == doc_id
+
+
+class SearchIndex:
+    """In-process full-text index of margin notes, partitioned by device.
+    
+    Queries only ever touch the requesting device's partition.
+    """
+    
+    def __init__(self):
+        self._devices: Dict[str, _DeviceIndex] = {}
+        self._lock = threading.Lock()
+        self._backfilled = False
+    
+    def index(self, device_id: str, article_url: str, entries: Iterable[Tuple[str, MarginNote]]) -> None:
+        """Add or replace notes given as (margin_key, margin) pairs."""
+        with self._lock:
+            device = self._devices.get(device_id)
+            if device is None:
+                device = self._devices[device_id] = _DeviceIndex()
+            for key, margin in entries:
+                device.add(article_url, key, margin)
+    
+    def backfill(self, rows: Iterable[Tuple[str, str, str, MarginNote]]) -> int:
+        """Index stored (device_id, article_url, margin_key, margin) rows.
+        
+        Notes already in the index were written after the backfill started
+        and are newer than the stored copy, so they are left alone. The lock
+        is released between batches so searches and writes can interleave.
+        
+        Returns:
+            Number of notes added
+        """
+        added = 0
+        for batch in _batches(rows, _BACKFILL_BATCH):
+            with self._lock:
+                for device_id, article_url, key, margin in batch:
+                    device = self._devices.get(device_id)
+                    if device is None:
+                        device = self._devices[device_id] = _DeviceIndex()
+                    if (article_url, key) in device.doc_ids:
+                        continue
+                    device.add(article_url, key, margin)
+                    added += 1
+        self._backfilled = True
+        return added
+    
+    def needs_backfill(self) -> bool:
+        return not self._backfilled
+    
+    def search(self, device_id: str, query: str, limit: int = 20) -> List[SearchHit]:
+        """Notes of ``device_id`` matching every clause, newest first."""
+        clauses = parse_query(query)
+        with self._lock:
+            device = self._devices.get(device_id)
+            if device is None or not clauses:
+                return []
+            return device.search(clauses, limit)
+
+
+_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS margin_fts USING fts5(
+    device_token,
+    device_id UNINDEXED,
+    article_url UNINDEXED,
+    margin_key UNINDEXED,
+    note UNINDEXED,
+    highlight_text,
+    voice_note,
+    tokenize = 'unicode61'
+);
+CREATE TABLE IF NOT EXISTS margin_fts_keys (
+    device_id TEXT NOT NULL,
+    article_url TEXT NOT NULL,
+    margin_key TEXT NOT NULL,
+    fts_rowid INTEGER NOT NULL,
+    PRIMARY KEY (device_id, article_url, margin_key)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS search_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+def _device_token(device_id: str) -> str:
+    """Single FTS token standing for a device.
+    
+    Device ids contain separators the tokenizer would split on, so the
+    indexed form is a hex digest with a letter prefix.
+    """
+    return "d" + hashlib.sha1(device_id.encode()).hexdigest()[:20]
+
+
+class SqliteSearchIndex:
+    """Full-text index of margin notes backed by SQLite FTS5.
+    
+    Every row carries a token for its device, and queries match on it
+    together with the search terms, so a query only walks the device's
+    own postings however many other devices share the table.
+    
+    The file is shared by all workers and survives restarts, so it is
+    backfilled from the margin store only once.
+    """
+    
+    def __init__(self, path: str):
+        self._conn = connect(path)
+        outdated = self._drop_outdated()
+        self._conn.executescript(_FTS_SCHEMA)
+        if outdated:
+            self._conn.execute("DELETE FROM search_meta WHERE key = 'backfilled'")
+        self._lock = threading.Lock()
+    
+    def _drop_outdated(self) -> bool:
+        """Drop an index built without device tokens; the backfill rebuilds it."""
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(margin_fts)")]
+        if not columns or "device_token" in columns:
+            return False
+        self._conn.executescript("DROP TABLE margin_fts; DROP TABLE IF EXISTS margin_fts_keys;")
+        return True
+    
+    def index(self, device_id: str, article_url: str, entries: Iterable[Tuple[str, MarginNote]]) -> None:
+        """Add or replace notes given as (margin_key, margin) pairs."""
+        entries = list(entries)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for key, margin in entries:
+                    # UNINDEXED columns can't be searched efficiently, so the
+                    # row of an existing note is found through margin_fts_keys
+                    row = self._conn.execute(
+                        "SELECT fts_rowid FROM margin_fts_keys "
+                        "WHERE device_id = ? AND article_url = ? AND margin_key = ?",
+                        (device_id, article_url, key),
+                    ).fetchone()
+                    if row:
+                        self._conn.execute("DELETE FROM margin_fts WHERE rowid = ?", row)
+                    fts_rowid = self._conn.execute(
+                        "INSERT INTO margin_fts "
+                        "(device_token, device_id, article_url, margin_key, note, highlight_text, voice_note) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (_device_token(device_id), device_id, article_url, key, margin.model_dump_json(),
+                         margin.highlight_text, margin.voice_note),
+                    ).lastrowid
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO margin_fts_keys "
+                        "(device_id, article_url, margin_key, fts_rowid) VALUES (?, ?, ?, ?)",
+                        (device_id, article_url, key, fts_rowid),
+                    )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+    
+    def backfill(self, rows: Iterable[Tuple[str, str, str, MarginNote]]) -> int:
+        """Index stored (device_id, article_url, margin_key, margin) rows.
+        
+        Notes that are already indexed are skipped, so concurrent backfills
+        from several workers and live writes don't clobber each other. The
+        index is marked complete once every row has been seen.
+        
+        Returns:
+            Number of notes added
+        """
+        added = 0
+        for batch in _batches(rows, _BACKFILL_BATCH):
+            with self._lock:
+                self._conn.execute("BEGIN IMMEDIATE")
+                try:
+                    for device_id, article_url, key, margin in batch:
+                        inserted = self._conn.execute(
+                            "INSERT INTO margin_fts "
+                            "(device_token, device_id, article_url, margin_key, note, highlight_text, voice_note) "
+                            "SELECT ?, ?, ?, ?, ?, ?, ? WHERE NOT EXISTS ("
+                            "SELECT 1 FROM margin_fts_keys "
+                            "WHERE device_id = ? AND article_url = ? AND margin_key = ?)",
+                            (_device_token(device_id), device_id, article_url, key, margin.model_dump_json(),
+                             margin.highlight_text, margin.voice_note,
+                             device_id, article_url, key),
+                        )
+                        if not inserted.rowcount:
+                            continue
+                        self._conn.execute(
+                            "INSERT INTO margin_fts_keys "
+                            "(device_id, article_url, margin_key, fts_rowid) VALUES (?, ?, ?, ?)",
+                            (device_id, article_url, key, inserted.lastrowid),
+                        )
+                        added += 1
+                    self._conn.execute("COMMIT")
+                except BaseException:
+                    self._conn.execute("ROLLBACK")
+                    raise
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO search_meta (key, value) VALUES ('backfilled', '1')"
+            )
+        return added
+    
+    def needs_backfill(self) -> bool:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT 1 FROM search_meta WHERE key = 'backfilled'"
+            ).fetchone() is None
+    
+    def search(self, device_id: str, query: str, limit: int = 20) -> List[SearchHit]:
+        """Notes of ``device_id`` matching every clause, newest first."""
+        clauses = parse_query(query)
+        if not clauses:
+            return []
+        terms = " AND ".join(
+            '"' + " ".join(clause.terms) + '"' + ("*" if clause.prefix else "")
+            for clause in clauses
+        )
+        match = f'device_token:"{_device_token(device_id)}" AND {{highlight_text voice_note}}:({terms})'
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT article_url, note FROM margin_fts "
+                "WHERE margin_fts MATCH ? ORDER BY rowid DESC LIMIT ?",
+                (match, limit),
+            ).fetchall()
+        return [
+            SearchHit(article_url=article_url, margin=MarginNote.model_validate_json(note))
+            for article_url, note in rows
+        ]
+
+
+_search_index = None
+
+
+def get_search_index():
+    """The configured search index.
+    
+    Notes stored before this process started are added by
+    ``backfill_search_index``, which the app runs in a thread at startup.
+    """
+    global _search_index
+    if _search_index is None:
+        settings = get_settings()
+        if settings.search_backend == "sqlite":
+            _search_index = SqliteSearchIndex(settings.search_index_path)
+        else:
+            _search_index = SearchIndex()
+    return _search_index
+
+
+def backfill_search_index() -> int:
+    """Add stored margins to the search index if it doesn't have them yet.
+    
+    Scans the whole margin store, so call it off the event loop.
+    
+    Returns:
+        Number of notes added
+    """
+    from app.services.margin_store import get_margin_store
+    
+    index = get_search_index()
+    if not index.needs_backfill():
+        return 0
+    return index.backfill(get_margin_store().iter_all())
@@ -0,0 +1,240 @@
+"""Token service backed by a SQLite file shared across worker processes."""
+from typing import List, Optional, Tuple
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+import json
+import threading
+
+from app.core.sqlite import connect
+from app.schemas.token import TokenStatus, TokenUseResponse
+from app.services.token_service import TokenService
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS device_tokens (
+    device_id TEXT PRIMARY KEY,
+    total_tokens INTEGER NOT NULL DEFAULT 0,
+    used_tokens INTEGER NOT NULL DEFAULT 0,
+    free_trial_count INTEGER NOT NULL,
+    free_trial_used INTEGER NOT NULL DEFAULT 0,
+    is_unlimited INTEGER NOT NULL DEFAULT 0,
+    unlimited_until REAL
+) WITHOUT ROWID
+"""
+
+_COLUMNS = (
+    "device_id, total_tokens, used_tokens, free_trial_count, "
+    "free_trial_used, is_unlimited, unlimited_until"
+)
+
+# Consume scripts: each is a single conditional UPDATE, run inside one
+# immediate transaction so no other worker can interleave.
+_IS_UNLIMITED = (
+    "SELECT 1 FROM device_tokens WHERE device_id = ? AND is_unlimited = 1 "
+    "AND (unlimited_until IS NULL OR unlimited_until > ?)"
+)
+_CONSUME_FREE = (
+    "UPDATE device_tokens SET free_trial_used = free_trial_used + 1 "
+    "WHERE device_id = ? AND free_trial_used < free_trial_count "
+    "RETURNING free_trial_count - free_trial_used, total_tokens - used_tokens"
+)
+_CONSUME_PAID = (
+    "UPDATE device_tokens SET used_tokens = used_tokens + 1 "
+    "WHERE device_id = ? AND used_tokens < total_tokens "
+    "RETURNING total_tokens - used_tokens"
+)
+
+# Largest number of ids sent in one batched read
+_READ_BATCH = 10_000
+
+
+class SharedTokenService(TokenService):
+    """TokenService whose state lives in a SQLite database file.
+    
+    Every uvicorn worker opens the same file (by default under /dev/shm, so
+    it stays in shared memory), which keeps accounting correct when the API
+    runs with ``--workers N``. Token consumption runs as conditional UPDATEs
+    inside an immediate transaction, so concurrent workers can never spend
+    the same token twice. Batch status reads fetch all rows in one query.
+    
+    The in-process event log is not used with this backend; the database
+    file itself is the durable state.
+    
+    A write may wait up to the busy timeout for another worker's lock, so
+    ``offload_writes`` tells request handlers to run per-request writes
+    (``use_token``) in a thread. Rare writes (webhooks, admin) still run
+    inline; under heavy cross-worker contention they can briefly stall the
+    event loop. Reads never wait in WAL mode.
+    """
+    
+    offload_writes = True
+    
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = path
+        self._conn = connect(path)
+        self._conn.execute(_SCHEMA)
+        # Writes may come from the loop and from worker threads at once,
+        # and the connection can only hold one transaction
+        self._write_lock = threading.Lock()
+    
+    def _get_device_data(self, device_id: str) -> dict:
+        """Read a copy of device data (changes are not written back)."""
+        row = self._conn.execute(
+            f"SELECT {_COLUMNS} FROM device_tokens WHERE device_id = ?",
+            (device_id,),
+        ).fetchone()
+        return self._row_to_data(row)
+    
+    def get_token_statuses(self, device_ids: List[str]) -> List[TokenStatus]:
+        """Get token status for many devices with batched queries."""
+        rows = {}
+        for start in range(0, len(device_ids), _READ_BATCH):
+            chunk = device_ids[start:start + _READ_BATCH]
+            for row in self._conn.execute(
+                f"SELECT {_COLUMNS} FROM device_tokens "
+                "WHERE device_id IN (SELECT value FROM json_each(?))",
+                (json.dumps(chunk),),
+            ):
+                rows[row[0]] = row
+        return [
+            self._build_status(device_id, self._row_to_data(rows.get(device_id)))
+            for device_id in device_ids
+        ]
+    
+    def use_token(self, device_id: str) -> TokenUseResponse:
+        """Atomically use a token, shared across all worker processes."""
+        free = paid = None
+        with self._transaction() as conn:
+            self._ensure_devices(conn, [device_id])
+            unlimited = conn.execute(
+                _IS_UNLIMITED, (device_id, datetime.now().timestamp())
+            ).fetchone()
+            if not unlimited:
+                free = conn.execute(_CONSUME_FREE, (device_id,)).fetchone()
+                if free is None:
+                    paid = conn.execute(_CONSUME_PAID, (device_id,)).fetchone()
+        
+        if unlimited:
+            return TokenUseResponse(
+                success=True,
+                remaining_tokens=999999,
+                message="Unlimited access",
+            )
+        
+        if free is not None:
+            free_remaining, paid_remaining = free
+            return TokenUseResponse(
+                success=True,
+                remaining_tokens=free_remaining + paid_remaining,
+                message=f"Free trial: {free_remaining} free uses remaining",
+            )
+        
+        if paid is not None:
+            remaining = paid[0]
+            return TokenUseResponse(
+                success=True,
+                remaining_tokens=remaining,
+                message=f"{remaining} tokens remaining",
+            )
+        
+        return TokenUseResponse(
+            success=False,
+            remaining_tokens=0,
+            message="No tokens remaining. Please purchase more.",
+        )
+    
+    def add_tokens(self, device_id: str, amount: int) -> TokenStatus:
+        """Add tokens to a device (after successful payment)."""
+        self._add_tokens_many([(device_id, amount)])
+        return self.get_token_status(device_id)
+    
+    def set_unlimited(self, device_id: str, months: int = 0) -> TokenStatus:
+        """Set unlimited access for a device.
+        
+        Args:
+            device_id: Device identifier
+            months: Number of months (0 = permanent unlimited)
+        """
+        self._set_unlimited_many([(device_id, months)])
+        return self.get_token_status(device_id)
+    
+    def bulk_add_tokens(self, grants: List[Tuple[str, int]]) -> int:
+        """Add tokens to many devices in one database transaction."""
+        self._validate_grants(grants, "amount", minimum=1)
+        self._add_tokens_many(grants)
+        return len(grants)
+    
+    def bulk_set_unlimited(self, grants: List[Tuple[str, int]]) -> int:
+        """Set unlimited access for many devices in one database transaction."""
+        self._validate_grants(grants, "months", minimum=0)
+        self._set_unlimited_many(grants)
+        return len(grants)
+    
+    def reset_device(self, device_id: str) -> None:
+        """Reset device data (for testing)."""
+        with self._write_lock:
+            self._conn.execute("DELETE FROM device_tokens WHERE device_id = ?", (device_id,))
+    
+    def close(self) -> None:
+        """Close the database connection."""
+        self._conn.close()
+    
+    def _add_tokens_many(self, grants: List[Tuple[str, int]]) -> None:
+        with self._transaction() as conn:
+            self._ensure_devices(conn, [device_id for device_id, _ in grants])
+            conn.executemany(
+                "UPDATE device_tokens SET total_tokens = total_tokens + ? WHERE device_id = ?",
+                [(amount, device_id) for device_id, amount in grants],
+            )
+    
+    def _set_unlimited_many(self, grants: List[Tuple[str, int]]) -> None:
+        now = datetime.now()
+        with self._transaction() as conn:
+            self._ensure_devices(conn, [device_id for device_id, _ in grants])
+            conn.executemany(
+                "UPDATE device_tokens SET is_unlimited = 1, unlimited_until = ? WHERE device_id = ?",
+                [
+                    ((now + timedelta(days=30 * months)).timestamp() if months > 0 else None, device_id)
+                    for device_id, months in grants
+                ],
+            )
+    
+    def _ensure_devices(self, conn, device_ids: List[str]) -> None:
+        conn.executemany(
+            "INSERT OR IGNORE INTO device_tokens (device_id, free_trial_count) VALUES (?, ?)",
+            [(device_id, self.settings.free_trial_count) for device_id in device_ids],
+        )
+    
+    @contextmanager
+    def _transaction(self):
+        """Run statements under the database write lock."""
+        conn = self._conn
+        with self._write_lock:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+    
+    def _row_to_data(self, row: Optional[tuple]) -> dict:
+        if row is None:
+            return {
+                "total_tokens": 0,
+                "used_tokens": 0,
+                "free_trial_count": self.settings.free_trial_count,
+                "free_trial_used": 0,
+                "is_unlimited": False,
+                "unlimited_until": None,
+            }
+        _, total, used, free_count, free_used, is_unlimited, until = row
+        return {
+            "total_tokens": total,
+            "used_tokens": used,
+            "free_trial_count": free_count,
+            "free_trial_used": free_used,
+            "is_unlimited": bool(is_unlimited),
+            "unlimited_until": datetime.fromtimestamp(until) if until else None,
+        }
@@ -0,0 +1,192 @@
+"""Append-only event log for token mutations."""
+from typing import Iterator, List, Optional, Tuple
+import glob
+import json
+import os
+import threading
+import time
+
+
+class TokenEventLog:
+    """Group-committed, append-only log of token mutations with snapshots.
+    
+    Events are JSON lines written to numbered segment files. Appends are
+    buffered and written together (group commit) once the buffer is full or
+    the commit interval has passed. A snapshot stores the full token state
+    together with the sequence number of the last event it includes; after
+    a snapshot a new segment is started so recovery only reads the tail.
+    Old segments are kept as the audit history unless ``retain_segments``
+    is disabled.
+    
+    Appends may come from the event loop while a worker thread commits or
+    snapshots: the buffer has its own short lock, and the slow file
+    writes are serialized by a second one.
+    """
+    
+    SNAPSHOT_FILE = "snapshot.json"
+    SEGMENT_PATTERN = "events-*.log"
+    
+    def __init__(
+        self,
+        directory: str,
+        group_commit_size: int = 256,
+        group_commit_interval: float = 0.05,
+        snapshot_every: int = 100_000,
+        fsync: bool = True,
+        retain_segments: bool = True,
+    ):
+        self.directory = directory
+        self.group_commit_size = group_commit_size
+        self.group_commit_interval = group_commit_interval
+        self.snapshot_every = snapshot_every
+        self.fsync = fsync
+        self.retain_segments = retain_segments
+        
+        os.makedirs(directory, exist_ok=True)
+        self._buffer: List[str] = []
+        self._file = None
+        self._seq = self._last_seq_on_disk()
+        self._events_since_snapshot = 0
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+    
+    @property
+    def seq(self) -> int:
+        """Sequence number of the last appended event."""
+        return self._seq
+    
+    def append(self, op: str, device_id: str, **fields) -> int:
+        """Append an event, committing the buffer when the group is full."""
+        with self._lock:
+            self._seq += 1
+            seq = self._seq
+            event = {"seq": seq, "ts": time.time(), "op": op, "device_id": device_id}
+            event.update(fields)
+            self._buffer.append(json.dumps(event, separators=(",", ":")))
+            self._events_since_snapshot += 1
+            due = (
+                len(self._buffer) >= self.group_commit_size
+                or time.monotonic() - self._last_flush >= self.group_commit_interval
+            )
+        
+        if due:
+            self.flush()
+        return seq
+    
+    def flush(self) -> None:
+        """Write all buffered events in a single write (and fsync)."""
+        with self._write_lock:
+            self._flush()
+    
+    def _flush(self) -> None:
+        with self._lock:
+            self._last_flush = time.monotonic()
+            buffer = self._buffer
+            if not buffer:
+                return
+            self._buffer = []
+            first_seq = self._seq - len(buffer) + 1
+        
+        if self._file is None:
+            self._file = open(self._segment_path(first_seq), "w", encoding="utf-8")
+        
+        self._file.write("\n".join(buffer) + "\n")
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+    
+    def needs_snapshot(self) -> bool:
+        """Whether enough events have accumulated to take a snapshot."""
+        return self._events_since_snapshot >= self.snapshot_every
+    
+    def snapshot(self, state: dict, seq: Optional[int] = None) -> None:
+        """Persist a compact snapshot of ``state`` and start a new segment.
+        
+        Args:
+            state: JSON-serializable token state
+            seq: Last event ``state`` includes; defaults to the last
+                appended event. Later events stay in the log tail.
+        """
+        with self._write_lock:
+            self._flush()
+            with self._lock:
+                if seq is None:
+                    seq = self._seq
+                last_seq = self._seq
+                self._events_since_snapshot = last_seq - seq
+            old_segments = self._segments()
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            
+            tmp_path = os.path.join(self.directory, self.SNAPSHOT_FILE + ".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"seq": seq, "state": state}, f, separators=(",", ":"))
+                f.flush()
+                if self.fsync:
+                    os.fsync(f.fileno())
+            os.replace(tmp_path, os.path.join(self.directory, self.SNAPSHOT_FILE))
+            
+            if not self.retain_segments:
+                # Keep any segment holding events newer than the snapshot
+                for index, (path, _) in enumerate(old_segments):
+                    next_first = old_segments[index + 1][1] if index + 1 < len(old_segments) else last_seq + 1
+                    if next_first - 1 <= seq:
+                        os.remove(path)
+    
+    def load_snapshot(self) -> Tuple[int, Optional[dict]]:
+        """Return (seq, state) of the latest snapshot, or (0, None)."""
+        path = os.path.join(self.directory, self.SNAPSHOT_FILE)
+        if not os.path.exists(path):
+            return 0, None
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return data["seq"], data["state"]
+    
+    def read_events(self, after_seq: int = 0) -> Iterator[dict]:
+        """Yield committed events with a sequence number above ``after_seq``.
+        
+        Segments that end before ``after_seq`` are skipped without being
+        read. A torn final line from a crash mid-write is ignored.
+        """
+        segments = self._segments()
+        for index, (path, first_seq) in enumerate(segments):
+            next_first = segments[index + 1][1] if index + 1 < len(segments) else None
+            if next_first is not None and next_first <= after_seq + 1:
+                continue
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        event = json.loads(line)
+                    except json.JSONDecodeError:
+                        break
+                    if event["seq"] > after_seq:
+                        yield event
+    
+    def close(self) -> None:
+        """Flush pending events and close the current segment."""
+        with self._write_lock:
+            self._flush()
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+    
+    def _segment_path(self, first_seq: int) -> str:
+        return os.path.join(self.directory, f"events-{first_seq:020d}.log")
+    
+    def _segments(self) -> List[Tuple[str, int]]:
+        """Segment files as (path, first_seq), oldest first."""
+        paths = glob.glob(os.path.join(self.directory, self.SEGMENT_PATTERN))
+        segments = [(path, int(os.path.basename(path)[7:-4])) for path in paths]
+        return sorted(segments, key=lambda segment: segment[1])
+    
+    def _last_seq_on_disk(self) -> int:
+        """Find the highest committed sequence number (log tail or snapshot)."""
+        segments = self._segments()
+        if not segments:
+            return self.load_snapshot()[0]
+        last_seq = segments[-1][1] - 1
+        for event in self.read_events(after_seq=last_seq):
+            last_seq = event["seq"]
+        return last_seq
@@ -1,9 +1,12 @@
 """Token management service."""
-from typing import Dict, Optional
+from typing import Callable, Dict, List, Optional, Tuple, TypeVar
 from datetime import datetime, timedelta
+import asyncio
+import threading
 
 from app.config import get_settings
 from app.schemas.token import TokenStatus, TokenUseResponse
+from app.services.token_event_log import TokenEventLog
 
 
 class TokenService:
@@ -11,12 +14,23 @@ class TokenService:
     
     Note: This is an in-memory implementation for demo purposes.
     In production, this would use a database.
+    
+    When an event log is given, every mutation is appended to it and the
+    in-memory state is rebuilt from its latest snapshot plus the log tail.
     """
     
-    def __init__(self):
+    # Plain dict updates: too fast to be worth a thread
+    offload_writes = False
+    
+    def __init__(self, event_log: Optional[TokenEventLog] = None):
         self.settings = get_settings()
         # In-memory storage: device_id -> token data
         self._tokens: Dict[str, dict] = {}
+        self._event_log = event_log
+        # Webhook batches and log snapshots run in worker threads
+        self._write_lock = threading.Lock()
+        if event_log is not None:
+            self.recover()
     
     def _get_device_data(self, device_id: str) -> dict:
         """Get or create device data."""
@@ -33,8 +47,16 @@ class TokenService:
     
     def get_token_status(self, device_id: str) -> TokenStatus:
         """Get token status for a device."""
-        data = self._get_device_data(device_id)
-        
+        return self._build_status(device_id, self._get_device_data(device_id))
+    
+    def get_token_statuses(self, device_ids: List[str]) -> List[TokenStatus]:
+        """Get token status for many devices in one call."""
+        build_status = self._build_status
+        get_device_data = self._get_device_data
+        return [build_status(device_id, get_device_data(device_id)) for device_id in device_ids]
+    
+    def _build_status(self, device_id: str, data: dict) -> TokenStatus:
+        """Build a TokenStatus from raw device data."""
         # Check if unlimited subscription has expired
         is_unlimited = data["is_unlimited"]
         if is_unlimited and data["unlimited_until"]:
@@ -74,49 +96,56 @@ class TokenService:
     
     def use_token(self, device_id: str) -> TokenUseResponse:
         """Use a token for generation."""
-        data = self._get_device_data(device_id)
-        status = self.get_token_status(device_id)
-        
-        if status.is_unlimited:
-            return TokenUseResponse(
-                success=True,
-                remaining_tokens=999999,
-                message="Unlimited access",
-            )
-        
-        # Use free trial if available
-        free_remaining = data["free_trial_count"] - data["free_trial_used"]
-        if free_remaining > 0:
-            data["free_trial_used"] += 1
-            new_free_remaining = data["free_trial_count"] - data["free_trial_used"]
+        with self._write_lock:
+            data = self._get_device_data(device_id)
+            status = self.get_token_status(device_id)
+            
+            if status.is_unlimited:
+                self._record("use", device_id, kind="unlimited")
+                return TokenUseResponse(
+                    success=True,
+                    remaining_tokens=999999,
+                    message="Unlimited access",
+                )
+            
+            # Use free trial if available
+            free_remaining = data["free_trial_count"] - data["free_trial_used"]
+            if free_remaining > 0:
+                data["free_trial_used"] += 1
+                self._record("use", device_id, kind="free")
+                new_free_remaining = data["free_trial_count"] - data["free_trial_used"]
+                paid_remaining = data["total_tokens"] - data["used_tokens"]
+                return TokenUseResponse(
+                    success=True,
+                    remaining_tokens=new_free_remaining + paid_remaining,
+                    message=f"Free trial: {new_free_remaining} free uses remaining",
+                )
+            
+            # Use paid token
             paid_remaining = data["total_tokens"] - data["used_tokens"]
+            if paid_remaining > 0:
+                data["used_tokens"] += 1
+                self._record("use", device_id, kind="paid")
+                remaining = data["total_tokens"] - data["used_tokens"]
+                return TokenUseResponse(
+                    success=True,
+                    remaining_tokens=remaining,
+                    message=f"{remaining} tokens remaining",
+                )
+            
             return TokenUseResponse(
-                success=True,
-                remaining_tokens=new_free_remaining + paid_remaining,
-                message=f"Free trial: {new_free_remaining} free uses remaining",
+                success=False,
+                remaining_tokens=0,
+                message="No tokens remaining. Please purchase more.",
             )
-        
-        # Use paid token
-        paid_remaining = data["total_tokens"] - data["used_tokens"]
-        if paid_remaining > 0:
-            data["used_tokens"] += 1
-            remaining = data["total_tokens"] - data["used_tokens"]
-            return TokenUseResponse(
-                success=True,
-                remaining_tokens=remaining,
-                message=f"{remaining} tokens remaining",
-            )
-        
-        return TokenUseResponse(
-            success=False,
-            remaining_tokens=0,
-            message="No tokens remaining. Please purchase more.",
-        )
     
     def add_tokens(self, device_id: str, amount: int) -> TokenStatus:
         """Add tokens to a device (after successful payment)."""
-        data = self._get_device_data(device_id)
-        data["total_tokens"] += amount
+        with self._write_lock:
+            data = self._get_device_data(device_id)
+            data["total_tokens"] += amount
+            self._record("add", device_id, amount=amount)
+        self._commit_events()
         return self.get_token_status(device_id)
     
     def set_unlimited(self, device_id: str, months: int = 0) -> TokenStatus:
@@ -126,20 +155,173 @@ class TokenService:
             device_id: Device identifier
             months: Number of months (0 = permanent unlimited)
         """
-        data = self._get_device_data(device_id)
-        data["is_unlimited"] = True
-        if months > 0:
-            data["unlimited_until"] = datetime.now() + timedelta(days=30 * months)
-        else:
-            data["unlimited_until"] = None  # Permanent
+        with self._write_lock:
+            data = self._get_device_data(device_id)
+            data["is_unlimited"] = True
+            if months > 0:
+                data["unlimited_until"] = datetime.now() + timedelta(days=30 * months)
+            else:
+                data["unlimited_until"] = None  # Permanent
+            self._record("unlimited", device_id, until=self._isoformat(data["unlimited_until"]))
+        self._commit_events()
         return self.get_token_status(device_id)
     
+    def bulk_add_tokens(self, grants: List[Tuple[str, int]]) -> int:
+        """Add tokens to many devices as a single all-or-nothing operation.
+        
+        Every grant is validated before any balance changes, so an invalid
+        row leaves all devices untouched.
+        
+        Args:
+            grants: (device_id, amount) pairs
+        
+        Returns:
+            Number of grants applied
+        """
+        self._validate_grants(grants, "amount", minimum=1)
+        
+        get_device_data = self._get_device_data
+        record = self._record
+        with self._write_lock:
+            for device_id, amount in grants:
+                get_device_data(device_id)["total_tokens"] += amount
+                record("add", device_id, amount=amount)
+        self._commit_events()
+        return len(grants)
+    
+    def bulk_set_unlimited(self, grants: List[Tuple[str, int]]) -> int:
+        """Set unlimited access for many devices as a single all-or-nothing operation.
+        
+        Args:
+            grants: (device_id, months) pairs, months 0 = permanent
+        
+        Returns:
+            Number of grants applied
+        """
+        self._validate_grants(grants, "months", minimum=0)
+        
+        now = datetime.now()
+        get_device_data = self._get_device_data
+        record = self._record
+        with self._write_lock:
+            for device_id, months in grants:
+                data = get_device_data(device_id)
+                data["is_unlimited"] = True
+                data["unlimited_until"] = now + timedelta(days=30 * months) if months > 0 else None
+                record("unlimited", device_id, until=self._isoformat(data["unlimited_until"]))
+        self._commit_events()
+        return len(grants)
+    
+    @staticmethod
+    def _validate_grants(grants: List[Tuple[str, int]], field: str, minimum: int) -> None:
+        """Validate bulk grants, raising ValueError for the first bad row."""
+        for index, (device_id, value) in enumerate(grants):
+            if not device_id:
+                raise ValueError(f"Row {index}: missing device_id")
+            if value < minimum:
+                raise ValueError(f"Row {index}: {field} must be at least {minimum}")
+    
     def reset_device(self, device_id: str) -> None:
         """Reset device data (for testing)."""
-        if device_id in self._tokens:
-            del self._tokens[device_id]
+        with self._write_lock:
+            if device_id in self._tokens:
+                del self._tokens[device_id]
+                self._record("reset", device_id)
+    
+    def recover(self, use_snapshot: bool = True) -> int:
+        """Rebuild in-memory balances from the event log.
+        
+        Args:
+            use_snapshot: Start from the latest snapshot and replay only the
+                log tail; when False, replay the full retained history
+        
+        Returns:
+            Number of events replayed
+        """
+        self._tokens = {}
+        after_seq = 0
+        if use_snapshot:
+            after_seq, state = self._event_log.load_snapshot()
+            for device_id, data in (state or {}).items():
+                data["unlimited_until"] = self._parse_datetime(data["unlimited_until"])
+                self._tokens[device_id] = data
+        
+        replayed = 0
+        for event in self._event_log.read_events(after_seq=after_seq):
+            self._apply_event(event)
+            replayed += 1
+        return replayed
+    
+    def flush_events(self) -> None:
+        """Commit buffered events to the log and snapshot when due.
+        
+        Called periodically off the event loop; the snapshot copies the
+        state under the write lock but serializes it outside.
+        """
+        event_log = self._event_log
+        if event_log is None:
+            return
+        event_log.flush()
+        if event_log.needs_snapshot():
+            with self._write_lock:
+                seq = event_log.seq
+                state = {
+                    device_id: dict(data, unlimited_until=self._isoformat(data["unlimited_until"]))
+                    for device_id, data in self._tokens.items()
+                }
+            event_log.snapshot(state, seq)
+    
+    def close(self) -> None:
+        """Flush and close the event log, if one is configured."""
+        if self._event_log is not None:
+            self._event_log.close()
+    
+    def _record(self, op: str, device_id: str, **fields) -> None:
+        """Append a mutation to the event log (called under the write lock)."""
+        if self._event_log is not None:
+            self._event_log.append(op, device_id, **fields)
+    
+    def _commit_events(self) -> None:
+        """Make credits durable before returning.
+        
+        A webhook is acknowledged and its idempotency key kept once the
+        credit returns, so credits cannot wait for the next group commit.
+        Token use keeps the group commit.
+        """
+        if self._event_log is not None:
+            self._event_log.flush()
+    
+    def _apply_event(self, event: dict) -> None:
+        """Apply a logged mutation to in-memory state (used by recovery)."""
+        op = event["op"]
+        device_id = event["device_id"]
+        if op == "reset":
+            self._tokens.pop(device_id, None)
+            return
+        
+        data = self._get_device_data(device_id)
+        if op == "use":
+            if event["kind"] == "free":
+                data["free_trial_used"] += 1
+            elif event["kind"] == "paid":
+                data["used_tokens"] += 1
+        elif op == "add":
+            data["total_tokens"] += event["amount"]
+        elif op == "unlimited":
+            data["is_unlimited"] = True
+            data["unlimited_until"] = self._parse_datetime(event["until"])
+    
+    @staticmethod
+    def _isoformat(value: Optional[datetime]) -> Optional[str]:
+        return value.isoformat() if value else None
+    
+    @staticmethod
+    def _parse_datetime(value: Optional[str]) -> Optional[datetime]:
+        return datetime.fromisoformat(value) if value else None
 
 
+T = TypeVar("T")
+
 # Singleton instance
 _token_service: TokenService | None = None
 
@@ -148,5 +330,38 @@ def get_token_service() -> TokenService:
     """Get token service singleton."""
     global _token_service
     if _token_service is None:
-        _token_service = TokenService()
+        settings = get_settings()
+        if settings.token_backend == "shared":
+            from app.services.shared_token_service import SharedTokenService
+            _token_service = SharedTokenService(settings.token_store_path)
+            return _token_service
+        
+        event_log = None
+        if settings.token_event_log_dir:
+            event_log = TokenEventLog(
+                settings.token_event_log_dir,
+                group_commit_size=settings.token_event_log_group_commit,
+                snapshot_every=settings.token_event_log_snapshot_every,
+                fsync=settings.token_event_log_fsync,
+            )
+        _token_service = TokenService(event_log=event_log)
     return _token_service
+
+
+async def run_token_write(func: Callable[..., T], *args) -> T:
+    """Run a token service write without blocking the event loop.
+    
+    Backends whose writes can wait on another process run it in a thread;
+    the in-memory backend runs it inline.
+    """
+    if get_token_service().offload_writes:
+        return await asyncio.to_thread(func, *args)
+    return func(*args)
+
+
+def close_token_service() -> None:
+    """Close the token service and forget it, so the next use reopens it."""
+    global _token_service
+    if _token_service is not None:
+        _token_service.close()
+        _token_service = None
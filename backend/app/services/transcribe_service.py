@@ -1,5 +1,4 @@
 """Whisper transcription service."""
-from openai import AsyncOpenAI
 from typing import Optional
 import io
 
@@ -10,6 +9,9 @@ class TranscribeService:
     """Service for transcribing audio using OpenAI Whisper."""
     
     def __init__(self):
+        # Imported on first use: the openai package adds ~400 ms to startup
+        from openai import AsyncOpenAI
+        
         settings = get_settings()
         # Support custom base_url (e.g., for LLM Proxy)
         client_kwargs = {"api_key": settings.openai_api_key}
@@ -23,7 +25,7 @@ class TranscribeService:
         Args:
             audio_data: Raw audio bytes
             filename: Filename with extension (used to determine format)
-            
+        
         Returns:
             dict with text, language, and duration
         """
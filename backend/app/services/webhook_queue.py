@@ -0,0 +1,191 @@
+"""Durable local queue for asynchronous webhook processing."""
+from typing import Callable, List, Optional, Tuple
+from contextlib import suppress
+import asyncio
+import json
+import threading
+import time
+
+from app.config import get_settings
+from app.core.sqlite import connect
+from app.core.metrics import observe_webhook_queue_lag, set_webhook_queue_depth
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS webhook_queue (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    payload BLOB NOT NULL,
+    enqueued_at REAL NOT NULL,
+    claimed_until REAL,
+    attempts INTEGER NOT NULL DEFAULT 0
+)
+"""
+
+
+class WebhookQueue:
+    """SQLite-backed queue of verified webhook bodies.
+    
+    Consumers claim batches under a lease; events whose lease expires (for
+    example because a worker died mid-batch) become visible again. Events
+    that fail ``max_attempts`` times stay in the table for inspection.
+    
+    Every write is fsynced (``synchronous=FULL``), so callers on the event
+    loop run these methods in a thread; the connection is shared by
+    request threads and the consumer thread under a lock.
+    """
+    
+    def __init__(self, path: str, lease_seconds: float = 30.0, max_attempts: int = 5):
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._conn = connect(path)
+        # Acknowledged deliveries must survive power loss, not just a crash
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._conn.execute(_SCHEMA)
+        self._lock = threading.Lock()
+    
+    def enqueue(self, body: bytes) -> int:
+        """Persist a raw webhook body and return its queue id."""
+        with self._lock:
+            return self._conn.execute(
+                "INSERT INTO webhook_queue (payload, enqueued_at) VALUES (?, ?)",
+                (body, time.time()),
+            ).lastrowid
+    
+    def claim_batch(self, limit: int) -> List[Tuple[int, bytes, float]]:
+        """Lease up to ``limit`` pending events as (id, body, enqueued_at)."""
+        now = time.time()
+        with self._lock:
+            rows = self._conn.execute(
+                "UPDATE webhook_queue SET claimed_until = ?, attempts = attempts + 1 "
+                "WHERE id IN ("
+                "  SELECT id FROM webhook_queue"
+                "  WHERE (claimed_until IS NULL OR claimed_until < ?) AND attempts < ?"
+                "  ORDER BY id LIMIT ?"
+                ") RETURNING id, payload, enqueued_at",
+                (now + self.lease_seconds, now, self.max_attempts, limit),
+            ).fetchall()
+        return sorted(rows)
+    
+    def ack(self, ids: List[int]) -> None:
+        """Remove processed events."""
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM webhook_queue WHERE id IN (SELECT value FROM json_each(?))",
+                (json.dumps(ids),),
+            )
+    
+    def release(self, ids: List[int], delay: float = 0.0) -> None:
+        """Make events claimable again after ``delay`` seconds."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE webhook_queue SET claimed_until = ? "
+                "WHERE id IN (SELECT value FROM json_each(?))",
+                (time.time() + delay, json.dumps(ids)),
+            )
+    
+    def depth(self) -> int:
+        """Number of events still waiting to be applied."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM webhook_queue WHERE attempts < ?",
+                (self.max_attempts,),
+            ).fetchone()[0]
+    
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class WebhookConsumer:
+    """Background task that applies queued webhooks in batches.
+    
+    ``handler`` receives a list of parsed payloads. If a batch fails, its
+    events are retried one by one so a single bad event cannot hold back
+    the rest; failing events are released with a delay and retried until
+    the queue's attempt limit. Batches run in a worker thread, so the
+    handler must be safe to call off the event loop.
+    """
+    
+    def __init__(
+        self,
+        queue: WebhookQueue,
+        handler: Callable[[List[dict]], object],
+        batch_size: int = 100,
+        poll_interval: float = 0.2,
+        retry_delay: float = 5.0,
+    ):
+        self.queue = queue
+        self.handler = handler
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.retry_delay = retry_delay
+        self._task: Optional[asyncio.Task] = None
+        self._batch: Optional[asyncio.Future] = None
+    
+    def process_batch(self) -> int:
+        """Claim and apply one batch; returns the number of events claimed."""
+        rows = self.queue.claim_batch(self.batch_size)
+        if not rows:
+            set_webhook_queue_depth(self.queue.depth())
+            return 0
+        
+        payloads = [json.loads(body) for _, body, _ in rows]
+        try:
+            self.handler(payloads)
+            done = rows
+        except Exception:
+            done = []
+            for row, payload in zip(rows, payloads):
+                try:
+                    self.handler([payload])
+                    done.append(row)
+                except Exception:
+                    self.queue.release([row[0]], delay=self.retry_delay)
+        
+        self.queue.ack([event_id for event_id, _, _ in done])
+        now = time.time()
+        for _, _, enqueued_at in done:
+            observe_webhook_queue_lag(now - enqueued_at)
+        set_webhook_queue_depth(self.queue.depth())
+        return len(rows)
+    
+    async def run(self) -> None:
+        """Consume until cancelled, polling when the queue is empty."""
+        while True:
+            # Shielded so stop() can wait for the thread to finish the batch
+            self._batch = asyncio.ensure_future(asyncio.to_thread(self.process_batch))
+            if not await asyncio.shield(self._batch):
+                await asyncio.sleep(self.poll_interval)
+            else:
+                # Yield to request handlers between batches
+                await asyncio.sleep(0)
+    
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+    
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+        if self._batch is not None:
+            # Its failure is retried from the queue on the next start
+            with suppress(Exception):
+                await self._batch
+            self._batch = None
+
+
+_webhook_queue: Optional[WebhookQueue] = None
+
+
+def get_webhook_queue() -> Optional[WebhookQueue]:
+    """Get the webhook queue, or None when asynchronous mode is disabled."""
+    global _webhook_queue
+    settings = get_settings()
+    if not settings.webhook_async:
+        return None
+    if _webhook_queue is None:
+        _webhook_queue = WebhookQueue(settings.webhook_queue_path)
+    return _webhook_queue
@@ -0,0 +1 @@
+# Benchmarks (run from backend/ with `python -m benchmarks.<name>`)
@@ -0,0 +1,71 @@
+"""Throughput benchmark for bulk admin token operations.
+
+Usage (from backend/):
+    python -m benchmarks.bench_admin_bulk --devices 100000
+"""
+import argparse
+import time
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.api.admin_router import ADMIN_KEY
+import app.services.token_service as ts
+
+
+def _timed(label: str, count: int, func):
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<32} {elapsed * 1000:10.1f} ms {count / elapsed:12.0f} devices/s")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--devices", type=int, default=100_000)
+    args = parser.parse_args()
+    
+    device_ids = [f"bench_device_{i:08d}" for i in range(args.devices)]
+    headers = {"x-admin-key": ADMIN_KEY}
+    client = TestClient(app)
+    
+    print(f"Bulk admin benchmark: {args.devices} devices")
+    
+    # Service level
+    ts._token_service = None
+    service = ts.get_token_service()
+    _timed("service bulk_add_tokens", args.devices,
+           lambda: service.bulk_add_tokens([(d, 10) for d in device_ids]))
+    _timed("service bulk_set_unlimited", args.devices,
+           lambda: service.bulk_set_unlimited([(d, 1) for d in device_ids]))
+    _timed("service get_token_statuses", args.devices,
+           lambda: service.get_token_statuses(device_ids))
+    
+    # HTTP level
+    ts._token_service = None
+    _timed("POST /admin/bulk/add-tokens", args.devices,
+           lambda: client.post("/api/admin/bulk/add-tokens",
+                               json={"device_ids": device_ids, "amount": 10}, headers=headers))
+    csv_data = "\n".join(f"{d},5" for d in device_ids)
+    _timed("POST /admin/bulk/upload (csv)", args.devices,
+           lambda: client.post("/api/admin/bulk/upload",
+                               files={"file": ("grants.csv", csv_data, "text/csv")}, headers=headers))
+    response = _timed("POST /admin/tokens/batch", args.devices,
+                      lambda: client.post("/api/admin/tokens/batch",
+                                          json={"device_ids": device_ids}, headers=headers))
+    assert response.status_code == 200
+    assert len(response.json()["statuses"]) == args.devices
+    
+    # Baseline: one HTTP call per device (sampled and extrapolated)
+    sample = device_ids[:1000]
+    start = time.perf_counter()
+    for device_id in sample:
+        client.post(f"/api/admin/add-tokens/{device_id}?amount=10", headers=headers)
+    per_call = (time.perf_counter() - start) / len(sample)
+    print(f"{'per-device add-tokens (est.)':<32} {per_call * args.devices * 1000:10.1f} ms "
+          f"{1 / per_call:12.0f} devices/s")
+
+
+if __name__ == "__main__":
+    main()
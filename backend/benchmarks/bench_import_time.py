@@ -0,0 +1,69 @@
+"""Cold-start benchmark: time to import the app in a fresh interpreter.
+
+Each run starts a new Python process, imports ``app.main`` and reports
+how long that took, which heavy third-party packages ended up loaded,
+and the slowest imports by cumulative time (from ``-X importtime``).
+
+Usage (from backend/):
+    python -m benchmarks.bench_import_time --runs 10
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+HEAVY_MODULES = ("newspaper", "readability", "openai", "notion_client", "lxml", "nltk")
+
+_PROBE = f"""
+import json, sys, time
+start = time.perf_counter()
+import app.main
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "loaded": [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))
+"""
+
+
+def _run_once() -> dict:
+    output = subprocess.run(
+        [sys.executable, "-c", _PROBE], capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def _slowest_imports(count: int) -> list:
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        capture_output=True, text=True, check=True,
+    ).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        name = name.strip()
+        # Packages only; their cumulative time includes their submodules
+        if "." not in name and not name.startswith("_"):
+            rows.append((int(cumulative) / 1e6, name))
+    return sorted(rows, reverse=True)[:count]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+    
+    runs = [_run_once() for _ in range(args.runs)]
+    seconds = [run["seconds"] for run in runs]
+    print(f"import app.main over {args.runs} fresh processes")
+    print(f"  min {min(seconds) * 1000:8.1f} ms  median {statistics.median(seconds) * 1000:8.1f} ms"
+          f"  max {max(seconds) * 1000:8.1f} ms")
+    print(f"  heavy packages loaded: {', '.join(runs[-1]['loaded']) or 'none'}")
+    print("slowest packages (cumulative, may include each other):")
+    for cumulative, name in _slowest_imports(args.top):
+        print(f"  {cumulative * 1000:8.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Benchmark for rendering Notion blocks for a large sync.
+
+Compares building every block literal-by-literal (the previous approach)
+with the shared-template renderer, both as dicts and as encoded JSON.
+
+Usage (from backend/):
+    python -m benchmarks.bench_notion_blocks --margins 1000
+"""
+import argparse
+import json
+import time
+
+from app.schemas.article import MarginNote
+from app.services.notion_blocks import encode_json, encode_margin, margin_blocks
+
+
+def _literal_blocks(margin: MarginNote) -> list:
+    """Blocks as built before notion_blocks existed."""
+    return [
+        {
+            "object": "block",
+            "type": "divider",
+            "divider": {}
+        },
+        {
+            "object": "block",
+            "type": "quote",
+            "quote": {
+                "rich_text": [{"type": "text", "text": {"content": margin.highlight_text}}]
+            }
+        },
+        {
+            "object": "block",
+            "type": "paragraph",
+            "paragraph": {
+                "rich_text": [
+                    {"type": "text", "text": {"content": "💬 "}, "annotations": {"bold": True}},
+                    {"type": "text", "text": {"content": margin.voice_note}},
+                ]
+            }
+        },
+    ]
+
+
+def _timed(label: str, rounds: int, margins: int, func) -> float:
+    func()  # warm up
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func()
+    per_sync = (time.perf_counter() - start) / rounds
+    print(f"{label:<36} {per_sync * 1000:8.3f} ms/sync {margins / per_sync:12.0f} margins/s")
+    return per_sync
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--margins", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+    
+    margins = [
+        MarginNote(
+            highlight_text=f"Highlighted passage number {i} with some typical length text.",
+            voice_note=f"Spoken note {i}: this is what I thought about the passage.",
+        )
+        for i in range(args.margins)
+    ]
+    
+    print(f"Notion block rendering: {args.margins} margins x {args.rounds} rounds")
+    
+    def literal():
+        return [block for margin in margins for block in _literal_blocks(margin)]
+    
+    def templated():
+        return [block for margin in margins for block in margin_blocks(margin)]
+    
+    def literal_json():
+        return json.dumps(literal(), ensure_ascii=False, separators=(",", ":")).encode()
+    
+    def templated_json():
+        return encode_json(templated())
+    
+    def precompiled_json():
+        return b"[" + b",".join(encode_margin(margin)[1:-1] for margin in margins) + b"]"
+    
+    assert json.loads(literal_json()) == json.loads(precompiled_json())
+    
+    baseline = _timed("literal dicts", args.rounds, args.margins, literal)
+    current = _timed("shared-template dicts", args.rounds, args.margins, templated)
+    print(f"{'':<36} {baseline / current:8.2f}x")
+    baseline = _timed("literal dicts + json.dumps", args.rounds, args.margins, literal_json)
+    _timed("shared-template dicts + encode_json", args.rounds, args.margins, templated_json)
+    current = _timed("precompiled JSON template", args.rounds, args.margins, precompiled_json)
+    print(f"{'':<36} {baseline / current:8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Query latency benchmark for margin full-text search.
+
+Spreads synthetic notes over many devices with a skewed distribution,
+as in real use, and reports p50/p95/p99 latency per query type for
+three devices: the one with the most notes, one with a single note,
+and one with none. Queries are scoped to a device, so the sparse and
+absent devices show whether cost follows the device's own notes or the
+whole table.
+
+Usage (from backend/):
+    python -m benchmarks.bench_search --notes 1000000 --devices 1000
+    python -m benchmarks.bench_search --backend sqlite --path /tmp/search.db
+"""
+import argparse
+import os
+import random
+import resource
+import statistics
+import time
+from collections import defaultdict
+
+from app.schemas.article import MarginNote
+from app.services.search_index import SearchIndex, SqliteSearchIndex
+
+
+
+def _device(number: int) -> str:
+    return f"bench_device_{number:06d}"
+
+
+def _vocabulary(size: int, rng: random.Random) -> list:
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    return ["".join(rng.choice(letters) for _ in range(rng.randint(3, 10))) for _ in range(size)]
+
+
+def _sentence(words: list, rng: random.Random, length: int) -> str:
+    # Zipf-like word frequencies, as in natural text
+    return " ".join(words[min(int(rng.paretovariate(1.1)) - 1, len(words) - 1)] for _ in range(length))
+
+
+def _percentiles(samples: list) -> str:
+    cuts = statistics.quantiles(samples, n=100)
+    return f"p50 {cuts[49] * 1000:8.3f} ms  p95 {cuts[94] * 1000:8.3f} ms  p99 {cuts[98] * 1000:8.3f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--notes", type=int, default=1_000_000)
+    parser.add_argument("--devices", type=int, default=1000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--backend", choices=["memory", "sqlite"], default="memory")
+    parser.add_argument("--path", default="/tmp/voicemargin-bench-search.db")
+    args = parser.parse_args()
+    
+    rng = random.Random(42)
+    words = _vocabulary(50_000, rng)
+    if args.backend == "sqlite" and os.path.exists(args.path):
+        os.remove(args.path)
+    index = SearchIndex() if args.backend == "memory" else SqliteSearchIndex(args.path)
+    
+    print(f"Search benchmark: {args.notes} notes over {args.devices} devices, backend={args.backend}")
+    start = time.perf_counter()
+    # Device 0 gets the most notes; the last device gets exactly one
+    batches = defaultdict(list)
+    counts = defaultdict(int)
+    sparse = args.devices - 1
+    for i in range(args.notes - 1):
+        device = min(int(rng.paretovariate(1.0)) - 1, args.devices - 2)
+        margin = MarginNote(highlight_text=_sentence(words, rng, 12), voice_note=_sentence(words, rng, 8))
+        batch = batches[device]
+        batch.append((str(i), margin))
+        counts[device] += 1
+        if len(batch) == 1000:
+            index.index(_device(device), f"https://example.com/{i // 100}", batch)
+            batches[device] = []
+    batches[sparse].append(("last", MarginNote(highlight_text=words[5], voice_note=words[1500])))
+    counts[sparse] += 1
+    for device, batch in batches.items():
+        if batch:
+            index.index(_device(device), "https://example.com/last", batch)
+    elapsed = time.perf_counter() - start
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{'index build':<16} {elapsed:8.1f} s  {args.notes / elapsed:10.0f} notes/s  peak RSS {peak_mb:.0f} MB")
+    
+    rare = words[1000:]
+    common = words[:20]
+    queries = {
+        "rare term": lambda: rng.choice(rare),
+        "common term": lambda: rng.choice(common),
+        "two terms": lambda: f"{rng.choice(common)} {rng.choice(words[20:200])}",
+        "prefix": lambda: rng.choice(rare)[:3] + "*",
+        "phrase": lambda: f'"{rng.choice(common)} {rng.choice(common)}"',
+    }
+    targets = {
+        f"dense ({counts[0]} notes)": _device(0),
+        "sparse (1 note)": _device(sparse),
+        "absent (0 notes)": _device(args.devices),
+    }
+    for target, device_id in targets.items():
+        print(target)
+        for label, make_query in queries.items():
+            samples = []
+            for _ in range(args.queries):
+                query = make_query()
+                start = time.perf_counter()
+                index.search(device_id, query, limit=20)
+                samples.append(time.perf_counter() - start)
+            print(f"  {label:<14} {_percentiles(samples)}")
+
+
+if __name__ == "__main__":
+    main()
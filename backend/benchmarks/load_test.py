@@ -0,0 +1,283 @@
+"""Load test for the VoiceMargin API against local upstream stubs.
+
+Starts the stub server (see benchmarks/stubs.py), then for each scenario
+boots a fresh ``uvicorn app.main:app`` process pointed at the stubs,
+drives it with ``--concurrency`` clients for ``--duration`` seconds and
+reports requests/s, p50/p95/p99 latency, error count and the server's
+peak RSS. Results are written to benchmarks/results/ as JSON; pass an
+earlier file with ``--compare`` to fail on regressions.
+
+The load generator is a single Python process, so at very high request
+rates it can become the bottleneck; compare runs made on the same machine.
+
+Usage (from backend/):
+    python -m benchmarks.load_test
+    python -m benchmarks.load_test --scenarios extract sync-notion --latency notion=0.35
+    python -m benchmarks.load_test --compare benchmarks/results/load_baseline.json
+"""
+from typing import Callable, Dict, Optional, Tuple
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+from benchmarks.results import compare, load_results, save_results
+from benchmarks.stubs import parse_service_values
+
+AUDIO = bytes(range(256)) * 64  # 16 KiB stand-in for a short voice note
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_until_up(url: str, process: subprocess.Popen, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Process exited with code {process.returncode} before {url} was up")
+        try:
+            httpx.get(url, timeout=1.0)
+            return
+        except httpx.TransportError:
+            time.sleep(0.1)
+    raise RuntimeError(f"{url} did not come up within {timeout:.0f}s")
+
+
+def _peak_rss_mb(pid: int) -> Optional[float]:
+    """High-water RSS of a process in MB (Linux only)."""
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def _stop(process: subprocess.Popen) -> None:
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+# Each scenario turns a request number into (method, path, httpx kwargs)
+Scenario = Callable[[int, str], Tuple[str, str, dict]]
+
+
+def _device(n: int) -> str:
+    return f"load_device_{n:010d}"
+
+
+def _extract(i: int, stub: str):
+    return "POST", "/api/extract", {"json": {"url": f"{stub}/articles/{i % 500}"}}
+
+
+def _transcribe(i: int, stub: str):
+    # A new device per request, so the free trial never runs out
+    return "POST", "/api/transcribe", {
+        "files": {"audio": ("note.webm", AUDIO, "audio/webm")},
+        "data": {"device_id": _device(i)},
+    }
+
+
+def _tokens(i: int, stub: str):
+    return "GET", f"/api/tokens/{_device(i % 1000)}", {}
+
+
+def _sync_notion(i: int, stub: str):
+    # 200 device/article pairs; each round changes one note, so later
+    # syncs are incremental updates of an existing page
+    pair, round_ = i % 200, i // 200
+    margins = [
+        {"highlight_text": f"Passage {n} of article {pair}", "voice_note": f"Note {n}, round {round_ if n == 0 else 0}"}
+        for n in range(5)
+    ]
+    return "POST", "/api/sync-notion", {"json": {
+        "device_id": _device(pair),
+        "article_title": f"Stub article {pair}",
+        "article_url": f"{stub}/articles/{pair}",
+        "margins": margins,
+    }}
+
+
+def _webhook(i: int, stub: str):
+    return "POST", "/api/webhook", {"json": {
+        "id": f"evt_{i}",
+        "eventType": "checkout.completed",
+        "object": {
+            "id": f"ch_load_{i}",
+            "metadata": {"device_id": _device(i % 1000), "product_type": "pack_10"},
+        },
+    }}
+
+
+def _checkout(i: int, stub: str):
+    # Distinct success URLs so the checkout session cache doesn't absorb the load
+    return "POST", "/api/checkout", {"json": {
+        "device_id": _device(i % 1000),
+        "product_type": "pack_10",
+        "success_url": f"https://example.com/success/{i}",
+    }}
+
+
+SCENARIOS: Dict[str, Scenario] = {
+    "extract": _extract,
+    "transcribe": _transcribe,
+    "tokens": _tokens,
+    "sync-notion": _sync_notion,
+    "webhook": _webhook,
+    "checkout": _checkout,
+}
+
+
+def _app_env(stub: str) -> dict:
+    env = dict(os.environ)
+    env.update({
+        "OPENAI_API_KEY": "sk-stub",
+        "OPENAI_BASE_URL": f"{stub}/openai/v1",
+        "NOTION_API_KEY": "ntn_stub",
+        "NOTION_DATABASE_ID": "stub-database",
+        "NOTION_BASE_URL": f"{stub}/notion",
+        "CREEM_API_KEY": "creem_test_stub",
+        "CREEM_API_BASE": f"{stub}/creem/v1",
+        "CREEM_PRODUCT_IDS": json.dumps({"pack_3": "prod_3", "pack_10": "prod_10", "pack_50": "prod_50"}),
+        "CREEM_WEBHOOK_SECRET": "",
+        # All load comes from one address, which would be rate limited
+        "RATE_LIMIT_ENABLED": "false",
+    })
+    return env
+
+
+async def _drive(base: str, stub: str, scenario: Scenario, concurrency: int, duration: float, warmup: float) -> dict:
+    counter = itertools.count()
+    latencies = []
+    errors = 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    
+    async with httpx.AsyncClient(base_url=base, limits=limits, timeout=60.0) as client:
+        async def worker(deadline: float, record: bool):
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                method, path, kwargs = scenario(next(counter), stub)
+                start = time.perf_counter()
+                try:
+                    response = await client.request(method, path, **kwargs)
+                    failed = response.status_code >= 400
+                except httpx.HTTPError:
+                    failed = True
+                if record:
+                    latencies.append(time.perf_counter() - start)
+                    errors += failed
+        
+        if warmup > 0:
+            deadline = time.perf_counter() + warmup
+            await asyncio.gather(*(worker(deadline, False) for _ in range(concurrency)))
+        start = time.perf_counter()
+        deadline = start + duration
+        await asyncio.gather(*(worker(deadline, True) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    
+    cuts = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else [latencies[0]] * 99
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(cuts[49] * 1000, 2),
+        "p95_ms": round(cuts[94] * 1000, 2),
+        "p99_ms": round(cuts[98] * 1000, 2),
+    }
+
+
+def run_scenario(name: str, stub: str, args) -> dict:
+    port = _free_port()
+    base = f"http://127.0.0.1:{port}"
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1",
+         "--port", str(port), "--log-level", "warning", "--no-access-log"],
+        env=_app_env(stub),
+    )
+    try:
+        _wait_until_up(f"{base}/health", server)
+        result = asyncio.run(_drive(base, stub, SCENARIOS[name], args.concurrency, args.duration, args.warmup))
+        result["peak_rss_mb"] = _peak_rss_mb(server.pid)
+    finally:
+        _stop(server)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="*", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--duration", type=float, default=10.0, help="Measured seconds per scenario")
+    parser.add_argument("--warmup", type=float, default=1.0, help="Unmeasured seconds per scenario")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--latency", nargs="*", metavar="SERVICE=SECONDS",
+                        default=["articles=0.05", "openai=0.3", "notion=0.1", "creem=0.08"])
+    parser.add_argument("--error-rate", nargs="*", metavar="SERVICE=RATE", default=[])
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/load_<time>.json)")
+    parser.add_argument("--compare", help="Earlier results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed relative regression")
+    args = parser.parse_args()
+    
+    latency = parse_service_values(args.latency)
+    error_rate = parse_service_values(args.error_rate)
+    stub_port = _free_port()
+    stub = f"http://127.0.0.1:{stub_port}"
+    stub_server = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.stubs", "--port", str(stub_port),
+         "--latency", *args.latency, "--error-rate", *args.error_rate],
+    )
+    
+    print(f"Load test: {args.concurrency} clients, {args.duration:.0f}s per scenario, "
+          f"stub latency {latency}, error rates {error_rate}")
+    print(f"{'scenario':<12} {'requests':>9} {'errors':>7} {'req/s':>9} "
+          f"{'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'peak MB':>8}")
+    results = {}
+    try:
+        _wait_until_up(f"{stub}/articles/0", stub_server)
+        for name in args.scenarios:
+            result = results[name] = run_scenario(name, stub, args)
+            peak = f"{result['peak_rss_mb']:.0f}" if result["peak_rss_mb"] else "n/a"
+            print(f"{name:<12} {result['requests']:>9} {result['errors']:>7} {result['rps']:>9.1f} "
+                  f"{result['p50_ms']:>9.1f} {result['p95_ms']:>9.1f} {result['p99_ms']:>9.1f} {peak:>8}")
+    finally:
+        _stop(stub_server)
+    
+    config = {
+        "concurrency": args.concurrency,
+        "duration": args.duration,
+        "latency": latency,
+        "error_rate": error_rate,
+    }
+    print(f"Results written to {save_results('load', results, config, args.output)}")
+    
+    if args.compare:
+        regressions = compare(
+            results,
+            load_results(args.compare),
+            {"rps": True, "p95_ms": False, "p99_ms": False, "peak_rss_mb": False},
+            args.threshold,
+        )
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.threshold:.0%} against {args.compare}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+"""Micro-benchmarks for pure-Python hot paths, checked against a baseline.
+
+Each case is timed in calibrated batches with the garbage collector off,
+as ``timeit`` does, and reported as the best time per operation over
+``--repeat`` batches; the best is far less noisy than the mean on a busy
+machine.
+The run fails when any case is more than ``--threshold`` slower than the
+stored baseline, so regressions are caught before they ship.
+
+Baselines are machine specific: regenerate with ``--update-baseline`` on
+the machine that runs the check.
+
+Usage (from backend/):
+    python -m benchmarks.micro
+    python -m benchmarks.micro --filter token_service --threshold 0.5
+    python -m benchmarks.micro --update-baseline
+"""
+from typing import Callable, Dict
+import argparse
+import gc
+import itertools
+import statistics
+import sys
+import time
+
+from benchmarks.results import RESULTS_DIR, compare, load_results, save_results
+from app.schemas.article import ExtractResponse, MarginNote
+from app.services.article_service import html_paragraphs, strip_html
+from app.services.notion_blocks import encode_margin, margin_blocks, source_block
+from app.services.token_service import TokenService
+
+BASELINE = RESULTS_DIR / "micro_baseline.json"
+
+_PARAGRAPH = (
+    "Reading with a pen in hand changes how an argument lands. Each margin "
+    "note is a small act of disagreement or agreement, and over a long essay "
+    "those notes become a second text that runs beside the first. "
+)
+# Roughly what readability's summary() returns for a long article
+ARTICLE_HTML = "<div><article>" + "".join(
+    f'<p class="c{i}">{_PARAGRAPH}<a href="https://example.com/{i}">link</a>\n\n  {_PARAGRAPH}</p>'
+    for i in range(40)
+) + "</article></div>"
+
+
+def _token_service(devices: int = 10_000):
+    service = TokenService()
+    device_ids = [f"bench_device_{i:08d}" for i in range(devices)]
+    for device_id in device_ids:
+        service.add_tokens(device_id, 10 ** 9)
+    return service, itertools.cycle(device_ids)
+
+
+def _get_token_status():
+    service, device_ids = _token_service()
+    return lambda: service.get_token_status(next(device_ids))
+
+
+def _use_token():
+    service, device_ids = _token_service()
+    return lambda: service.use_token(next(device_ids))
+
+
+def _add_tokens():
+    service, device_ids = _token_service()
+    return lambda: service.add_tokens(next(device_ids), 10)
+
+
+def _strip_html():
+    return lambda: strip_html(ARTICLE_HTML)
+
+
+def _html_paragraphs():
+    # What extraction runs on every article
+    return lambda: html_paragraphs(ARTICLE_HTML)
+
+
+def _margins(count: int = 100):
+    return [
+        MarginNote(highlight_text=f"{_PARAGRAPH[:120]} {i}", voice_note=f"Margin note number {i}")
+        for i in range(count)
+    ]
+
+
+def _page_blocks():
+    # The children of a page synced with 100 margins
+    margins = _margins()
+    
+    def build():
+        children = [source_block("https://example.com/article")]
+        for margin in margins:
+            children.extend(margin_blocks(margin))
+        return children
+    return build
+
+
+def _encode_margins():
+    margins = _margins()
+    return lambda: [encode_margin(margin) for margin in margins]
+
+
+def _extract_result() -> dict:
+    content = "\n\n".join(html_paragraphs(ARTICLE_HTML))
+    return {
+        "title": "Reading in the margins",
+        "content": content,
+        "author": "A. Writer",
+        "publish_date": "2026-01-05T00:00:00",
+        "source_url": "https://example.com/article",
+        "word_count": len(content.split()),
+    }
+
+
+def _extract_response_build():
+    result = _extract_result()
+    return lambda: ExtractResponse(**result)
+
+
+def _extract_response_json():
+    response = ExtractResponse(**_extract_result())
+    return response.model_dump_json
+
+
+# Case name -> setup returning the operation to time
+CASES: Dict[str, Callable[[], Callable[[], object]]] = {
+    "token_service.get_token_status": _get_token_status,
+    "token_service.use_token": _use_token,
+    "token_service.add_tokens": _add_tokens,
+    "article.strip_html": _strip_html,
+    "article.html_paragraphs": _html_paragraphs,
+    "notion.page_blocks_100": _page_blocks,
+    "notion.encode_margin_100": _encode_margins,
+    "extract_response.build": _extract_response_build,
+    "extract_response.model_dump_json": _extract_response_json,
+}
+
+
+def measure(func: Callable[[], object], repeat: int = 9, min_batch_time: float = 0.1) -> dict:
+    """Best seconds per call over ``repeat`` calibrated batches."""
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        loops = 1
+        while True:
+            start = time.perf_counter()
+            for _ in range(loops):
+                func()
+            if time.perf_counter() - start >= min_batch_time:
+                break
+            loops *= 2
+        
+        per_call = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for _ in range(loops):
+                func()
+            per_call.append((time.perf_counter() - start) / loops)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    
+    best = min(per_call)
+    return {
+        "ns_per_op": round(best * 1e9, 1),
+        "ops_per_s": round(1 / best, 1),
+        "spread": round((statistics.median(per_call) - best) / best, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filter", default="", help="Only run cases containing this text")
+    parser.add_argument("--repeat", type=int, default=9)
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed relative slowdown")
+    parser.add_argument("--baseline", default=str(BASELINE))
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args()
+    
+    results = {}
+    print(f"{'case':<36} {'ns/op':>12} {'ops/s':>12} {'spread':>7}")
+    for name, setup in CASES.items():
+        if args.filter not in name:
+            continue
+        result = results[name] = measure(setup(), args.repeat)
+        print(f"{name:<36} {result['ns_per_op']:>12,.1f} {result['ops_per_s']:>12,.0f} {result['spread']:>7.1%}")
+    
+    config = {"repeat": args.repeat, "python": sys.version.split()[0]}
+    if args.update_baseline:
+        print(f"Baseline written to {save_results('micro', results, config, args.baseline)}")
+        return
+    save_results("micro", results, config)
+    
+    try:
+        baseline = load_results(args.baseline)
+    except FileNotFoundError:
+        print(f"No baseline at {args.baseline}; run with --update-baseline to create one")
+        return
+    regressions = compare(results, baseline, {"ns_per_op": False}, args.threshold)
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    if regressions:
+        sys.exit(1)
+    print(f"No regressions beyond {args.threshold:.0%} against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Saving benchmark results and comparing them against a baseline."""
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+import json
+import subprocess
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def save_results(name: str, results: Dict[str, dict], config: dict, path: Optional[str] = None) -> Path:
+    """Write results as JSON, by default to ``results/<name>_<timestamp>.json``."""
+    now = datetime.now(timezone.utc)
+    if path is None:
+        RESULTS_DIR.mkdir(exist_ok=True)
+        target = RESULTS_DIR / f"{name}_{now:%Y%m%dT%H%M%SZ}.json"
+    else:
+        target = Path(path)
+    target.write_text(json.dumps({
+        "benchmark": name,
+        "created": now.isoformat(),
+        "commit": _git_commit(),
+        "config": config,
+        "results": results,
+    }, indent=2) + "\n")
+    return target
+
+
+def load_results(path: str) -> Dict[str, dict]:
+    return json.loads(Path(path).read_text())["results"]
+
+
+def compare(
+    current: Dict[str, dict],
+    baseline: Dict[str, dict],
+    metrics: Dict[str, bool],
+    threshold: float,
+) -> List[str]:
+    """Describe every metric that regressed by more than ``threshold``.
+    
+    Args:
+        current: Results by case name
+        baseline: Baseline results by case name
+        metrics: Metric name -> True if higher is better
+        threshold: Allowed relative regression, e.g. 0.2 for 20%
+    
+    Returns:
+        One line per regression (empty when within threshold)
+    """
+    regressions = []
+    for case, values in current.items():
+        base = baseline.get(case)
+        if not base:
+            continue
+        for metric, higher_is_better in metrics.items():
+            now, before = values.get(metric), base.get(metric)
+            if not now or not before:
+                continue
+            change = (before - now) / before if higher_is_better else (now - before) / before
+            if change > threshold:
+                regressions.append(
+                    f"{case} {metric}: {before:.4g} -> {now:.4g} ({change:+.0%} worse)"
+                )
+    return regressions
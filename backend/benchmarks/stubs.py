@@ -0,0 +1,142 @@
+"""Local stand-ins for the upstream services VoiceMargin calls.
+
+One Starlette app serves all of them under separate prefixes:
+
+    /articles/{n}         article pages (HTML)
+    /openai/v1/...        Whisper transcriptions
+    /notion/v1/...        Notion pages and blocks
+    /creem/v1/...         Creem checkouts
+
+Each service can be given a latency and an error rate, so load tests can
+measure how the API behaves when an upstream is slow or failing.
+
+Usage (from backend/):
+    python -m benchmarks.stubs --port 8900 --latency notion=0.3 --error-rate creem=0.05
+"""
+from typing import Dict
+import argparse
+import asyncio
+import itertools
+import random
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import HTMLResponse, JSONResponse, Response
+from starlette.routing import Route
+
+SERVICES = ("articles", "openai", "notion", "creem")
+
+_PARAGRAPH = (
+    "Reading with a pen in hand changes how an argument lands. Each margin "
+    "note is a small act of disagreement or agreement, and over a long essay "
+    "those notes become a second text that runs beside the first. "
+)
+
+_ids = itertools.count(1)
+
+
+def _article(request: Request) -> Response:
+    n = request.path_params["n"]
+    body = "".join(f"<p>{_PARAGRAPH * 3}</p>\n" for _ in range(20))
+    return HTMLResponse(
+        f"<html><head><title>Stub article {n}</title></head><body>"
+        f"<article><h1>Stub article {n}</h1>\n{body}</article></body></html>"
+    )
+
+
+def _transcription(request: Request) -> Response:
+    return JSONResponse({
+        "text": "This paragraph restates the thesis with a new example.",
+        "language": "english",
+        "duration": 4.2,
+        "task": "transcribe",
+    })
+
+
+async def _create_page(request: Request) -> Response:
+    page_id = f"page-{next(_ids)}"
+    return JSONResponse({
+        "object": "page",
+        "id": page_id,
+        "url": f"https://www.notion.so/{page_id}",
+    })
+
+
+async def _append_children(request: Request) -> Response:
+    children = (await request.json()).get("children", [])
+    return JSONResponse({
+        "object": "list",
+        "results": [{"object": "block", "id": f"block-{next(_ids)}"} for _ in children],
+    })
+
+
+async def _update_block(request: Request) -> Response:
+    return JSONResponse({"object": "block", "id": request.path_params["block_id"]})
+
+
+def _checkout(request: Request) -> Response:
+    session_id = f"ch_{next(_ids)}"
+    return JSONResponse({
+        "id": session_id,
+        "checkout_url": f"https://checkout.example.com/{session_id}",
+    })
+
+
+def create_app(latency: Dict[str, float], error_rate: Dict[str, float], seed: int = 0) -> Starlette:
+    """Stub app with per-service latency (seconds) and error rates (0-1)."""
+    rng = random.Random(seed)
+    
+    def faulty(service: str, handler):
+        delay = latency.get(service, 0.0)
+        failure_rate = error_rate.get(service, 0.0)
+        
+        async def endpoint(request: Request) -> Response:
+            if delay:
+                # +/-25% jitter so requests don't complete in lockstep
+                await asyncio.sleep(delay * rng.uniform(0.75, 1.25))
+            if rng.random() < failure_rate:
+                return JSONResponse(
+                    {"object": "error", "code": "service_unavailable", "message": "Injected failure"},
+                    status_code=503,
+                )
+            response = handler(request)
+            return await response if asyncio.iscoroutine(response) else response
+        return endpoint
+    
+    return Starlette(routes=[
+        Route("/articles/{n}", faulty("articles", _article)),
+        Route("/openai/v1/audio/transcriptions", faulty("openai", _transcription), methods=["POST"]),
+        Route("/notion/v1/pages", faulty("notion", _create_page), methods=["POST"]),
+        Route("/notion/v1/blocks/{block_id}/children", faulty("notion", _append_children), methods=["PATCH"]),
+        Route("/notion/v1/blocks/{block_id}", faulty("notion", _update_block), methods=["PATCH"]),
+        Route("/creem/v1/checkouts", faulty("creem", _checkout), methods=["POST"]),
+    ])
+
+
+def parse_service_values(values) -> Dict[str, float]:
+    """Parse ``service=value`` pairs from the command line."""
+    parsed = {}
+    for item in values or []:
+        service, _, value = item.partition("=")
+        if service not in SERVICES:
+            raise argparse.ArgumentTypeError(f"Unknown service {service!r}, expected one of {SERVICES}")
+        parsed[service] = float(value)
+    return parsed
+
+
+def main():
+    import uvicorn
+    
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", nargs="*", metavar="SERVICE=SECONDS")
+    parser.add_argument("--error-rate", nargs="*", metavar="SERVICE=RATE")
+    args = parser.parse_args()
+    
+    app = create_app(parse_service_values(args.latency), parse_service_values(args.error_rate))
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,10 @@
 """Test configuration and fixtures."""
+import os
+
+# The app is built at import time; keep request counts in one test from
+# throttling the next
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
 import pytest
 from fastapi.testclient import TestClient
 from unittest.mock import AsyncMock, patch
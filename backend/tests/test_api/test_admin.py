@@ -0,0 +1,187 @@
+"""Tests for admin API."""
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.api.admin_router import ADMIN_KEY
+
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+
+@pytest.fixture
+def admin_headers():
+    return {"x-admin-key": ADMIN_KEY}
+
+
+@pytest.fixture(autouse=True)
+def reset_services():
+    """Reset singleton services after each test."""
+    import app.services.token_service as ts
+    ts._token_service = None
+    yield
+    ts._token_service = None
+
+
+class TestBatchTokenStatus:
+    """Tests for POST /api/admin/tokens/batch endpoint."""
+    
+    def test_batch_status_in_request_order(self, client, admin_headers):
+        """Should return one status per device in request order."""
+        device_ids = [f"device_{i}_123456789" for i in range(5)]
+        client.post(f"/api/admin/add-tokens/{device_ids[2]}?amount=7", headers=admin_headers)
+        
+        response = client.post(
+            "/api/admin/tokens/batch",
+            json={"device_ids": device_ids},
+            headers=admin_headers,
+        )
+        
+        assert response.status_code == 200
+        statuses = response.json()["statuses"]
+        assert [s["device_id"] for s in statuses] == device_ids
+        assert statuses[2]["remaining_tokens"] == 17
+    
+    def test_batch_status_requires_admin(self, client):
+        """Should reject requests without the admin key."""
+        response = client.post(
+            "/api/admin/tokens/batch",
+            json={"device_ids": ["device_1_123456789"]},
+        )
+        
+        assert response.status_code == 401
+
+
+class TestBulkOperations:
+    """Tests for bulk admin endpoints."""
+    
+    def test_bulk_add_tokens(self, client, admin_headers):
+        """Should add tokens to every listed device."""
+        device_ids = [f"device_{i}_123456789" for i in range(3)]
+        
+        response = client.post(
+            "/api/admin/bulk/add-tokens",
+            json={"device_ids": device_ids, "amount": 5},
+            headers=admin_headers,
+        )
+        
+        assert response.status_code == 200
+        assert response.json() == {"applied": 3, "devices": 3}
+        for device_id in device_ids:
+            data = client.get(f"/api/tokens/{device_id}").json()
+            assert data["remaining_tokens"] == 15
+    
+    def test_bulk_add_tokens_rejects_non_positive_amount(self, client, admin_headers):
+        """Should reject a zero amount."""
+        response = client.post(
+            "/api/admin/bulk/add-tokens",
+            json={"device_ids": ["device_1_123456789"], "amount": 0},
+            headers=admin_headers,
+        )
+        
+        assert response.status_code == 422
+    
+    def test_bulk_set_unlimited(self, client, admin_headers):
+        """Should set unlimited access for every listed device."""
+        device_ids = [f"device_{i}_123456789" for i in range(3)]
+        
+        response = client.post(
+            "/api/admin/bulk/set-unlimited",
+            json={"device_ids": device_ids, "months": 1},
+            headers=admin_headers,
+        )
+        
+        assert response.status_code == 200
+        for device_id in device_ids:
+            assert client.get(f"/api/tokens/{device_id}").json()["is_unlimited"] == True
+    
+    def test_upload_csv(self, client, admin_headers):
+        """Should apply CSV rows with per-row and default amounts."""
+        csv_data = "device_id,amount\ndevice_1_123456789,3\ndevice_2_123456789\n"
+        
+        response = client.post(
+            "/api/admin/bulk/upload?amount=20",
+            files={"file": ("grants.csv", csv_data, "text/csv")},
+            headers=admin_headers,
+        )
+        
+        assert response.status_code == 200
+        assert response.json()["applied"] == 2
+        assert client.get("/api/tokens/device_1_123456789").json()["remaining_tokens"] == 13
+        assert client.get("/api/tokens/device_2_123456789").json()["remaining_tokens"] == 30
+    
+    def test_upload_ndjson_set_unlimited(self, client, admin_headers):
+        """Should apply NDJSON rows for set-unlimited."""
+        ndjson = '{"device_id": "device_1_123456789", "months": 2}\n{"device_id": "device_2_123456789"}\n'
+        
+        response = client.post(
+            "/api/admin/bulk/upload?operation=set-unlimited",
+            files={"file": ("grants.ndjson", ndjson, "application/x-ndjson")},
+            headers=admin_headers,
+        )
+        
+        assert response.status_code == 200
+        assert client.get("/api/tokens/device_2_123456789").json()["is_unlimited"] == True
+    
+    def test_upload_invalid_row_applies_nothing(self, client, admin_headers):
+        """An invalid row should reject the whole upload."""
+        csv_data = "device_1_123456789,5\ndevice_2_123456789,-1\n"
+        
+        response = client.post(
+            "/api/admin/bulk/upload",
+            files={"file": ("grants.csv", csv_data, "text/csv")},
+            headers=admin_headers,
+        )
+        
+        assert response.status_code == 400
+        assert client.get("/api/tokens/device_1_123456789").json()["remaining_tokens"] == 10
+
+
+class TestProfile:
+    """Tests for GET /api/admin/profile endpoint."""
+    
+    def test_profile_returns_collapsed_stacks(self, client, admin_headers):
+        """Should return one 'stack count' line per sampled stack."""
+        response = client.get(
+            "/api/admin/profile?seconds=0.2&interval_ms=5",
+            headers=admin_headers,
+        )
+        
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        lines = response.text.splitlines()
+        assert lines
+        stack, count = lines[0].rsplit(" ", 1)
+        assert ";" in stack
+        assert int(count) > 0
+    
+    def test_profile_requires_admin(self, client):
+        """Should reject requests without the admin key."""
+        response = client.get("/api/admin/profile?seconds=0.1")
+        
+        assert response.status_code == 401
+    
+    def test_profile_duration_is_bounded(self, client, admin_headers):
+        """Should reject profiles longer than a minute."""
+        response = client.get("/api/admin/profile?seconds=600", headers=admin_headers)
+        
+        assert response.status_code == 422
+
+
+class TestLoopBlocks:
+    """Tests for GET /api/admin/loop-blocks endpoint."""
+    
+    def test_disabled_by_default(self, client, admin_headers):
+        """Should report the watchdog as disabled when not configured."""
+        response = client.get("/api/admin/loop-blocks", headers=admin_headers)
+        
+        assert response.status_code == 200
+        assert response.json() == {"enabled": False, "threshold_seconds": None, "incidents": []}
+    
+    def test_requires_admin(self, client):
+        """Should reject requests without the admin key."""
+        response = client.get("/api/admin/loop-blocks")
+        
+        assert response.status_code == 401
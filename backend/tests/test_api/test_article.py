@@ -0,0 +1,402 @@
+"""Tests for article API."""
+import asyncio
+import pytest
+from fastapi.testclient import TestClient
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from app.main import app
+
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+
+@pytest.fixture
+def test_device_id():
+    return "test_device_12345678"
+
+
+@pytest.fixture(autouse=True)
+def reset_services():
+    """Reset singleton services after each test."""
+    import app.services.notion_sync_queue as nsq
+    import app.services.margin_store as ms
+    import app.services.search_index as si
+    import app.services.article_cache as ac
+    nsq._notion_sync_queue = None
+    ms._margin_store = None
+    si._search_index = None
+    ac._article_cache = None
+    yield
+    nsq._notion_sync_queue = None
+    ms._margin_store = None
+    si._search_index = None
+    ac._article_cache = None
+
+
+def sync_request(device_id: str, voice_note: str = "note") -> dict:
+    return {
+        "device_id": device_id,
+        "article_title": "Title",
+        "article_url": "https://example.com/a",
+        "margins": [{"highlight_text": "quote", "voice_note": voice_note}],
+    }
+
+
+class TestSyncJobs:
+    """Tests for the background Notion sync endpoints."""
+    
+    def test_enqueue_returns_job(self, client, test_device_id):
+        """Queuing a sync should return 202 with a job id."""
+        response = client.post("/api/sync-notion/jobs", json=sync_request(test_device_id))
+        
+        assert response.status_code == 202
+        data = response.json()
+        assert data["status"] == "queued"
+        assert data["result"] is None
+    
+    def test_repeated_syncs_coalesce(self, client, test_device_id):
+        """A second sync of a queued article should reuse its job."""
+        first = client.post("/api/sync-notion/jobs", json=sync_request(test_device_id))
+        second = client.post("/api/sync-notion/jobs", json=sync_request(test_device_id, "edited"))
+        
+        assert first.json()["job_id"] == second.json()["job_id"]
+    
+    def test_url_variants_share_one_job(self, client, test_device_id):
+        """Tracking parameters and trailing slashes should not split a sync."""
+        plain = sync_request(test_device_id)
+        tracked = sync_request(test_device_id)
+        tracked["article_url"] = "https://example.com/a/?utm_source=feed"
+        
+        first = client.post("/api/sync-notion/jobs", json=plain).json()
+        second = client.post("/api/sync-notion/jobs", json=tracked).json()
+        
+        from app.services.notion_sync_queue import get_notion_sync_queue
+        job = get_notion_sync_queue().get(first["job_id"])
+        assert first["job_id"] == second["job_id"]
+        assert job.article_url == "https://example.com/a"
+    
+    def test_poll_finished_job(self, client, test_device_id):
+        """Polling should return the result once a worker ran the job."""
+        job_id = client.post("/api/sync-notion/jobs", json=sync_request(test_device_id)).json()["job_id"]
+        
+        mock_service = MagicMock()
+        mock_service.sync_margins = AsyncMock(return_value={
+            "success": True,
+            "notion_url": "https://notion.so/page",
+            "message": "Synced 1 notes to Notion",
+        })
+        from app.services.notion_sync_queue import get_notion_sync_queue
+        with patch("app.services.notion_sync_queue.get_notion_service", return_value=mock_service):
+            asyncio.run(get_notion_sync_queue().process_next())
+        
+        response = client.get(f"/api/sync-notion/jobs/{job_id}")
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert data["status"] == "succeeded"
+        assert data["result"]["notion_url"] == "https://notion.so/page"
+        assert mock_service.sync_margins.call_args.kwargs["device_id"] == test_device_id
+    
+    def test_job_uses_user_token(self, client, test_device_id):
+        """A user's Notion token should select their own service."""
+        payload = sync_request(test_device_id)
+        payload["notion_token"] = "user_token"
+        client.post("/api/sync-notion/jobs", json=payload)
+        
+        mock_service = MagicMock()
+        mock_service.sync_margins = AsyncMock(return_value={"success": True, "message": ""})
+        from app.services.notion_sync_queue import get_notion_sync_queue
+        with patch(
+            "app.services.notion_sync_queue.get_notion_service", return_value=mock_service
+        ) as get_service:
+            asyncio.run(get_notion_sync_queue().process_next())
+        
+        get_service.assert_called_once_with("user_token", None)
+    
+    def test_unknown_job(self, client):
+        """Unknown job ids should return 404."""
+        response = client.get("/api/sync-notion/jobs/missing")
+        
+        assert response.status_code == 404
+    
+    def test_queue_full(self, client, test_device_id):
+        """A full queue should return 503 with Retry-After."""
+        from app.services.notion_sync_queue import NotionSyncQueue
+        import app.services.notion_sync_queue as nsq
+        nsq._notion_sync_queue = NotionSyncQueue(max_pending=1)
+        
+        client.post("/api/sync-notion/jobs", json=sync_request(test_device_id))
+        response = client.post("/api/sync-notion/jobs", json=sync_request("other_device_1234"))
+        
+        assert response.status_code == 503
+        assert response.headers["retry-after"] == "5"
+    
+    def test_poll_from_another_worker(self, client, test_device_id, tmp_path):
+        """With a shared job store, any worker should answer a poll."""
+        from app.services.notion_sync_queue import NotionSyncQueue
+        import app.services.notion_sync_queue as nsq
+        path = str(tmp_path / "jobs.db")
+        accepting = NotionSyncQueue(path=path)
+        nsq._notion_sync_queue = accepting
+        job_id = client.post("/api/sync-notion/jobs", json=sync_request(test_device_id)).json()["job_id"]
+        
+        mock_service = MagicMock()
+        mock_service.sync_margins = AsyncMock(return_value={"success": True, "message": "done"})
+        with patch("app.services.notion_sync_queue.get_notion_service", return_value=mock_service):
+            asyncio.run(accepting.process_next())
+        nsq._notion_sync_queue = NotionSyncQueue(path=path)
+        response = client.get(f"/api/sync-notion/jobs/{job_id}")
+        
+        assert response.status_code == 200
+        assert response.json()["status"] == "succeeded"
+        assert response.json()["result"]["message"] == "done"
+    
+    def test_empty_margins_rejected(self, client, test_device_id):
+        """Jobs without margins should be rejected like direct syncs."""
+        payload = sync_request(test_device_id)
+        payload["margins"] = []
+        
+        response = client.post("/api/sync-notion/jobs", json=payload)
+        
+        assert response.status_code == 400
+
+
+class TestExport:
+    """Tests for POST /api/export endpoint."""
+    
+    def test_export_markdown(self, client, test_device_id):
+        """Markdown export should stream as an attachment."""
+        payload = sync_request(test_device_id)
+        payload["format"] = "markdown"
+        
+        response = client.post("/api/export", json=payload)
+        
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/markdown")
+        assert 'filename="margins.md"' in response.headers["content-disposition"]
+        assert "> quote" in response.text
+    
+    def test_export_ndjson(self, client, test_device_id):
+        """NDJSON export should return one line per margin plus the header."""
+        payload = sync_request(test_device_id)
+        payload["format"] = "ndjson"
+        
+        response = client.post("/api/export", json=payload)
+        
+        assert response.headers["content-type"] == "application/x-ndjson"
+        assert len(response.text.splitlines()) == 2
+    
+    def test_unknown_format_rejected(self, client, test_device_id):
+        """Unsupported formats should fail validation."""
+        payload = sync_request(test_device_id)
+        payload["format"] = "pdf"
+        
+        response = client.post("/api/export", json=payload)
+        
+        assert response.status_code == 422
+    
+    def test_export_stored_margins(self, client, test_device_id):
+        """Without margins in the request, stored margins are exported."""
+        client.post("/api/margins", json={
+            "device_id": test_device_id,
+            "article_url": "https://example.com/a",
+            "margins": [{"highlight_text": "stored quote", "voice_note": "stored note"}],
+        })
+        payload = sync_request(test_device_id)
+        payload["margins"] = []
+        
+        response = client.post("/api/export", json=payload)
+        
+        assert "> stored quote" in response.text
+
+
+class TestSyncUsesStore:
+    """Tests for syncs reading from the margin store."""
+    
+    def test_sync_merges_stored_margins(self, client, test_device_id):
+        """A sync job should include stored and uploaded margins."""
+        client.post("/api/margins", json={
+            "device_id": test_device_id,
+            "article_url": "https://example.com/a/",
+            "margins": [{"highlight_text": "earlier", "voice_note": "first"}],
+        })
+        client.post("/api/sync-notion/jobs", json=sync_request(test_device_id))
+        
+        from app.services.notion_sync_queue import get_notion_sync_queue
+        job = get_notion_sync_queue()._queue.get_nowait()
+        
+        assert [margin.highlight_text for margin in job.margins] == ["earlier", "quote"]
+    
+    def test_sync_without_margins_uses_store(self, client, test_device_id):
+        """An empty sync should fall back to the stored margins."""
+        client.post("/api/margins", json={
+            "device_id": test_device_id,
+            "article_url": "https://example.com/a",
+            "margins": [{"highlight_text": "stored", "voice_note": "note"}],
+        })
+        payload = sync_request(test_device_id)
+        payload["margins"] = []
+        
+        response = client.post("/api/sync-notion/jobs", json=payload)
+        
+        assert response.status_code == 202
+
+
+class TestStageMetrics:
+    """Tests for per-stage latency and outcome metrics."""
+    
+    def test_extract_records_stages(self, client):
+        """Extraction should record its stages and a success count."""
+        from prometheus_client import REGISTRY
+        
+        def sample(name, **labels):
+            return REGISTRY.get_sample_value(name, {"tool": "voicemargin", **labels}) or 0.0
+        
+        before_upstream = sample(
+            "request_stage_latency_seconds_count", route="extract", stage="upstream"
+        )
+        before_success = sample("article_extract_total", status="success")
+        service = MagicMock()
+        service.extract = AsyncMock(return_value={
+            "title": "Title",
+            "content": "Body",
+            "source_url": "https://example.com/a",
+            "word_count": 1,
+        })
+        
+        with patch("app.api.article_router.get_article_service", return_value=service):
+            response = client.post("/api/extract", json={"url": "https://example.com/a"})
+        
+        assert response.status_code == 200
+        assert sample(
+            "request_stage_latency_seconds_count", route="extract", stage="upstream"
+        ) == before_upstream + 1
+        assert sample("article_extract_total", status="success") == before_success + 1
+
+
+class TestExtractCaching:
+    """Tests for ETags and compression on article extraction."""
+    
+    @pytest.fixture
+    def article_service(self):
+        service = MagicMock()
+        service.extract = AsyncMock(return_value={
+            "title": "Title",
+            "content": "Long article text. " * 500,
+            "source_url": "https://example.com/a",
+            "word_count": 1500,
+        })
+        with patch("app.api.article_router.get_article_service", return_value=service):
+            yield service
+    
+    def test_returning_reader_gets_304(self, client, article_service):
+        """Sending the ETag back should return 304 without a body."""
+        first = client.get("/api/extract", params={"url": "https://example.com/a"})
+        etag = first.headers["etag"]
+        
+        second = client.get(
+            "/api/extract",
+            params={"url": "https://example.com/a"},
+            headers={"If-None-Match": etag},
+        )
+        
+        assert first.status_code == 200
+        assert second.status_code == 304
+        assert second.content == b""
+    
+    def test_post_sets_etag(self, client, article_service):
+        """POST responses should also carry the content ETag."""
+        response = client.post("/api/extract", json={"url": "https://example.com/a"})
+        
+        assert response.status_code == 200
+        assert response.headers["etag"]
+        assert response.json()["title"] == "Title"
+    
+    def test_large_article_is_compressed(self, client, article_service):
+        """Article JSON should be compressed when the client accepts gzip."""
+        response = client.get(
+            "/api/extract",
+            params={"url": "https://example.com/a"},
+            headers={"Accept-Encoding": "gzip"},
+        )
+        
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.json()["word_count"] == 1500
+
+
+
+class TestArticleParagraphs:
+    """Tests for streamed and paged article delivery."""
+    
+    @pytest.fixture
+    def article_service(self):
+        service = MagicMock()
+        service.extract = AsyncMock(return_value={
+            "title": "Title",
+            "content": "\n\n".join(f"Paragraph {i}." for i in range(25)),
+            "source_url": "https://example.com/a",
+            "word_count": 50,
+        })
+        with patch("app.api.article_router.get_article_service", return_value=service):
+            yield service
+    
+    def test_stream_sends_metadata_then_first_page(self, client, article_service):
+        """The first lines should be metadata and the first page of paragraphs."""
+        import json
+        
+        response = client.get(
+            "/api/extract/stream",
+            params={"url": "https://example.com/a", "first_page": 5},
+        )
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        assert lines[0]["type"] == "meta"
+        assert lines[0]["paragraph_count"] == 25
+        assert "content" not in lines[0]
+        assert lines[1] == {
+            "type": "paragraphs",
+            "start": 0,
+            "paragraphs": [f"Paragraph {i}." for i in range(5)],
+        }
+        assert sum(len(line["paragraphs"]) for line in lines[1:]) == 25
+    
+    def test_paragraph_range(self, client, article_service):
+        """Should return the requested range and where the next one starts."""
+        client.get("/api/extract", params={"url": "https://example.com/a"})
+        response = client.get(
+            "/api/extract/paragraphs",
+            params={"url": "https://example.com/a", "start": 20, "limit": 10},
+        )
+        
+        assert response.json() == {
+            "source_url": "https://example.com/a",
+            "start": 20,
+            "paragraphs": [f"Paragraph {i}." for i in range(20, 25)],
+            "total": 25,
+            "next_start": None,
+        }
+    
+    def test_pages_reuse_one_extraction(self, client, article_service):
+        """Paging through an article should extract it only once."""
+        client.get("/api/extract/stream", params={"url": "https://example.com/a"})
+        for start in (0, 10, 20):
+            client.get(
+                "/api/extract/paragraphs",
+                params={"url": "https://example.com/a", "start": start, "limit": 10},
+            )
+        client.get("/api/extract", params={"url": "https://example.com/a/?utm_source=feed"})
+        
+        assert article_service.extract.await_count == 1
+    
+    def test_paging_never_extracts(self, client, article_service):
+        """Paging an article that is not loaded should 404 without extracting."""
+        response = client.get(
+            "/api/extract/paragraphs",
+            params={"url": "https://example.com/cold", "start": 0},
+        )
+        
+        assert response.status_code == 404
+        assert article_service.extract.await_count == 0
@@ -58,3 +58,42 @@ class TestRootEndpoint:
         response = client.get("/")
         data = response.json()
         assert data["status"] == "running"
+
+
+class TestStartup:
+    """Tests for application startup cost."""
+    
+    def test_heavy_libraries_not_imported_eagerly(self):
+        """Importing the app should not load extraction or OpenAI libraries."""
+        import subprocess
+        import sys
+        
+        probe = (
+            "import sys, app.main; "
+            "print(','.join(m for m in ('newspaper', 'readability', 'openai') if m in sys.modules))"
+        )
+        result = subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True, check=True)
+        
+        assert result.stdout.strip() == ""
+    
+    def test_lifespan_prewarms_imports(self):
+        """Startup should load the deferred libraries in the background."""
+        from unittest.mock import patch
+        
+        with patch("app.main._prewarm_imports") as prewarm:
+            with TestClient(app):
+                pass
+        
+        prewarm.assert_called_once()
+    
+    def test_failed_prewarm_is_logged_and_shutdown_completes(self, caplog):
+        """A broken import should be logged without skipping shutdown steps."""
+        from unittest.mock import AsyncMock, patch
+        
+        with patch("app.main._prewarm_imports", side_effect=ImportError("broken lxml")), \
+                patch("app.main.close_notion_client", new_callable=AsyncMock) as close_notion:
+            with TestClient(app):
+                pass
+        
+        close_notion.assert_awaited_once()
+        assert "prewarm-imports failed" in caplog.text
@@ -0,0 +1,141 @@
+"""Tests for margin storage API."""
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+
+@pytest.fixture
+def test_device_id():
+    return "test_device_12345678"
+
+
+@pytest.fixture(autouse=True)
+def reset_services():
+    """Reset singleton services after each test."""
+    import app.services.margin_store as ms
+    import app.services.search_index as si
+    ms._margin_store = None
+    si._search_index = None
+    yield
+    ms._margin_store = None
+    si._search_index = None
+
+
+def upload(client, device_id: str, margins, article_url: str = "https://example.com/a"):
+    return client.post("/api/margins", json={
+        "device_id": device_id,
+        "article_url": article_url,
+        "margins": margins,
+    })
+
+
+def note(i: int, voice_note: str = "note") -> dict:
+    return {
+        "highlight_text": f"quote {i}",
+        "voice_note": voice_note,
+        "created_at": f"2026-01-01T00:00:{i:02d}Z",
+    }
+
+
+class TestUploadMargins:
+    """Tests for POST /api/margins endpoint."""
+    
+    def test_upload_counts_new_and_changed(self, client, test_device_id):
+        """Only new or changed notes should count as stored."""
+        first = upload(client, test_device_id, [note(0), note(1)])
+        second = upload(client, test_device_id, [note(1), note(2), note(0, "edited")])
+        
+        assert first.json() == {"stored": 2, "total": 2}
+        assert second.json() == {"stored": 2, "total": 3}
+    
+    def test_empty_upload_rejected(self, client, test_device_id):
+        """Uploads must contain at least one note."""
+        response = upload(client, test_device_id, [])
+        
+        assert response.status_code == 422
+
+
+class TestListMargins:
+    """Tests for GET /api/margins endpoint."""
+    
+    def test_paginates_in_created_order(self, client, test_device_id):
+        """Pages should follow created_at order and chain via next_cursor."""
+        upload(client, test_device_id, [note(i) for i in (3, 1, 4, 0, 2)])
+        
+        seen = []
+        cursor = None
+        while True:
+            params = {"device_id": test_device_id, "article_url": "https://example.com/a", "limit": 2}
+            if cursor:
+                params["cursor"] = cursor
+            data = client.get("/api/margins", params=params).json()
+            seen.extend(margin["highlight_text"] for margin in data["margins"])
+            cursor = data["next_cursor"]
+            if cursor is None:
+                break
+        
+        assert seen == [f"quote {i}" for i in range(5)]
+    
+    def test_article_url_is_normalized(self, client, test_device_id):
+        """URL variants of the same article should share notes."""
+        upload(client, test_device_id, [note(0)], "https://Example.com/a/?utm_source=feed#top")
+        
+        response = client.get("/api/margins", params={
+            "device_id": test_device_id,
+            "article_url": "https://example.com/a",
+        })
+        
+        assert len(response.json()["margins"]) == 1
+    
+    def test_devices_isolated(self, client, test_device_id):
+        """A device should not see another device's notes."""
+        upload(client, test_device_id, [note(0)])
+        
+        response = client.get("/api/margins", params={
+            "device_id": "other_device_1234",
+            "article_url": "https://example.com/a",
+        })
+        
+        assert response.json() == {"margins": [], "next_cursor": None}
+    
+    def test_invalid_cursor(self, client, test_device_id):
+        """A malformed cursor should return 400."""
+        response = client.get("/api/margins", params={
+            "device_id": test_device_id,
+            "article_url": "https://example.com/a",
+            "cursor": "not-a-cursor",
+        })
+        
+        assert response.status_code == 400
+
+
+class TestSearchMargins:
+    """Tests for GET /api/margins/search endpoint."""
+    
+    def test_finds_uploaded_notes(self, client, test_device_id):
+        """Uploaded notes should be searchable right away."""
+        upload(client, test_device_id, [note(0, "thinking about sleep"), note(1, "coffee")])
+        
+        response = client.get("/api/margins/search", params={"device_id": test_device_id, "q": "sle*"})
+        
+        assert response.status_code == 200
+        hits = response.json()["hits"]
+        assert [hit["margin"]["voice_note"] for hit in hits] == ["thinking about sleep"]
+        assert hits[0]["article_url"] == "https://example.com/a"
+    
+    def test_index_rebuilt_from_store(self, client, test_device_id):
+        """A new index should be backfilled from the stored notes."""
+        import app.services.search_index as si
+        upload(client, test_device_id, [note(0, "persisted")])
+        si._search_index = None
+        
+        assert si.backfill_search_index() == 1
+        response = client.get("/api/margins/search", params={"device_id": test_device_id, "q": "persisted"})
+        
+        assert len(response.json()["hits"]) == 1
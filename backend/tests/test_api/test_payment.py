@@ -7,6 +7,7 @@ from fastapi.testclient import TestClient
 from unittest.mock import patch, MagicMock, AsyncMock
 
 from app.main import app
+from app.config import get_settings
 
 
 @pytest.fixture
@@ -23,9 +24,15 @@ def test_device_id():
 def reset_services():
     """Reset singleton services after each test."""
     import app.services.token_service as ts
+    import app.services.idempotency_service as ids
+    import app.services.checkout_cache as cc
     ts._token_service = None
+    ids._idempotency_store = None
+    cc._checkout_cache = None
     yield
     ts._token_service = None
+    ids._idempotency_store = None
+    cc._checkout_cache = None
 
 
 @pytest.fixture
@@ -151,6 +158,67 @@ class TestCreateCheckout:
             )
         
         assert response.status_code == 503
+    
+    
+    def test_checkout_reuses_open_session(self, client, test_device_id, mock_creem_settings):
+        """Repeated clicks should reuse the session instead of calling Creem again."""
+        mock_response = MagicMock()
+        mock_response.status_code = 200
+        mock_response.json.return_value = {
+            "checkout_url": "https://checkout.creem.io/test",
+            "id": "session_test_123",
+        }
+        
+        with patch("app.api.payment_router.get_settings", return_value=mock_creem_settings):
+            with patch("httpx.AsyncClient.post", new_callable=AsyncMock, return_value=mock_response) as mock_post:
+                request = {"product_type": "pack_10", "device_id": test_device_id}
+                first = client.post("/api/checkout", json=request)
+                second = client.post("/api/checkout", json=request)
+                other = client.post("/api/checkout", json={**request, "product_type": "pack_3"})
+        
+        assert first.json() == second.json()
+        assert other.status_code == 200
+        assert mock_post.await_count == 2
+    
+    def test_checkout_failure_not_cached(self, client, test_device_id, mock_creem_settings):
+        """A failed upstream call should not be reused."""
+        error_response = MagicMock()
+        error_response.status_code = 500
+        error_response.text = "upstream error"
+        
+        with patch("app.api.payment_router.get_settings", return_value=mock_creem_settings):
+            with patch("httpx.AsyncClient.post", new_callable=AsyncMock, return_value=error_response) as mock_post:
+                request = {"product_type": "pack_10", "device_id": test_device_id}
+                first = client.post("/api/checkout", json=request)
+                second = client.post("/api/checkout", json=request)
+        
+        assert first.status_code == 502
+        assert second.status_code == 502
+        assert mock_post.await_count == 2
+    
+    def test_completed_checkout_is_not_reused(self, client, test_device_id, mock_creem_settings):
+        """After a checkout completes, the next purchase should get a new session."""
+        mock_response = MagicMock()
+        mock_response.status_code = 200
+        mock_response.json.return_value = {
+            "checkout_url": "https://checkout.creem.io/test",
+            "id": "session_test_123",
+        }
+        completed = {
+            "eventType": "checkout.completed",
+            "object": {"metadata": {"device_id": test_device_id, "product_type": "pack_10"}},
+        }
+        
+        with patch("app.api.payment_router.get_settings", return_value=mock_creem_settings):
+            with patch("httpx.AsyncClient.post", new_callable=AsyncMock, return_value=mock_response) as mock_post:
+                request = {"product_type": "pack_10", "device_id": test_device_id}
+                client.post("/api/checkout", json=request)
+                client.post("/api/checkout", json={**request, "product_type": "pack_3"})
+                client.post("/api/webhook", json=completed)
+                client.post("/api/checkout", json=request)
+                client.post("/api/checkout", json={**request, "product_type": "pack_3"})
+        
+        assert mock_post.await_count == 3
 
 
 class TestWebhook:
@@ -199,6 +267,120 @@ class TestWebhook:
         data = status_response.json()
         assert data["total_tokens"] == 3
     
+    def test_webhook_duplicate_delivery_credits_once(self, client, test_device_id):
+        """Retried deliveries of the same checkout should only credit once."""
+        payload = {
+            "id": "evt_123",
+            "eventType": "checkout.completed",
+            "object": {
+                "id": "ch_123",
+                "metadata": {
+                    "device_id": test_device_id,
+                    "product_type": "pack_10",
+                },
+            },
+        }
+        
+        first = client.post("/api/webhook", json=payload)
+        second = client.post("/api/webhook", json=payload)
+        
+        assert first.json() == {"received": True}
+        assert second.status_code == 200
+        assert second.json()["duplicate"] == True
+        
+        status_response = client.get(f"/api/tokens/{test_device_id}")
+        free_trial_count = get_settings().free_trial_count
+        assert status_response.json()["total_tokens"] == free_trial_count + 10
+    
+    def test_webhook_async_mode_queues_then_applies(self, client, test_device_id, tmp_path):
+        """Async mode should acknowledge first and apply from the queue."""
+        from app.config import Settings
+        from app.services.webhook_queue import WebhookConsumer, get_webhook_queue
+        from app.api.payment_router import apply_webhook_events
+        import app.services.webhook_queue as wq
+        
+        async_settings = Settings(
+            webhook_async=True,
+            webhook_queue_path=str(tmp_path / "queue.db"),
+        )
+        payload = {
+            "eventType": "checkout.completed",
+            "object": {
+                "id": "ch_async",
+                "metadata": {
+                    "device_id": test_device_id,
+                    "product_type": "pack_3",
+                },
+            },
+        }
+        
+        wq._webhook_queue = None
+        try:
+            with patch("app.services.webhook_queue.get_settings", return_value=async_settings):
+                response = client.post("/api/webhook", json=payload)
+                before = client.get(f"/api/tokens/{test_device_id}").json()
+                WebhookConsumer(get_webhook_queue(), apply_webhook_events).process_batch()
+                after = client.get(f"/api/tokens/{test_device_id}").json()
+        finally:
+            wq._webhook_queue = None
+        
+        assert response.json() == {"received": True, "queued": True}
+        assert after["total_tokens"] - before["total_tokens"] == 3
+    
+    def test_webhook_invalid_json(self, client):
+        """Should reject a body that is not JSON."""
+        response = client.post(
+            "/api/webhook",
+            content=b"not json",
+            headers={"Content-Type": "application/json"},
+        )
+        
+        assert response.status_code == 400
+    
+    def test_webhook_non_object_json(self, client):
+        """Should reject JSON bodies that are not objects."""
+        for body in (b"[]", b'"x"', b"null"):
+            response = client.post(
+                "/api/webhook",
+                content=body,
+                headers={"Content-Type": "application/json"},
+            )
+            
+            assert response.status_code == 400
+    
+    def test_failed_upgrade_keeps_committed_grants_claimed(self, client, test_device_id):
+        """A retry after a failed unlimited upgrade should not credit packs twice."""
+        from app.api.payment_router import apply_webhook_events
+        from app.services.token_service import get_token_service
+        
+        payloads = [
+            {
+                "eventType": "checkout.completed",
+                "object": {
+                    "id": "ch_pack",
+                    "metadata": {"device_id": test_device_id, "product_type": "pack_3"},
+                },
+            },
+            {
+                "eventType": "checkout.completed",
+                "object": {
+                    "id": "ch_unlimited",
+                    "metadata": {"device_id": "other_device_12345", "product_type": "unlimited"},
+                },
+            },
+        ]
+        token_service = get_token_service()
+        
+        with patch.dict("app.api.payment_router.PRODUCTS", {"unlimited": {"tokens": 0}}):
+            with patch.object(token_service, "bulk_set_unlimited", side_effect=RuntimeError("locked")):
+                with pytest.raises(RuntimeError):
+                    apply_webhook_events(payloads)
+            duplicates = apply_webhook_events(payloads)
+        
+        assert duplicates == 1
+        assert token_service.get_token_status(test_device_id).total_tokens == get_settings().free_trial_count + 3
+        assert token_service.get_token_status("other_device_12345").is_unlimited
+    
     def test_webhook_unknown_event(self, client):
         """Should handle unknown event types gracefully."""
         payload = {
@@ -304,3 +486,13 @@ class TestGetProducts:
         popular_products = [p for p in data["products"] if p.get("popular")]
         assert len(popular_products) == 1
         assert popular_products[0]["id"] == "pack_10"
+    
+    def test_products_conditional_get(self, client):
+        """Should return 304 when the ETag matches."""
+        response = client.get("/api/products")
+        etag = response.headers["etag"]
+        
+        cached = client.get("/api/products", headers={"If-None-Match": etag})
+        
+        assert cached.status_code == 304
+        assert cached.content == b""
@@ -0,0 +1,123 @@
+"""Tests for admission control and load shedding."""
+import asyncio
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from app.core.admission import AdmissionController, AdmissionMiddleware
+
+
+class TestAdmissionController:
+    """Tests for AdmissionController class."""
+    
+    @pytest.mark.asyncio
+    async def test_admits_up_to_concurrency(self):
+        """Requests beyond concurrency plus queue should be shed at once."""
+        controller = AdmissionController("test", max_concurrency=2, max_queue=1)
+        
+        assert await controller.acquire() is None
+        assert await controller.acquire() is None
+        waiter = asyncio.create_task(controller.acquire())
+        await asyncio.sleep(0)
+        
+        assert await controller.acquire() == "queue_full"
+        controller.release()
+        assert await waiter is None
+        assert controller.in_flight == 2
+    
+    @pytest.mark.asyncio
+    async def test_waiter_times_out(self):
+        """A waiter should give up after max_wait and leave the queue."""
+        controller = AdmissionController("test", max_concurrency=1, max_queue=5, max_wait=0.02)
+        await controller.acquire()
+        
+        assert await controller.acquire() == "timeout"
+        assert controller.queued == 0
+    
+    @pytest.mark.asyncio
+    async def test_cancelled_waiter_leaves_queue(self):
+        """A client that disconnects while queued should not hold a place."""
+        controller = AdmissionController("test", max_concurrency=1, max_queue=5)
+        await controller.acquire()
+        waiter = asyncio.create_task(controller.acquire())
+        await asyncio.sleep(0)
+        
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        
+        assert controller.queued == 0
+        controller.release()
+        assert controller.in_flight == 0
+    
+    @pytest.mark.asyncio
+    async def test_standing_queue_is_shed(self):
+        """Once waits stay above target for an interval, waiters should be shed."""
+        controller = AdmissionController(
+            "test", max_concurrency=1, max_queue=10, target_delay=0.01, interval=0.02,
+        )
+        await controller.acquire()
+        waiters = [asyncio.create_task(controller.acquire()) for _ in range(3)]
+        await asyncio.sleep(0.03)
+        
+        # First wait over target starts the interval, the next ends it
+        controller.release()
+        assert await waiters[0] is None
+        await asyncio.sleep(0.03)
+        controller.release()
+        
+        assert await waiters[1] == "queue_delay"
+        assert await waiters[2] == "queue_delay"
+        assert controller.in_flight == 0
+        assert not controller.dropping
+    
+    @pytest.mark.asyncio
+    async def test_short_waits_are_not_shed(self):
+        """Waits under the target should never be shed."""
+        controller = AdmissionController("test", max_concurrency=1, max_queue=10, target_delay=1.0)
+        await controller.acquire()
+        waiter = asyncio.create_task(controller.acquire())
+        await asyncio.sleep(0)
+        
+        controller.release()
+        
+        assert await waiter is None
+
+
+class TestAdmissionMiddleware:
+    """Tests for AdmissionMiddleware class."""
+    
+    @pytest.mark.asyncio
+    async def test_sheds_with_503(self):
+        """Requests over the limit should get a fast 503 with Retry-After."""
+        release = asyncio.Event()
+        app = FastAPI()
+        app.add_middleware(
+            AdmissionMiddleware,
+            classes=[(("/api/",), AdmissionController("api", max_concurrency=1, max_queue=0))],
+            exempt=("/api/admin/",),
+        )
+        
+        @app.get("/api/slow")
+        async def slow():
+            await release.wait()
+            return {"ok": True}
+        
+        @app.get("/api/admin/status")
+        async def status():
+            return {"ok": True}
+        
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            first = asyncio.create_task(client.get("/api/slow"))
+            await asyncio.sleep(0.01)
+            shed = await client.get("/api/slow")
+            exempt = await client.get("/api/admin/status")
+            release.set()
+            admitted = await first
+        
+        assert shed.status_code == 503
+        assert shed.headers["retry-after"] == "1"
+        assert exempt.status_code == 200
+        assert admitted.status_code == 200
@@ -0,0 +1,103 @@
+"""Tests for response compression and ETags."""
+import gzip
+
+import pytest
+from fastapi import FastAPI, Response
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.core.compression import CompressionMiddleware, choose_encoding
+from app.core.etag import content_etag, etag_matches
+
+BODY = b'{"content": "' + b"margin notes " * 500 + b'"}'
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=100, offload_size=1000)
+    
+    @app.get("/large")
+    async def large():
+        return Response(BODY, media_type="application/json", headers={"ETag": content_etag(BODY)})
+    
+    @app.get("/small")
+    async def small():
+        return Response(b'{"ok": true}', media_type="application/json")
+    
+    @app.get("/binary")
+    async def binary():
+        return Response(BODY, media_type="audio/webm")
+    
+    @app.get("/stream")
+    async def stream():
+        return StreamingResponse(iter([BODY, BODY]), media_type="application/x-ndjson")
+    
+    return TestClient(app)
+
+
+class TestChooseEncoding:
+    """Tests for Accept-Encoding negotiation."""
+    
+    def test_gzip(self):
+        assert choose_encoding("gzip, deflate") == "gzip"
+    
+    def test_refused_by_q_zero(self):
+        assert choose_encoding("gzip;q=0") is None
+    
+    def test_wildcard(self):
+        assert choose_encoding("*") is not None
+    
+    def test_unsupported_only(self):
+        assert choose_encoding("deflate, identity") is None
+
+
+class TestCompressionMiddleware:
+    """Tests for CompressionMiddleware class."""
+    
+    def test_compresses_large_json(self, client):
+        """Large JSON bodies should be gzipped with a weakened ETag."""
+        response = client.get("/large", headers={"Accept-Encoding": "gzip"})
+        
+        assert response.headers["content-encoding"] == "gzip"
+        assert "Accept-Encoding" in response.headers["vary"]
+        assert response.headers["etag"] == "W/" + content_etag(BODY)
+        assert int(response.headers["content-length"]) < len(BODY)
+        assert response.content == BODY
+    
+    def test_skips_small_bodies(self, client):
+        response = client.get("/small", headers={"Accept-Encoding": "gzip"})
+        
+        assert "content-encoding" not in response.headers
+    
+    def test_skips_binary_types(self, client):
+        response = client.get("/binary", headers={"Accept-Encoding": "gzip"})
+        
+        assert "content-encoding" not in response.headers
+    
+    def test_streams_pass_through(self, client):
+        response = client.get("/stream", headers={"Accept-Encoding": "gzip"})
+        
+        assert "content-encoding" not in response.headers
+        assert response.content == BODY + BODY
+    
+    def test_no_accept_encoding(self, client):
+        response = client.get("/large", headers={"Accept-Encoding": "identity"})
+        
+        assert "content-encoding" not in response.headers
+        assert response.content == BODY
+
+
+class TestEtag:
+    """Tests for ETag matching."""
+    
+    def test_matches_strong_and_weak(self):
+        etag = content_etag(BODY)
+        
+        assert etag_matches(etag, etag)
+        assert etag_matches("W/" + etag, etag)
+        assert etag_matches(f'"other", {etag}', etag)
+    
+    def test_no_match(self):
+        assert not etag_matches('"other"', content_etag(BODY))
+        assert not etag_matches(None, content_etag(BODY))
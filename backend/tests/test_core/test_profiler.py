@@ -0,0 +1,77 @@
+"""Tests for the sampling profiler and loop lag monitor."""
+import asyncio
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+from app.core.profiler import LoopLagMonitor, SamplingProfiler, collapse_stack, profile
+
+
+def _busy_wait(stop: threading.Event):
+    while not stop.is_set():
+        time.sleep(0.001)
+
+
+class TestSamplingProfiler:
+    """Tests for SamplingProfiler class."""
+    
+    def test_collapse_stack_is_outermost_first(self):
+        """The current function should be the last frame."""
+        import sys
+        
+        stack = collapse_stack(sys._getframe())
+        
+        assert stack[-1].startswith("test_collapse_stack_is_outermost_first (")
+    
+    def test_samples_other_threads(self):
+        """Stacks of other threads should be recorded under their name."""
+        stop = threading.Event()
+        worker = threading.Thread(target=_busy_wait, args=(stop,), name="busy-worker")
+        worker.start()
+        profiler = SamplingProfiler()
+        try:
+            profiler.sample()
+        finally:
+            stop.set()
+            worker.join()
+        
+        busy = [stack for stack in profiler.samples if stack.startswith("busy-worker;")]
+        assert busy
+        assert "_busy_wait (" in busy[0]
+    
+    def test_collapsed_format(self):
+        """Output should be one 'stack count' line per stack, most common first."""
+        profiler = SamplingProfiler()
+        profiler.samples.update({"main;a;b": 3, "main;a": 1})
+        
+        assert profiler.collapsed() == "main;a;b 3\nmain;a 1\n"
+    
+    @pytest.mark.asyncio
+    async def test_one_profile_at_a_time(self):
+        """A second concurrent profile should be refused."""
+        first = asyncio.create_task(profile(0.1))
+        await asyncio.sleep(0)
+        
+        with pytest.raises(RuntimeError):
+            await profile(0.1)
+        assert await first
+
+
+class TestLoopLagMonitor:
+    """Tests for LoopLagMonitor class."""
+    
+    @pytest.mark.asyncio
+    async def test_measures_blocking(self):
+        """Lag should reflect time the loop was blocked."""
+        lags = []
+        monitor = LoopLagMonitor(interval=0.01)
+        with patch("app.core.profiler.observe_event_loop_lag", side_effect=lags.append):
+            monitor.start()
+            await asyncio.sleep(0)
+            time.sleep(0.05)
+            await asyncio.sleep(0.02)
+            await monitor.stop()
+        
+        assert max(lags) >= 0.03
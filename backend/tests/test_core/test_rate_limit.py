@@ -0,0 +1,204 @@
+"""Tests for rate limiting primitives."""
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from unittest.mock import patch
+
+from app.core.rate_limit import (
+    MemoryRateLimitStore,
+    RateLimitMiddleware,
+    RateLimitRule,
+    SqliteRateLimitStore,
+    TokenBucket,
+    gcra,
+    rate_limit_rules,
+)
+from app.core.sqlite import connect
+
+
+class TestTokenBucket:
+    """Tests for TokenBucket class."""
+    
+    def test_burst_up_to_capacity(self):
+        """A full bucket should allow a burst without waiting."""
+        bucket = TokenBucket(rate=3, capacity=3)
+        
+        assert [bucket.reserve() for _ in range(3)] == [0.0, 0.0, 0.0]
+    
+    def test_waits_are_spaced_by_rate(self):
+        """Reservations beyond the burst should queue at the refill rate."""
+        with patch("app.core.rate_limit.time.monotonic", return_value=100.0):
+            bucket = TokenBucket(rate=2, capacity=1)
+            waits = [bucket.reserve() for _ in range(3)]
+        
+        assert waits == [0.0, 0.5, 1.0]
+    
+    def test_refills_over_time(self):
+        """Tokens should be refilled with elapsed time, up to capacity."""
+        with patch("app.core.rate_limit.time.monotonic", return_value=100.0):
+            bucket = TokenBucket(rate=2, capacity=2)
+            bucket.reserve(2)
+        with patch("app.core.rate_limit.time.monotonic", return_value=110.0):
+            assert bucket.reserve(2) == 0.0
+            assert bucket.reserve() == 0.5
+    
+    @pytest.mark.asyncio
+    async def test_acquire_returns_wait(self):
+        """acquire should sleep for the reserved delay."""
+        bucket = TokenBucket(rate=100, capacity=1)
+        
+        assert await bucket.acquire() == 0.0
+        assert await bucket.acquire() > 0.0
+
+
+class TestGcra:
+    """Tests for the gcra function."""
+    
+    def test_burst_then_interval(self):
+        """A full bucket allows ``burst`` requests, then one per interval."""
+        tat = 100.0
+        results = []
+        for _ in range(4):
+            retry_after, tat = gcra(tat, 100.0, rate=2, burst=3)
+            results.append(retry_after)
+        
+        assert results == [0.0, 0.0, 0.0, 0.5]
+        assert gcra(tat, 100.5, rate=2, burst=3)[0] == 0.0
+
+
+class TestMemoryRateLimitStore:
+    """Tests for MemoryRateLimitStore class."""
+    
+    def test_limits_per_key(self):
+        """Each key should have its own bucket."""
+        store = MemoryRateLimitStore()
+        
+        assert [store.hit("a", 1, 2) for _ in range(3)][-1] > 0
+        assert store.hit("b", 1, 2) == 0.0
+    
+    def test_limited_key_charges_no_other(self):
+        """A request rejected by one key should not use up the others."""
+        store = MemoryRateLimitStore()
+        store.hit("device", 1, 1)
+        
+        assert store.hit_all(["ip", "device"], 1, 1) > 0
+        assert store.hit("ip", 1, 1) == 0.0
+    
+    def test_sweeps_refilled_keys(self):
+        """Keys whose bucket has refilled should be evicted."""
+        store = MemoryRateLimitStore(shards=1, sweep_every=1)
+        with patch("app.core.rate_limit.time.monotonic", return_value=100.0):
+            store.hit("idle", 10, 5)
+        with patch("app.core.rate_limit.time.monotonic", return_value=200.0):
+            store.hit("active", 10, 5)
+        
+        assert len(store) == 1
+
+
+class TestSqliteRateLimitStore:
+    """Tests for SqliteRateLimitStore class."""
+    
+    def test_shared_between_stores(self, tmp_path):
+        """Stores on the same file should share their buckets."""
+        path = str(tmp_path / "rate_limits.db")
+        first, second = SqliteRateLimitStore(path), SqliteRateLimitStore(path)
+        
+        assert first.hit("ip:1", 1, 2) == 0.0
+        assert second.hit("ip:1", 1, 2) == 0.0
+        assert first.hit("ip:1", 1, 2) > 0
+        assert second.hit_all(["ip:2", "ip:1"], 1, 2) > 0
+        assert first.hit("ip:2", 1, 2) == 0.0
+        first.close()
+        second.close()
+    
+    def test_fails_open_when_locked(self, tmp_path):
+        """A store locked by another worker should allow the request, not hang."""
+        path = str(tmp_path / "rate_limits.db")
+        store = SqliteRateLimitStore(path, busy_timeout=0.01)
+        holder = connect(path)
+        holder.execute("BEGIN IMMEDIATE")
+        
+        try:
+            assert store.hit("ip:1", 1, 1) == 0.0
+            assert store.hit("ip:1", 1, 1) == 0.0
+        finally:
+            holder.execute("ROLLBACK")
+            holder.close()
+        assert store.hit("ip:1", 1, 1) == 0.0
+        assert store.hit("ip:1", 1, 1) > 0
+        store.close()
+
+
+class TestRateLimitMiddleware:
+    """Tests for RateLimitMiddleware class."""
+    
+    @pytest.fixture
+    def client(self):
+        app = FastAPI()
+        app.add_middleware(
+            RateLimitMiddleware,
+            rules=[
+                RateLimitRule.parse("extract", ("/api/extract",), "1/2"),
+                RateLimitRule.parse("api", ("/api/",), "100/100"),
+            ],
+            store=MemoryRateLimitStore(),
+            exempt=("/api/webhook",),
+        )
+        
+        @app.get("/api/extract")
+        async def extract():
+            return {"ok": True}
+        
+        @app.get("/api/tokens/{device_id}")
+        async def tokens(device_id: str):
+            return {"ok": True}
+        
+        @app.get("/api/webhook")
+        async def webhook():
+            return {"ok": True}
+        
+        return TestClient(app)
+    
+    def test_returns_429_with_retry_after(self, client):
+        """Requests beyond the burst should be rejected with Retry-After."""
+        statuses = [client.get("/api/extract").status_code for _ in range(3)]
+        response = client.get("/api/extract")
+        
+        assert statuses == [200, 200, 429]
+        assert response.status_code == 429
+        assert response.headers["retry-after"] == "1"
+    
+    def test_groups_are_independent(self, client):
+        """Exhausting one group should not limit another."""
+        for _ in range(3):
+            client.get("/api/extract")
+        
+        assert client.get("/api/tokens/device_1234567890").status_code == 200
+    
+    def test_exempt_paths(self, client):
+        """Exempt paths should never be limited."""
+        assert all(client.get("/api/webhook").status_code == 200 for _ in range(200))
+    
+    def test_device_header_limited(self, client):
+        """Requests naming a device should be limited on the device bucket too."""
+        headers = {"X-Device-Id": "device_1234567890"}
+        statuses = [client.get("/api/extract", headers=headers).status_code for _ in range(3)]
+        
+        assert statuses == [200, 200, 429]
+
+
+class TestRateLimitRules:
+    """Tests for the route groups built from settings."""
+    
+    def test_paging_has_its_own_group(self):
+        """Paragraph pages should not share the extract bucket."""
+        from app.config import Settings
+        
+        rules = rate_limit_rules(Settings())
+        
+        def group(path):
+            return next(rule.name for rule in rules if path.startswith(rule.prefixes))
+        
+        assert group("/api/extract/paragraphs") == "paging"
+        assert group("/api/extract") == "extract"
+        assert group("/api/extract/stream") == "extract"
@@ -0,0 +1,37 @@
+"""Tests for per-stage request timing."""
+import pytest
+from prometheus_client import REGISTRY
+
+from app.core.metrics import TOOL_SLUG
+from app.core.timing import stage
+
+
+def _count(route: str, name: str) -> float:
+    return REGISTRY.get_sample_value(
+        "request_stage_latency_seconds_count",
+        {"tool": TOOL_SLUG, "route": route, "stage": name},
+    ) or 0.0
+
+
+class TestStage:
+    """Tests for the stage context manager."""
+    
+    def test_records_duration(self):
+        """Each block should add one observation for its route and stage."""
+        before = _count("test", "block")
+        
+        with stage("test", "block"):
+            pass
+        
+        assert _count("test", "block") == before + 1
+    
+    def test_records_on_error(self):
+        """A failing stage should still be recorded and the error re-raised."""
+        before = _count("test", "failing")
+        
+        with pytest.raises(RuntimeError):
+            with stage("test", "failing"):
+                raise RuntimeError("boom")
+        
+        assert _count("test", "failing") == before + 1
+
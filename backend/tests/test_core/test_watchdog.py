@@ -0,0 +1,94 @@
+"""Tests for the event-loop watchdog."""
+import asyncio
+import os
+import sys
+import time
+from unittest.mock import patch
+
+import pytest
+
+from app.core.watchdog import LoopWatchdog, attribute, current_route
+
+
+def _inner_call():
+    return sys._getframe()
+
+
+def _endpoint():
+    return _inner_call()
+
+
+class TestAttribute:
+    """Tests for route and service attribution."""
+    
+    def test_finds_route(self):
+        """The endpoint on the stack should give the route."""
+        frame = _endpoint()
+        
+        assert attribute(frame, {_endpoint.__code__: "/api/fake"}) == ("/api/fake", "unknown")
+    
+    def test_finds_innermost_service(self):
+        """The innermost frame under the services package should be the service."""
+        frame = _endpoint()
+        
+        with patch("app.core.watchdog._SERVICES_DIR", os.sep + "test_core" + os.sep):
+            route, service = attribute(frame, {_endpoint.__code__: "/api/fake"})
+        
+        assert (route, service) == ("/api/fake", "_inner_call")
+    
+    def test_unknown_without_route(self):
+        """Stacks outside any endpoint should be unattributed."""
+        assert attribute(_endpoint(), {}) == ("unknown", "unknown")
+    
+    @pytest.mark.asyncio
+    async def test_detached_task_uses_context_route(self):
+        """A task started by an endpoint should carry the endpoint's route."""
+        async def detached():
+            return attribute(sys._getframe(), {})
+        
+        async def endpoint():
+            current_route.set("/api/fake")
+            return await asyncio.ensure_future(detached())
+        
+        assert await asyncio.create_task(endpoint()) == ("/api/fake", "unknown")
+        assert await asyncio.create_task(detached()) == ("unknown", "unknown")
+
+
+async def _blocking_endpoint():
+    time.sleep(0.2)
+
+
+class TestLoopWatchdog:
+    """Tests for LoopWatchdog class."""
+    
+    @pytest.mark.asyncio
+    async def test_records_blocking_callback(self):
+        """A blocking endpoint should be recorded with its route and stack."""
+        watchdog = LoopWatchdog(0.05, {_blocking_endpoint.__code__: "/api/block"})
+        watchdog.start()
+        try:
+            await asyncio.sleep(0.05)
+            await _blocking_endpoint()
+            await asyncio.sleep(0.1)
+        finally:
+            await watchdog.stop()
+        
+        assert len(watchdog.incidents) == 1
+        incident = watchdog.incidents[0]
+        assert incident["route"] == "/api/block"
+        assert incident["seconds"] >= 0.1
+        assert any(frame.startswith("_blocking_endpoint (") for frame in incident["stack"])
+    
+    @pytest.mark.asyncio
+    async def test_ignores_short_callbacks(self):
+        """Callbacks under the threshold should not be recorded."""
+        watchdog = LoopWatchdog(0.2)
+        watchdog.start()
+        try:
+            for _ in range(5):
+                time.sleep(0.01)
+                await asyncio.sleep(0.02)
+        finally:
+            await watchdog.stop()
+        
+        assert not watchdog.incidents
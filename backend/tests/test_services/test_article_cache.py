@@ -0,0 +1,92 @@
+"""Tests for the extracted article cache."""
+import asyncio
+from unittest.mock import AsyncMock
+
+import pytest
+
+from app.services.article_cache import ArticleCache, CachedArticle
+from app.services.article_service import html_paragraphs
+
+
+def _result(url: str = "https://example.com/a") -> dict:
+    return {
+        "title": "Title",
+        "content": "First paragraph.\n\nSecond paragraph.",
+        "source_url": url,
+        "word_count": 4,
+    }
+
+
+class TestArticleCache:
+    """Tests for ArticleCache class."""
+    
+    @pytest.mark.asyncio
+    async def test_concurrent_requests_share_extraction(self):
+        """Concurrent requests for one article should extract it once."""
+        cache = ArticleCache()
+        
+        async def create():
+            await asyncio.sleep(0.01)
+            return CachedArticle.from_result(_result())
+        create = AsyncMock(side_effect=create)
+        
+        articles = await asyncio.gather(*(
+            cache.get_or_create("https://example.com/a", create) for _ in range(5)
+        ))
+        
+        assert create.await_count == 1
+        assert all(article is articles[0] for article in articles)
+        assert articles[0].paragraphs == ["First paragraph.", "Second paragraph."]
+    
+    @pytest.mark.asyncio
+    async def test_failures_are_not_cached(self):
+        """A failed extraction should be retried on the next request."""
+        cache = ArticleCache()
+        create = AsyncMock(side_effect=[ValueError("boom"), CachedArticle.from_result(_result())])
+        
+        with pytest.raises(ValueError):
+            await cache.get_or_create("https://example.com/a", create)
+        article = await cache.get_or_create("https://example.com/a", create)
+        
+        assert article.response.title == "Title"
+    
+    @pytest.mark.asyncio
+    async def test_evicts_least_recently_used(self):
+        """The least recently used article should be dropped first."""
+        cache = ArticleCache(max_entries=2)
+        article = CachedArticle.from_result(_result())
+        for name in ("a", "b"):
+            await cache.get_or_create(f"https://example.com/{name}", AsyncMock(return_value=article))
+        await cache.get_or_create("https://example.com/a", AsyncMock())
+        await cache.get_or_create("https://example.com/c", AsyncMock(return_value=article))
+        
+        reload = AsyncMock(return_value=article)
+        await cache.get_or_create("https://example.com/a", reload)
+        
+        assert len(cache) == 2
+        assert reload.await_count == 0
+    
+    @pytest.mark.asyncio
+    async def test_get_never_extracts(self):
+        """get() should return cached or in-flight articles and None otherwise."""
+        cache = ArticleCache()
+        
+        async def create():
+            await asyncio.sleep(0.01)
+            return CachedArticle.from_result(_result())
+        
+        assert await cache.get("https://example.com/a") is None
+        extraction = asyncio.ensure_future(cache.get_or_create("https://example.com/a", create))
+        await asyncio.sleep(0)
+        
+        assert (await cache.get("https://example.com/a/")).response.title == "Title"
+        assert await extraction is await cache.get("https://example.com/a")
+
+
+class TestHtmlParagraphs:
+    """Tests for splitting HTML into paragraphs."""
+    
+    def test_splits_block_elements(self):
+        html = "<div><h1>Title</h1><p>One <b>bold</b>\n word.</p><p> </p><p>Two</p>Three<br/>Four</div>"
+        
+        assert html_paragraphs(html) == ["Title", "One bold word.", "Two", "Three", "Four"]
@@ -0,0 +1,166 @@
+"""Tests for the Creem API client."""
+import asyncio
+import httpx
+import pytest
+
+from app.services.creem_client import CreemClient
+
+
+PAYLOAD = {"product_id": "prod_3"}
+
+
+def make_client(handler, **kwargs) -> CreemClient:
+    kwargs.setdefault("backoff_base", 0.001)
+    return CreemClient(transport=httpx.MockTransport(handler), **kwargs)
+
+
+def ok_response() -> httpx.Response:
+    return httpx.Response(200, json={"id": "sess_1", "checkout_url": "https://pay"})
+
+
+class TestCreemClient:
+    """Tests for CreemClient class."""
+    
+    @pytest.mark.asyncio
+    async def test_sends_api_key_and_payload(self):
+        """Requests should go to /checkouts with the API key header."""
+        seen = []
+        
+        def handler(request):
+            seen.append(request)
+            return ok_response()
+        
+        client = make_client(handler)
+        response = await client.create_checkout("https://api.test", "key_1", PAYLOAD)
+        await client.close()
+        
+        assert response.status_code == 200
+        assert str(seen[0].url) == "https://api.test/checkouts"
+        assert seen[0].headers["x-api-key"] == "key_1"
+    
+    @pytest.mark.asyncio
+    async def test_retries_unavailable(self):
+        """503 and 429 mean Creem did not act, so the call is retried."""
+        statuses = iter([503, 429])
+        
+        def handler(request):
+            status = next(statuses, 200)
+            return ok_response() if status == 200 else httpx.Response(status)
+        
+        client = make_client(handler)
+        response = await client.create_checkout("https://api.test", "key", PAYLOAD)
+        await client.close()
+        
+        assert response.status_code == 200
+    
+    @pytest.mark.asyncio
+    async def test_does_not_retry_client_errors(self):
+        """Other error statuses are returned as-is after one attempt."""
+        calls = []
+        
+        def handler(request):
+            calls.append(request)
+            return httpx.Response(400, json={"error": "bad"})
+        
+        client = make_client(handler)
+        response = await client.create_checkout("https://api.test", "key", PAYLOAD)
+        await client.close()
+        
+        assert response.status_code == 400
+        assert len(calls) == 1
+    
+    @pytest.mark.asyncio
+    async def test_retries_connect_errors(self):
+        """Connection failures happen before Creem sees the request."""
+        calls = []
+        
+        def handler(request):
+            calls.append(request)
+            if len(calls) == 1:
+                raise httpx.ConnectError("refused", request=request)
+            return ok_response()
+        
+        client = make_client(handler)
+        response = await client.create_checkout("https://api.test", "key", PAYLOAD)
+        await client.close()
+        
+        assert response.status_code == 200
+        assert len(calls) == 2
+    
+    @pytest.mark.asyncio
+    async def test_gives_up_after_max_retries(self):
+        """The last unavailable response is returned once retries run out."""
+        calls = []
+        
+        def handler(request):
+            calls.append(request)
+            return httpx.Response(503)
+        
+        client = make_client(handler, max_retries=2)
+        response = await client.create_checkout("https://api.test", "key", PAYLOAD)
+        await client.close()
+        
+        assert response.status_code == 503
+        assert len(calls) == 3
+    
+    @pytest.mark.asyncio
+    async def test_budget_exhausted(self):
+        """A slow upstream should fail within the overall budget."""
+        async def handler(request):
+            await asyncio.sleep(1)
+            return ok_response()
+        
+        client = make_client(handler, budget_seconds=0.05)
+        with pytest.raises(httpx.TimeoutException):
+            await client.create_checkout("https://api.test", "key", PAYLOAD)
+        await client.close()
+    
+    @pytest.mark.asyncio
+    async def test_hedges_slow_request(self):
+        """A request slower than the recent p95 should be hedged."""
+        calls = []
+        
+        async def handler(request):
+            calls.append(request)
+            if len(calls) == 1:
+                await asyncio.sleep(1)
+            return ok_response()
+        
+        client = make_client(handler, hedge_enabled=True, hedge_min_samples=5)
+        client._latencies.extend([0.01] * 5)
+        
+        response = await asyncio.wait_for(
+            client.create_checkout("https://api.test", "key", PAYLOAD, idempotency_key="idem_1"), 0.5
+        )
+        await client.close()
+        
+        assert response.status_code == 200
+        assert len(calls) == 2
+        assert [request.headers["idempotency-key"] for request in calls] == ["idem_1", "idem_1"]
+    
+    @pytest.mark.asyncio
+    async def test_no_hedge_without_idempotency_key(self):
+        """Checkouts without an idempotency key must never be sent twice."""
+        calls = []
+        
+        async def handler(request):
+            calls.append(request)
+            await asyncio.sleep(0.05)
+            return ok_response()
+        
+        client = make_client(handler, hedge_enabled=True, hedge_min_samples=5)
+        client._latencies.extend([0.01] * 5)
+        
+        response = await client.create_checkout("https://api.test", "key", PAYLOAD)
+        await client.close()
+        
+        assert response.status_code == 200
+        assert len(calls) == 1
+    
+    @pytest.mark.asyncio
+    async def test_no_hedge_without_samples(self):
+        """Hedging waits until enough latencies have been observed."""
+        client = make_client(lambda request: ok_response(), hedge_enabled=True)
+        
+        assert client._hedge_threshold() is None
+        await client.close()
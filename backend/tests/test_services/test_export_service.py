@@ -0,0 +1,77 @@
+"""Tests for margin export."""
+import json
+import pytest
+
+from app.schemas.article import MarginNote
+from app.services import export_service
+from app.services.export_service import block_to_markdown, iter_export
+from app.services.notion_blocks import margin_blocks
+
+
+def make_margins(count: int):
+    return [MarginNote(highlight_text=f"quote {i}", voice_note=f"note {i}") for i in range(count)]
+
+
+def export(export_format: str, margins) -> str:
+    return b"".join(iter_export(export_format, "Title", "https://example.com", margins)).decode()
+
+
+class TestExport:
+    """Tests for iter_export."""
+    
+    def test_markdown(self):
+        """Markdown should render the title, source and each margin."""
+        text = export("markdown", make_margins(2))
+        
+        assert text.startswith("# Title\n\nSource: [https://example.com](https://example.com)\n\n")
+        assert "> quote 0\n\n**💬** note 0\n\n" in text
+        assert text.count("---") == 2
+    
+    def test_markdown_escapes_and_multiline_quotes(self):
+        """Markdown syntax in notes should be escaped; quotes keep line breaks."""
+        block = margin_blocks(MarginNote(highlight_text="a *b*\nc", voice_note="x"))[1]
+        
+        assert block_to_markdown(block) == "> a \\*b\\*\n> c\n\n"
+    
+    def test_ndjson(self):
+        """NDJSON should have an article line then one line per margin."""
+        lines = export("ndjson", make_margins(3)).splitlines()
+        
+        assert json.loads(lines[0]) == {"article_title": "Title", "article_url": "https://example.com"}
+        assert [json.loads(line)["voice_note"] for line in lines[1:]] == ["note 0", "note 1", "note 2"]
+    
+    def test_notion_blocks(self):
+        """The Notion format should emit the blocks sync would send."""
+        margins = make_margins(2)
+        lines = export("notion", margins).splitlines()
+        
+        assert json.loads(lines[1]) == margin_blocks(margins[0])
+        assert len(lines) == 3
+    
+    def test_chunks_large_exports(self, monkeypatch):
+        """Output should be flushed in bounded chunks."""
+        monkeypatch.setattr(export_service, "CHUNK_SIZE", 256)
+        
+        chunks = list(iter_export("ndjson", "Title", "https://example.com", make_margins(50)))
+        
+        assert len(chunks) > 1
+        assert all(len(chunk) < 512 for chunk in chunks)
+    
+    def test_consumes_margins_lazily(self):
+        """Margins should be pulled from the iterable as output is produced."""
+        pulled = []
+        
+        def margins():
+            for margin in make_margins(10_000):
+                pulled.append(margin)
+                yield margin
+        
+        first = next(iter_export("ndjson", "Title", "https://example.com", margins()))
+        
+        assert first
+        assert len(pulled) < 10_000
+    
+    def test_unknown_format(self):
+        """Unknown formats should raise ValueError."""
+        with pytest.raises(ValueError):
+            iter_export("pdf", "Title", "https://example.com", [])
@@ -0,0 +1,54 @@
+"""Tests for the webhook idempotency store."""
+import pytest
+from unittest.mock import patch
+
+from app.services.idempotency_service import IdempotencyStore
+
+
+class TestIdempotencyStore:
+    """Tests for IdempotencyStore class."""
+    
+    def test_first_claim_succeeds(self):
+        """First delivery should be accepted, a repeat rejected."""
+        store = IdempotencyStore()
+        
+        assert store.claim("checkout.completed:ch_1") == True
+        assert store.claim("checkout.completed:ch_1") == False
+        assert store.claim("checkout.completed:ch_2") == True
+    
+    def test_memory_is_bounded(self):
+        """Oldest keys should be evicted beyond max_entries."""
+        store = IdempotencyStore(max_entries=3)
+        
+        for i in range(10):
+            store.claim(f"key_{i}")
+        
+        assert len(store) == 3
+        assert store.claim("key_0") == True
+    
+    def test_keys_expire_after_window(self):
+        """Keys older than the window should be forgotten."""
+        store = IdempotencyStore(window_seconds=60)
+        
+        with patch("app.services.idempotency_service.time.time", return_value=1000.0):
+            store.claim("key_1")
+        with patch("app.services.idempotency_service.time.time", return_value=1100.0):
+            assert store.claim("key_1") == True
+    
+    def test_backing_store_survives_restart(self, tmp_path):
+        """Duplicates should be caught by a new instance on the same file."""
+        path = str(tmp_path / "events.db")
+        IdempotencyStore(path=path).claim("key_1")
+        
+        store = IdempotencyStore(path=path)
+        
+        assert store.claim("key_1") == False
+    
+    def test_release_allows_retry(self, tmp_path):
+        """A released key should be accepted again."""
+        store = IdempotencyStore(path=str(tmp_path / "events.db"))
+        store.claim("key_1")
+        
+        store.release("key_1")
+        
+        assert store.claim("key_1") == True
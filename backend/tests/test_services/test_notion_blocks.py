@@ -0,0 +1,31 @@
+"""Tests for Notion block rendering."""
+import json
+
+from app.schemas.article import MarginNote
+from app.services.notion_blocks import encode_json, encode_margin, margin_blocks, source_block
+
+
+class TestNotionBlocks:
+    """Tests for the block renderers."""
+    
+    def test_margin_blocks_layout(self):
+        """A margin renders as divider, quote and voice note paragraph."""
+        blocks = margin_blocks(MarginNote(highlight_text="quote", voice_note="note"))
+        
+        assert [block["type"] for block in blocks] == ["divider", "quote", "paragraph"]
+        assert blocks[1]["quote"]["rich_text"][0]["text"]["content"] == "quote"
+        assert blocks[2]["paragraph"]["rich_text"][1]["text"]["content"] == "note"
+    
+    def test_encode_margin_matches_dicts(self):
+        """The precompiled template should encode exactly like the dicts."""
+        margin = MarginNote(highlight_text='He said "100%"\n', voice_note="über %s \\ ok")
+        
+        assert encode_margin(margin) == encode_json(margin_blocks(margin))
+        assert json.loads(encode_margin(margin)) == margin_blocks(margin)
+    
+    def test_source_block_links_article(self):
+        """The source paragraph should link to the article."""
+        block = source_block("https://example.com")
+        
+        link = block["paragraph"]["rich_text"][1]["text"]["link"]
+        assert link == {"url": "https://example.com"}
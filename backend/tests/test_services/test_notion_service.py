@@ -0,0 +1,373 @@
+"""Tests for NotionService."""
+import httpx
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from notion_client.errors import APIErrorCode, APIResponseError
+
+from app.schemas.article import MarginNote
+from app.services import notion_sync_state
+from app.services import notion_service as ns
+from app.services.notion_service import CHILDREN_PER_REQUEST, NotionService, NotionServicePool
+from app.services.notion_sync_state import NotionSyncStateStore
+
+
+def make_margins(count: int):
+    return [MarginNote(highlight_text=f"quote {i}", voice_note=f"note {i}") for i in range(count)]
+
+
+def rate_limited(retry_after: str = "0") -> APIResponseError:
+    return APIResponseError(
+        code=APIErrorCode.RateLimited,
+        status=429,
+        message="Rate limited",
+        headers=httpx.Headers({"retry-after": retry_after}),
+        raw_body_text="",
+    )
+
+
+@pytest.fixture(autouse=True)
+def reset_sync_state():
+    notion_sync_state._notion_sync_state = None
+    ns._notion_service = None
+    ns._notion_service_pool = None
+    yield
+    notion_sync_state._notion_sync_state = None
+    ns._notion_service = None
+    ns._notion_service_pool = None
+
+
+def appended(**kwargs):
+    """Fake blocks.children.append response with an id per child."""
+    appended.count += len(kwargs["children"])
+    start = appended.count - len(kwargs["children"])
+    return {"results": [{"id": f"blk_{start + i}"} for i in range(len(kwargs["children"]))]}
+
+
+@pytest.fixture
+def service():
+    notion_service = NotionService()
+    notion_service.database_id = "db_123"
+    notion_service.client = MagicMock()
+    notion_service.client.pages.create = AsyncMock(
+        return_value={"id": "page_1", "url": "https://notion.so/page_1"}
+    )
+    notion_service.client.blocks.children.append = AsyncMock(return_value={})
+    return notion_service
+
+
+class TestNotionService:
+    """Tests for NotionService class."""
+    
+    @pytest.mark.asyncio
+    async def test_small_sync_single_request(self, service):
+        """A short note list should fit in the create call."""
+        result = await service.sync_margins("Title", "https://example.com", make_margins(3))
+        
+        assert result["success"] is True
+        assert result["notion_url"] == "https://notion.so/page_1"
+        assert len(service.client.pages.create.call_args.kwargs["children"]) == 2 + 3 * 3 - 1
+        service.client.blocks.children.append.assert_not_called()
+    
+    @pytest.mark.asyncio
+    async def test_large_sync_appends_in_order(self, service):
+        """Blocks beyond the first 100 should be appended in batches, in order."""
+        result = await service.sync_margins("Title", "https://example.com", make_margins(70))
+        
+        assert result["success"] is True
+        created = service.client.pages.create.call_args.kwargs["children"]
+        appends = service.client.blocks.children.append.call_args_list
+        assert len(created) == CHILDREN_PER_REQUEST
+        assert [len(call.kwargs["children"]) for call in appends] == [100, 11]
+        assert all(call.kwargs["block_id"] == "page_1" for call in appends)
+        
+        blocks = created + [block for call in appends for block in call.kwargs["children"]]
+        quotes = [b["quote"]["rich_text"][0]["text"]["content"] for b in blocks if b["type"] == "quote"]
+        assert quotes == [f"quote {i}" for i in range(70)]
+    
+    @pytest.mark.asyncio
+    async def test_retries_rate_limited(self, service):
+        """A 429 from Notion should be retried after Retry-After."""
+        service.client.blocks.children.append = AsyncMock(side_effect=[rate_limited(), {}])
+        
+        result = await service.sync_margins("Title", "https://example.com", make_margins(40))
+        
+        assert result["success"] is True
+        assert service.client.blocks.children.append.call_count == 2
+    
+    @pytest.mark.asyncio
+    async def test_gives_up_after_max_retries(self, service):
+        """Persistent rate limiting should fail the sync."""
+        service.max_retries = 1
+        service.client.pages.create = AsyncMock(side_effect=rate_limited())
+        
+        result = await service.sync_margins("Title", "https://example.com", make_margins(1))
+        
+        assert result["success"] is False
+        assert service.client.pages.create.call_count == 2
+    
+    @pytest.mark.asyncio
+    async def test_other_errors_not_retried(self, service):
+        """Validation errors should fail immediately."""
+        service.client.pages.create = AsyncMock(side_effect=APIResponseError(
+            code=APIErrorCode.ValidationError,
+            status=400,
+            message="bad",
+            headers=httpx.Headers(),
+            raw_body_text="",
+        ))
+        
+        result = await service.sync_margins("Title", "https://example.com", make_margins(1))
+        
+        assert result["success"] is False
+        assert service.client.pages.create.call_count == 1
+
+
+class TestIncrementalSync:
+    """Tests for syncs that remember the page per device and article."""
+    
+    @pytest.fixture(autouse=True)
+    def fake_append(self, service):
+        appended.count = 0
+        service.client.blocks.children.append = AsyncMock(side_effect=appended)
+        service.client.blocks.update = AsyncMock(return_value={})
+    
+    async def sync(self, service, margins):
+        return await service.sync_margins(
+            "Title", "https://example.com", margins, device_id="device_1234567"
+        )
+    
+    @pytest.mark.asyncio
+    async def test_resync_reuses_page(self, service):
+        """Syncing the same notes again should not create another page."""
+        margins = make_margins(3)
+        await self.sync(service, margins)
+        result = await self.sync(service, margins)
+        
+        assert result["success"] is True
+        assert result["notion_url"] == "https://notion.so/page_1"
+        assert service.client.pages.create.call_count == 1
+        assert service.client.blocks.children.append.call_count == 1
+        service.client.blocks.update.assert_not_called()
+    
+    @pytest.mark.asyncio
+    async def test_appends_only_new_margins(self, service):
+        """Only notes added since the last sync should be sent."""
+        margins = make_margins(5)
+        await self.sync(service, margins[:3])
+        result = await self.sync(service, margins)
+        
+        last = service.client.blocks.children.append.call_args.kwargs["children"]
+        quotes = [b["quote"]["rich_text"][0]["text"]["content"] for b in last if b["type"] == "quote"]
+        assert quotes == ["quote 3", "quote 4"]
+        assert "2 new" in result["message"]
+    
+    @pytest.mark.asyncio
+    async def test_updates_changed_margins(self, service):
+        """An edited voice note should update its blocks in place."""
+        margins = make_margins(2)
+        await self.sync(service, margins)
+        margins[1] = MarginNote(highlight_text="quote 1", voice_note="edited")
+        result = await self.sync(service, margins)
+        
+        updated = {call.kwargs["block_id"] for call in service.client.blocks.update.call_args_list}
+        assert updated == {"blk_4", "blk_5"}
+        assert "1 changed" in result["message"]
+    
+    @pytest.mark.asyncio
+    async def test_recreates_deleted_page(self, service):
+        """If the page was deleted in Notion, sync should start over."""
+        margins = make_margins(2)
+        await self.sync(service, margins[:1])
+        service.client.blocks.children.append = AsyncMock(side_effect=[
+            APIResponseError(
+                code=APIErrorCode.ObjectNotFound,
+                status=404,
+                message="Could not find block",
+                headers=httpx.Headers(),
+                raw_body_text="",
+            ),
+            {"results": [{"id": f"new_{i}"} for i in range(6)]},
+        ])
+        
+        result = await self.sync(service, margins)
+        
+        assert result["success"] is True
+        assert service.client.pages.create.call_count == 2
+        assert len(service.client.blocks.children.append.call_args.kwargs["children"]) == 6
+    
+    @pytest.mark.asyncio
+    async def test_partial_failure_keeps_progress(self, service):
+        """Margins appended before a failure should not be sent again."""
+        service.max_retries = 0
+        service.client.blocks.children.append = AsyncMock(side_effect=[
+            {"results": [{"id": f"blk_{i}"} for i in range(99)]},
+            APIResponseError(
+                code=APIErrorCode.InternalServerError,
+                status=500,
+                message="boom",
+                headers=httpx.Headers(),
+                raw_body_text="",
+            ),
+        ])
+        
+        result = await self.sync(service, make_margins(40))
+        
+        assert result["success"] is False
+        state = notion_sync_state.get_notion_sync_state().get("device_1234567", "https://example.com")
+        assert len(state["margins"]) == 33
+
+
+class TestPageGone:
+    """Tests for detecting deleted or archived pages."""
+    
+    @staticmethod
+    def error(code, message: str) -> APIResponseError:
+        return APIResponseError(
+            code=code, status=400, message=message, headers=httpx.Headers(), raw_body_text=""
+        )
+    
+    def test_archived_block(self):
+        """Notion's archived-block validation error means the page is gone."""
+        assert ns._page_gone(self.error(
+            APIErrorCode.ValidationError,
+            "Can't edit block that is archived. You must unarchive the block before editing.",
+        ))
+    
+    def test_other_errors_mentioning_archived(self):
+        """Other errors that merely contain "archived" should not reset the sync."""
+        assert not ns._page_gone(self.error(
+            APIErrorCode.ValidationError, "body.children[0].paragraph should be defined, archived is invalid",
+        ))
+        assert not ns._page_gone(self.error(
+            APIErrorCode.InternalServerError, "Can't edit block that is archived",
+        ))
+
+
+class TestMarginHash:
+    """Tests for margin change detection hashes."""
+    
+    def test_independent_of_json_library(self):
+        """Installing or removing orjson must not change stored hashes."""
+        margin = MarginNote(highlight_text="quote", voice_note="note ✓")
+        
+        with patch("app.services.notion_blocks.orjson", None):
+            stdlib = ns.margin_hash(margin)
+        
+        assert stdlib == ns.margin_hash(margin) == "7adb7a3ae74c1fef"
+    
+    def test_changes_with_render_version(self):
+        """A new block layout should invalidate every stored hash."""
+        margin = MarginNote(highlight_text="quote", voice_note="note")
+        
+        with patch("app.services.notion_service.RENDER_VERSION", 2):
+            bumped = ns.margin_hash(margin)
+        
+        assert bumped != ns.margin_hash(margin)
+
+
+class TestNotionSyncStateStore:
+    """Tests for NotionSyncStateStore class."""
+    
+    def test_sqlite_roundtrip(self, tmp_path):
+        """States should persist across store instances."""
+        path = str(tmp_path / "sync.db")
+        NotionSyncStateStore(path).put("dev", "url", {"page_id": "p", "margins": {}})
+        
+        assert NotionSyncStateStore(path).get("dev", "url") == {"page_id": "p", "margins": {}}
+    
+    def test_delete(self):
+        """Deleted states should no longer be returned."""
+        store = NotionSyncStateStore()
+        store.put("dev", "url", {"page_id": "p"})
+        store.delete("dev", "url")
+        
+        assert store.get("dev", "url") is None
+
+
+class TestNotionServicePool:
+    """Tests for per-user Notion services."""
+    
+    def test_same_token_reuses_service(self):
+        """A token should map to one service while it is in the pool."""
+        pool = NotionServicePool()
+        
+        assert pool.get("token_a") is pool.get("token_a")
+        assert pool.get("token_a") is not pool.get("token_b")
+    
+    def test_services_share_http_client(self):
+        """All pooled services should share the unauthenticated client."""
+        pool = NotionServicePool()
+        first, second = pool.get("token_a"), pool.get("token_b")
+        
+        assert first.client is second.client
+        assert "authorization" not in first.client.client.headers
+        assert first._rate_limiter is not second._rate_limiter
+    
+    def test_databases_of_one_token_share_rate_limiter(self):
+        """Notion's per-token limit should be enforced across databases."""
+        pool = NotionServicePool()
+        first, second = pool.get("token_a", "db_1"), pool.get("token_a", "db_2")
+        
+        assert first is not second
+        assert first._rate_limiter is second._rate_limiter
+    
+    def test_evicts_least_recently_used(self):
+        """The pool should stay within max_size, dropping the LRU token."""
+        pool = NotionServicePool(max_size=2)
+        first = pool.get("token_a")
+        pool.get("token_b")
+        pool.get("token_a")
+        pool.get("token_c")
+        
+        assert len(pool) == 2
+        assert pool.get("token_a") is first
+        assert "token_b" not in [key[0] for key in pool._services]
+    
+    def test_evicts_idle(self):
+        """Services idle past idle_seconds should be dropped."""
+        pool = NotionServicePool(idle_seconds=5)
+        with patch("app.services.notion_service.time.monotonic", return_value=0):
+            pool.get("token_a")
+        with patch("app.services.notion_service.time.monotonic", return_value=10):
+            pool.get("token_b")
+        
+        assert len(pool) == 1
+    
+    @pytest.mark.asyncio
+    async def test_close_drops_services(self):
+        """Services holding the closed client should be rebuilt."""
+        service = ns.get_notion_service()
+        user = ns.get_notion_service("user_token")
+        
+        await ns.close_notion_client()
+        
+        assert ns.get_notion_service() is not service
+        assert ns.get_notion_service("user_token") is not user
+        await ns.close_notion_client()
+    
+    def test_sync_lock_shared_across_tokens(self):
+        """Syncs of one article should serialize whichever token they use."""
+        first = ns.get_notion_service("token_a")
+        second = ns.get_notion_service("token_b")
+        
+        assert first._lock("device_1234567", "https://example.com") is second._lock(
+            "device_1234567", "https://example.com"
+        )
+    
+    def test_database_override_requires_token(self):
+        """Without a user token the server's database should be used."""
+        default = ns.get_notion_service(notion_database_id="other_db")
+        user = ns.get_notion_service("user_token", "user_db")
+        
+        assert default.database_id != "other_db"
+        assert user.database_id == "user_db"
+        assert user.auth == "user_token"
+    
+    @pytest.mark.asyncio
+    async def test_auth_sent_per_call(self, service):
+        """Each API call should carry the service's token."""
+        service.auth = "user_token"
+        
+        await service.sync_margins("Title", "https://example.com", make_margins(1))
+        
+        assert service.client.pages.create.call_args.kwargs["auth"] == "user_token"
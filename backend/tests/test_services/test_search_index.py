@@ -0,0 +1,137 @@
+"""Tests for margin full-text search."""
+import pytest
+
+from app.schemas.article import MarginNote
+from app.services.search_index import SearchIndex, SqliteSearchIndex, parse_query
+
+
+DEVICE = "device_1234567"
+URL = "https://example.com/a"
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def index(request, tmp_path):
+    if request.param == "sqlite":
+        return SqliteSearchIndex(str(tmp_path / "search.db"))
+    return SearchIndex()
+
+
+def add(index, key: str, highlight_text: str, voice_note: str, device_id: str = DEVICE):
+    index.index(device_id, URL, [(key, MarginNote(highlight_text=highlight_text, voice_note=voice_note))])
+
+
+def notes(hits):
+    return [hit.margin.voice_note for hit in hits]
+
+
+class TestParseQuery:
+    """Tests for parse_query."""
+    
+    def test_terms_prefixes_and_phrases(self):
+        clauses = parse_query('Reading habit* "deep work"')
+        
+        assert [(c.terms, c.prefix) for c in clauses] == [
+            (["reading"], False),
+            (["habit"], True),
+            (["deep", "work"], False),
+        ]
+    
+    def test_ignores_empty_clauses(self):
+        assert parse_query('"" * !!') == []
+
+
+class TestSearchIndex:
+    """Tests shared by both search backends."""
+    
+    def test_term_matches_both_fields(self, index):
+        """Terms should match highlights and voice notes, case-insensitively."""
+        add(index, "1", "The Cathedral and the Bazaar", "open source classic")
+        add(index, "2", "unrelated", "a cathedral of ideas")
+        add(index, "3", "nothing", "here")
+        
+        assert sorted(notes(index.search(DEVICE, "CATHEDRAL"))) == ["a cathedral of ideas", "open source classic"]
+    
+    def test_all_clauses_must_match(self, index):
+        add(index, "1", "memory safety", "rust is nice")
+        add(index, "2", "memory leaks", "in C")
+        
+        assert notes(index.search(DEVICE, "memory rust")) == ["rust is nice"]
+    
+    def test_prefix(self, index):
+        add(index, "1", "reading list", "one")
+        add(index, "2", "readability", "two")
+        add(index, "3", "ready", "three")
+        add(index, "4", "writing", "four")
+        
+        assert sorted(notes(index.search(DEVICE, "readi*"))) == ["one"]
+        assert sorted(notes(index.search(DEVICE, "read*"))) == ["one", "three", "two"]
+    
+    def test_phrase(self, index):
+        """Phrases should match words in order only."""
+        add(index, "1", "deep work matters", "yes")
+        add(index, "2", "work deep", "no")
+        
+        assert notes(index.search(DEVICE, '"deep work"')) == ["yes"]
+    
+    def test_newest_first_with_limit(self, index):
+        for i in range(5):
+            add(index, str(i), "common", f"note {i}")
+        
+        assert notes(index.search(DEVICE, "common", limit=2)) == ["note 4", "note 3"]
+    
+    def test_updated_note_replaces_old_text(self, index):
+        add(index, "1", "draft", "old words")
+        add(index, "1", "draft", "new words")
+        
+        assert index.search(DEVICE, "old") == []
+        assert notes(index.search(DEVICE, "words")) == ["new words"]
+    
+    def test_devices_isolated(self, index):
+        add(index, "1", "secret", "mine", device_id="other_device_1")
+        
+        assert index.search(DEVICE, "secret") == []
+    
+    def test_backfill_keeps_newer_notes(self, index):
+        add(index, "1", "draft", "written live")
+        stored = [
+            (DEVICE, URL, "1", MarginNote(highlight_text="draft", voice_note="stale copy")),
+            (DEVICE, URL, "2", MarginNote(highlight_text="draft", voice_note="from store")),
+        ]
+        
+        assert index.needs_backfill()
+        assert index.backfill(stored) == 1
+        assert not index.needs_backfill()
+        assert sorted(notes(index.search(DEVICE, "draft"))) == ["from store", "written live"]
+    
+    def test_sqlite_backfill_runs_once(self, tmp_path):
+        path = str(tmp_path / "search.db")
+        SqliteSearchIndex(path).backfill([])
+        
+        assert not SqliteSearchIndex(path).needs_backfill()
+    
+    def test_sqlite_device_ids_with_shared_words(self, tmp_path):
+        """Device ids that tokenize alike should still be kept apart."""
+        index = SqliteSearchIndex(str(tmp_path / "search.db"))
+        add(index, "1", "shared", "theirs", device_id="test_device_111")
+        add(index, "1", "shared", "mine", device_id="test_device_222")
+        
+        assert notes(index.search("test_device_222", "shared")) == ["mine"]
+        assert index.search("test_device_333", "shared") == []
+    
+    def test_sqlite_rebuilds_index_without_device_tokens(self, tmp_path):
+        """An index from before device tokens should be dropped and backfilled."""
+        from app.core.sqlite import connect
+        path = str(tmp_path / "search.db")
+        conn = connect(path)
+        conn.executescript(
+            "CREATE VIRTUAL TABLE margin_fts USING fts5(device_id UNINDEXED, highlight_text, voice_note);"
+            "CREATE TABLE search_meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);"
+            "INSERT INTO search_meta VALUES ('backfilled', '1');"
+        )
+        conn.close()
+        
+        index = SqliteSearchIndex(path)
+        
+        assert index.needs_backfill()
+        add(index, "1", "fresh", "note")
+        assert notes(index.search(DEVICE, "fresh")) == ["note"]
@@ -0,0 +1,145 @@
+"""Tests for the shared (multi-worker) token service."""
+import multiprocessing
+import threading
+import pytest
+from unittest.mock import patch
+
+from app.services.shared_token_service import SharedTokenService
+
+
+@pytest.fixture
+def store_path(tmp_path):
+    return str(tmp_path / "tokens.db")
+
+
+@pytest.fixture
+def token_service(store_path):
+    service = SharedTokenService(store_path)
+    yield service
+    service.close()
+
+
+@pytest.fixture
+def test_device_id():
+    return "test_device_123456789"
+
+
+def _consume(path: str, device_id: str, attempts: int, results) -> None:
+    service = SharedTokenService(path)
+    results.put(sum(service.use_token(device_id).success for _ in range(attempts)))
+    service.close()
+
+
+class TestSharedTokenService:
+    """Tests for SharedTokenService class."""
+    
+    def test_new_device_status(self, token_service, test_device_id):
+        """New device should only have the free trial."""
+        status = token_service.get_token_status(test_device_id)
+        
+        assert status.remaining_tokens == token_service.settings.free_trial_count
+        assert status.is_unlimited == False
+    
+    def test_free_trial_then_paid(self, token_service, test_device_id):
+        """Free trial should be used before paid tokens."""
+        free_count = token_service.settings.free_trial_count
+        token_service.add_tokens(test_device_id, 2)
+        
+        results = [token_service.use_token(test_device_id) for _ in range(free_count + 3)]
+        
+        assert all(r.success for r in results[:free_count + 2])
+        assert "Free trial" in results[0].message
+        assert results[free_count].message == "1 tokens remaining"
+        assert results[-1].success == False
+    
+    def test_set_unlimited(self, token_service, test_device_id):
+        """Unlimited devices should always be able to use tokens."""
+        token_service.set_unlimited(test_device_id, months=1)
+        
+        result = token_service.use_token(test_device_id)
+        
+        assert result.remaining_tokens == 999999
+        assert token_service.get_token_status(test_device_id).is_unlimited == True
+    
+    def test_state_shared_between_instances(self, store_path, token_service, test_device_id):
+        """A second instance on the same file should see the same balances."""
+        token_service.add_tokens(test_device_id, 5)
+        
+        other = SharedTokenService(store_path)
+        
+        assert other.get_token_status(test_device_id) == token_service.get_token_status(test_device_id)
+        other.close()
+    
+    def test_get_token_statuses(self, token_service):
+        """Batch reads should return statuses in request order."""
+        token_service.bulk_add_tokens([("device_2_123456789", 3)])
+        
+        statuses = token_service.get_token_statuses(["device_1_123456789", "device_2_123456789"])
+        
+        assert [s.device_id for s in statuses] == ["device_1_123456789", "device_2_123456789"]
+        assert statuses[1].remaining_tokens - statuses[0].remaining_tokens == 3
+    
+    def test_bulk_add_tokens_is_all_or_nothing(self, token_service):
+        """An invalid grant should leave every device untouched."""
+        with pytest.raises(ValueError):
+            token_service.bulk_add_tokens([("device_1_123456789", 5), ("", 5)])
+        
+        assert token_service.get_token_status("device_1_123456789").total_tokens == token_service.settings.free_trial_count
+    
+    def test_concurrent_workers_never_overspend(self, store_path, test_device_id):
+        """Tokens consumed across processes should never exceed the balance."""
+        service = SharedTokenService(store_path)
+        service.add_tokens(test_device_id, 15)
+        available = service.get_token_status(test_device_id).remaining_tokens
+        service.close()
+        
+        ctx = multiprocessing.get_context("fork")
+        results = ctx.Queue()
+        workers = [
+            ctx.Process(target=_consume, args=(store_path, test_device_id, available, results))
+            for _ in range(4)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(timeout=30)
+        
+        assert sum(results.get(timeout=5) for _ in workers) == available
+    
+    @pytest.mark.asyncio
+    async def test_writes_run_off_the_event_loop(self, store_path, test_device_id):
+        """Per-request writes should run in a worker thread for this backend."""
+        from app.services.token_service import run_token_write
+        
+        service = SharedTokenService(store_path)
+        threads = []
+        
+        def use_token(device_id):
+            threads.append(threading.current_thread())
+            return service.use_token(device_id)
+        
+        with patch("app.services.token_service.get_token_service", return_value=service):
+            result = await run_token_write(use_token, test_device_id)
+        service.close()
+        
+        assert result.success
+        assert threads[0] is not threading.main_thread()
+    
+    def test_close_resets_singleton(self, store_path):
+        """A closed service should not be handed out again."""
+        import app.services.token_service as ts
+        from app.config import Settings
+        
+        settings = Settings(token_backend="shared", token_store_path=store_path)
+        ts._token_service = None
+        try:
+            with patch("app.services.token_service.get_settings", return_value=settings):
+                first = ts.get_token_service()
+                ts.close_token_service()
+                second = ts.get_token_service()
+                
+                assert second is not first
+                assert second.get_token_status("device_1_123456789").remaining_tokens > 0
+        finally:
+            ts.close_token_service()
+
@@ -0,0 +1,147 @@
+"""Tests for the token event log."""
+import os
+import pytest
+
+from app.services.token_event_log import TokenEventLog
+from app.services.token_service import TokenService
+
+
+@pytest.fixture
+def log_dir(tmp_path):
+    return str(tmp_path / "token-log")
+
+
+@pytest.fixture
+def test_device_id():
+    return "test_device_123456789"
+
+
+def make_log(log_dir, **kwargs):
+    kwargs.setdefault("fsync", False)
+    return TokenEventLog(log_dir, **kwargs)
+
+
+class TestTokenEventLog:
+    """Tests for TokenEventLog class."""
+    
+    def test_group_commit_buffers_until_full(self, log_dir):
+        """Events should only reach disk once the group is full."""
+        event_log = make_log(log_dir, group_commit_size=3, group_commit_interval=60)
+        
+        event_log.append("add", "device_1", amount=1)
+        event_log.append("add", "device_1", amount=1)
+        assert list(event_log.read_events()) == []
+        
+        event_log.append("add", "device_1", amount=1)
+        assert [e["seq"] for e in event_log.read_events()] == [1, 2, 3]
+    
+    def test_sequence_continues_after_reopen(self, log_dir):
+        """A reopened log should continue numbering after the last event."""
+        event_log = make_log(log_dir)
+        event_log.append("add", "device_1", amount=1)
+        event_log.append("add", "device_1", amount=2)
+        event_log.close()
+        
+        reopened = make_log(log_dir)
+        assert reopened.append("add", "device_1", amount=3) == 3
+    
+    def test_read_events_skips_segments_before_snapshot(self, log_dir):
+        """Recovery should only read events after the snapshot."""
+        event_log = make_log(log_dir)
+        event_log.append("add", "device_1", amount=1)
+        event_log.snapshot({"device_1": {}})
+        event_log.append("add", "device_1", amount=2)
+        event_log.close()
+        
+        seq, state = event_log.load_snapshot()
+        tail = list(event_log.read_events(after_seq=seq))
+        
+        assert seq == 1
+        assert state == {"device_1": {}}
+        assert [e["amount"] for e in tail] == [2]
+    
+    def test_snapshot_keeps_events_after_its_seq(self, log_dir):
+        """Events appended after the snapshotted state must stay in the log."""
+        event_log = make_log(log_dir, retain_segments=False)
+        event_log.append("add", "device_1", amount=1)
+        event_log.flush()
+        event_log.append("add", "device_1", amount=2)
+        event_log.snapshot({"device_1": {}}, seq=1)
+        event_log.close()
+        
+        seq, _ = event_log.load_snapshot()
+        
+        assert seq == 1
+        assert [e["amount"] for e in event_log.read_events(after_seq=seq)] == [2]
+        assert event_log.needs_snapshot() == False
+    
+    def test_torn_tail_is_ignored(self, log_dir):
+        """A partially written final line should not break recovery."""
+        event_log = make_log(log_dir)
+        event_log.append("add", "device_1", amount=1)
+        event_log.close()
+        segment = sorted(os.listdir(log_dir))[-1]
+        with open(os.path.join(log_dir, segment), "a") as f:
+            f.write('{"seq":2,"op":"ad')
+        
+        reopened = make_log(log_dir)
+        
+        assert [e["seq"] for e in reopened.read_events()] == [1]
+        assert reopened.seq == 1
+
+
+class TestTokenServiceRecovery:
+    """Tests for rebuilding TokenService state from the event log."""
+    
+    def test_balances_survive_restart(self, log_dir, test_device_id):
+        """A new service should see the same balances after replay."""
+        service = TokenService(event_log=make_log(log_dir))
+        service.add_tokens(test_device_id, 5)
+        service.use_token(test_device_id)
+        service.set_unlimited("device_2_123456789", months=1)
+        expected = service.get_token_status(test_device_id)
+        service.close()
+        
+        recovered = TokenService(event_log=make_log(log_dir))
+        
+        assert recovered.get_token_status(test_device_id) == expected
+        assert recovered.get_token_status("device_2_123456789").is_unlimited == True
+    
+    def test_recovery_replays_only_tail_after_snapshot(self, log_dir, test_device_id):
+        """Snapshots should bound the number of replayed events."""
+        service = TokenService(event_log=make_log(log_dir, snapshot_every=10))
+        for _ in range(25):
+            service.add_tokens(test_device_id, 1)
+            service.flush_events()
+        service.close()
+        
+        recovered = TokenService(event_log=make_log(log_dir))
+        
+        assert recovered.recover() == 5
+        assert recovered.get_token_status(test_device_id).remaining_tokens == 35
+        assert recovered.recover(use_snapshot=False) == 25
+        assert recovered.get_token_status(test_device_id).remaining_tokens == 35
+    
+    def test_credits_are_committed_before_returning(self, log_dir, test_device_id):
+        """Credits should reach the log at once; token use may wait for the group."""
+        event_log = make_log(log_dir, group_commit_interval=60)
+        service = TokenService(event_log=event_log)
+        
+        service.use_token(test_device_id)
+        assert list(event_log.read_events()) == []
+        
+        service.bulk_add_tokens([(test_device_id, 5)])
+        service.set_unlimited("device_2_123456789")
+        
+        assert [e["op"] for e in event_log.read_events()] == ["use", "add", "unlimited"]
+    
+    def test_reset_is_replayed(self, log_dir, test_device_id):
+        """A reset device should stay reset after recovery."""
+        service = TokenService(event_log=make_log(log_dir))
+        service.add_tokens(test_device_id, 5)
+        service.reset_device(test_device_id)
+        service.close()
+        
+        recovered = TokenService(event_log=make_log(log_dir))
+        
+        assert test_device_id not in recovered._tokens
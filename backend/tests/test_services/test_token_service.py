@@ -149,6 +149,47 @@ class TestTokenService:
         assert status1.total_tokens == 10
         assert status2.total_tokens == 0
 
+    
+    def test_get_token_statuses(self, token_service):
+        """Should return statuses in request order."""
+        token_service.add_tokens("device_2_123456789", 4)
+        
+        statuses = token_service.get_token_statuses(["device_1_123456789", "device_2_123456789"])
+        
+        assert [s.device_id for s in statuses] == ["device_1_123456789", "device_2_123456789"]
+        assert statuses[1].remaining_tokens - statuses[0].remaining_tokens == 4
+    
+    def test_bulk_add_tokens(self, token_service):
+        """Should add tokens for each grant."""
+        applied = token_service.bulk_add_tokens([
+            ("device_1_123456789", 5),
+            ("device_2_123456789", 7),
+        ])
+        
+        assert applied == 2
+        assert token_service.get_token_status("device_2_123456789").remaining_tokens == 17
+    
+    def test_bulk_add_tokens_is_all_or_nothing(self, token_service):
+        """An invalid grant should leave every device untouched."""
+        with pytest.raises(ValueError):
+            token_service.bulk_add_tokens([
+                ("device_1_123456789", 5),
+                ("device_2_123456789", 0),
+            ])
+        
+        assert "device_1_123456789" not in token_service._tokens
+    
+    def test_bulk_set_unlimited(self, token_service):
+        """Should set unlimited for each grant."""
+        token_service.bulk_set_unlimited([
+            ("device_1_123456789", 0),
+            ("device_2_123456789", 3),
+        ])
+        
+        assert token_service.get_token_status("device_1_123456789").is_unlimited == True
+        assert token_service._get_device_data("device_1_123456789")["unlimited_until"] is None
+        assert token_service._get_device_data("device_2_123456789")["unlimited_until"] is not None
+
 
 class TestGetTokenServiceSingleton:
     """Tests for get_token_service singleton."""
@@ -0,0 +1,110 @@
+"""Tests for the webhook queue and consumer."""
+import asyncio
+import json
+import threading
+import pytest
+from unittest.mock import MagicMock, patch
+
+from app.services.webhook_queue import WebhookConsumer, WebhookQueue
+
+
+@pytest.fixture
+def queue(tmp_path):
+    webhook_queue = WebhookQueue(str(tmp_path / "queue.db"), lease_seconds=30, max_attempts=2)
+    yield webhook_queue
+    webhook_queue.close()
+
+
+def body(event_id: str) -> bytes:
+    return json.dumps({"id": event_id, "eventType": "checkout.completed"}).encode()
+
+
+class TestWebhookQueue:
+    """Tests for WebhookQueue class."""
+    
+    def test_claim_in_fifo_order(self, queue):
+        """Events should be claimed oldest first."""
+        for i in range(3):
+            queue.enqueue(body(f"evt_{i}"))
+        
+        rows = queue.claim_batch(2)
+        
+        assert [json.loads(payload)["id"] for _, payload, _ in rows] == ["evt_0", "evt_1"]
+    
+    def test_claimed_events_are_leased(self, queue):
+        """Claimed events should not be handed out twice."""
+        queue.enqueue(body("evt_0"))
+        
+        assert len(queue.claim_batch(10)) == 1
+        assert queue.claim_batch(10) == []
+    
+    def test_expired_lease_is_reclaimed(self, queue):
+        """Events from a crashed consumer should become visible again."""
+        queue.enqueue(body("evt_0"))
+        queue.claim_batch(10)
+        
+        with patch("app.services.webhook_queue.time.time", return_value=10**10):
+            assert len(queue.claim_batch(10)) == 1
+    
+    def test_ack_removes_events(self, queue):
+        """Acknowledged events should leave the queue."""
+        queue.enqueue(body("evt_0"))
+        ids = [event_id for event_id, _, _ in queue.claim_batch(10)]
+        
+        queue.ack(ids)
+        
+        assert queue.depth() == 0
+
+
+class TestWebhookConsumer:
+    """Tests for WebhookConsumer class."""
+    
+    def test_applies_batch_with_one_handler_call(self, queue):
+        """A whole batch should be handed to the handler at once."""
+        handler = MagicMock()
+        for i in range(3):
+            queue.enqueue(body(f"evt_{i}"))
+        
+        processed = WebhookConsumer(queue, handler, batch_size=10).process_batch()
+        
+        assert processed == 3
+        handler.assert_called_once()
+        assert len(handler.call_args.args[0]) == 3
+        assert queue.depth() == 0
+    
+    def test_bad_event_does_not_block_batch(self, queue):
+        """A failing event should be retried alone while the rest are applied."""
+        def handler(payloads):
+            if any(p["id"] == "evt_bad" for p in payloads):
+                raise ValueError("bad event")
+        
+        queue.enqueue(body("evt_ok"))
+        queue.enqueue(body("evt_bad"))
+        consumer = WebhookConsumer(queue, handler, retry_delay=0)
+        
+        consumer.process_batch()
+        
+        assert queue.depth() == 1
+        consumer.process_batch()
+        assert queue.depth() == 0  # gave up after max_attempts
+    
+    @pytest.mark.asyncio
+    async def test_batches_run_off_the_event_loop(self, queue):
+        """The consumer should apply batches in a worker thread."""
+        handled = asyncio.Event()
+        threads = []
+        loop = asyncio.get_running_loop()
+        
+        def handler(payloads):
+            threads.append(threading.current_thread())
+            loop.call_soon_threadsafe(handled.set)
+        
+        queue.enqueue(body("evt_0"))
+        consumer = WebhookConsumer(queue, handler, poll_interval=0.01)
+        consumer.start()
+        try:
+            await asyncio.wait_for(handled.wait(), timeout=5)
+        finally:
+            await consumer.stop()
+        
+        assert threads and threads[0] is not threading.main_thread()
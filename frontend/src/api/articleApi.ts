@@ -3,6 +3,9 @@
  */
 
 const API_BASE = import.meta.env.VITE_API_URL || '/api';
+const SYNC_POLL_INTERVAL_MS = 1000;
+const SYNC_POLL_MAX_INTERVAL_MS = 5000;
+const SYNC_POLL_TIMEOUT_MS = 120000;
 
 export interface Article {
   title: string;
@@ -34,6 +37,12 @@ export interface SyncResult {
   message: string;
 }
 
+interface SyncJob {
+  job_id: string;
+  status: 'queued' | 'running' | 'succeeded' | 'failed';
+  result: SyncResult | null;
+}
+
 export interface TokenStatus {
   device_id: string;
   total_tokens: number;
@@ -45,13 +54,12 @@ export interface TokenStatus {
 
 /**
  * Extract article content from URL
+ *
+ * Uses GET so the browser cache revalidates with the article's ETag and
+ * a returning reader gets a 304 instead of the full text again.
  */
 export async function extractArticle(url: string): Promise<Article> {
-  const response = await fetch(`${API_BASE}/extract`, {
-    method: 'POST',
-    headers: { 'Content-Type': 'application/json' },
-    body: JSON.stringify({ url }),
-  });
+  const response = await fetch(`${API_BASE}/extract?url=${encodeURIComponent(url)}`);
   
   if (!response.ok) {
     const error = await response.json();
@@ -95,7 +103,7 @@ export async function syncToNotion(
   articleUrl: string,
   margins: MarginNote[]
 ): Promise<SyncResult> {
-  const response = await fetch(`${API_BASE}/sync-notion`, {
+  const response = await fetch(`${API_BASE}/sync-notion/jobs`, {
     method: 'POST',
     headers: { 'Content-Type': 'application/json' },
     body: JSON.stringify({
@@ -111,7 +119,27 @@ export async function syncToNotion(
     throw new Error(error.detail || 'Sync failed');
   }
   
-  return response.json();
+  let job: SyncJob = await response.json();
+  const deadline = Date.now() + SYNC_POLL_TIMEOUT_MS;
+  let interval = SYNC_POLL_INTERVAL_MS;
+  while (!job.result) {
+    if (Date.now() + interval > deadline) {
+      throw new Error('Sync is taking longer than expected. Please check Notion later.');
+    }
+    await new Promise((resolve) => setTimeout(resolve, interval));
+    interval = Math.min(interval * 2, SYNC_POLL_MAX_INTERVAL_MS);
+    const poll = await fetch(`${API_BASE}/sync-notion/jobs/${job.job_id}`);
+    if (!poll.ok) {
+      const error = await poll.json();
+      throw new Error(error.detail || 'Sync failed');
+    }
+    job = await poll.json();
+  }
+  
+  if (!job.result.success) {
+    throw new Error(job.result.message || 'Sync failed');
+  }
+  return job.result;
 }
 
 /**